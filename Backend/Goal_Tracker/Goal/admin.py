@@ -1,8 +1,66 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Goal, Milestone
+from . import mutations
+from .models import Goal, GoalSummary, Milestone, Tombstone
 
-admin.site.register(Goal)
-admin.site.register(Milestone)
+# Admin edits go through the same helpers as the API, so the version, tombstones,
+# milestone counters, dashboard summary and search index follow them too. Moving
+# a goal or milestone to another owner is not something those helpers handle, and
+# the derived tables are only there to look at.
 
+
+@admin.register(Goal)
+class GoalAdmin(admin.ModelAdmin):
+    readonly_fields = ('milestone_count', 'completed_count', 'version')
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return self.readonly_fields
+        return self.readonly_fields + ('user',)
+
+    def save_model(self, request, obj, form, change):
+        mutations.save_goal(obj)
+
+    def delete_model(self, request, obj):
+        mutations.delete_goal(obj)
+
+    def delete_queryset(self, request, queryset):
+        for goal in queryset:
+            mutations.delete_goal(goal)
+
+
+@admin.register(Milestone)
+class MilestoneAdmin(admin.ModelAdmin):
+    readonly_fields = ('version',)
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return self.readonly_fields
+        return self.readonly_fields + ('goal',)
+
+    def save_model(self, request, obj, form, change):
+        mutations.save_milestone(obj, obj.goal.user_id)
+
+    def delete_model(self, request, obj):
+        mutations.delete_milestone(obj, obj.goal.user_id)
+
+    def delete_queryset(self, request, queryset):
+        for milestone in queryset.select_related('goal'):
+            mutations.delete_milestone(milestone, milestone.goal.user_id)
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+admin.site.register(Tombstone, ReadOnlyAdmin)
+admin.site.register(GoalSummary, ReadOnlyAdmin)
@@ -0,0 +1,181 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from Goal_Tracker import shards
+
+from . import search
+from .counters import progress_filter
+from .models import ArchivedGoal, ArchivedMilestone, Goal, Milestone, Tombstone
+from .pagination import InvalidQuery, filter_goals, order_goals, page_queryset, parse_limit, parse_sort, split_page
+from .serializers import build_goals, goal_values, parse_fields
+from .summary import SummaryTracker
+from .sync import record_tombstones
+from .versioning import bump_version
+
+# Goals that are finished, or whose target date is more than ARCHIVE_PAST_DUE_DAYS
+# behind us, and that nobody has touched for ARCHIVE_QUIET_DAYS are moved out of the
+# hot Goal and Milestone tables into ArchivedGoal/ArchivedMilestone by
+# `manage.py archive_goals`. They keep their ids so a restore puts them back as they
+# were, and a restored goal counts as touched so the next run leaves it alone.
+#
+# To everything built on the hot tables, archiving is a delete and restoring is a
+# create: the version is bumped, delta sync gets tombstones, and the dashboard
+# summary, search index and list cache follow along. The dashboard and search
+# therefore cover active goals only, and the goal listing adds archived goals
+# when asked with ?archived=include or ?archived=only.
+
+ARCHIVED_MODES = ("exclude", "include", "only")
+DEFAULT_BATCH_SIZE = 200
+
+
+def parse_archived(value):
+    value = value or "exclude"
+    if value not in ARCHIVED_MODES:
+        raise InvalidQuery("Invalid archived flag!")
+    return value
+
+
+def eligible(goals, now=None):
+    """Narrow `goals` to the ones due for archiving."""
+    now = now or timezone.now()
+    past_due = timezone.localdate(now) - datetime.timedelta(days=settings.ARCHIVE_PAST_DUE_DAYS)
+    quiet = now - datetime.timedelta(days=settings.ARCHIVE_QUIET_DAYS)
+    # Milestone updates do not touch the goal's updated_at, so look at those too
+    recent = Milestone.objects.filter(goal=OuterRef("pk"), updated_at__gte=quiet)
+    return goals.filter(progress_filter(True) | Q(target_date__lt=past_due), updated_at__lt=quiet).filter(~Exists(recent))
+
+
+def archive_goals(goal_ids, now=None):
+    """Archive those of `goal_ids` that are eligible, and return (goals, milestones) moved."""
+    now = now or timezone.now()
+    with transaction.atomic(using=shards.current()):
+        # Checked inside the transaction, so a goal edited since it was picked stays put
+        goals = list(eligible(Goal.objects.filter(id__in=goal_ids), now).values())
+        if not goals:
+            return 0, 0
+        ids = [goal["id"] for goal in goals]
+        milestones = list(Milestone.objects.filter(goal_id__in=ids).values())
+
+        ArchivedGoal.objects.bulk_create([ArchivedGoal(**goal, archived_at=now) for goal in goals])
+        ArchivedMilestone.objects.bulk_create([ArchivedMilestone(**milestone) for milestone in milestones])
+
+        owners = {goal["id"]: goal["user_id"] for goal in goals}
+        for user_id in set(owners.values()):
+            version = bump_version(user_id)
+            record_tombstones(user_id, version, "goal", [goal_id for goal_id in ids if owners[goal_id] == user_id])
+            record_tombstones(user_id, version, "milestone", [
+                milestone["id"] for milestone in milestones if owners[milestone["goal_id"]] == user_id
+            ])
+        tracker = SummaryTracker(ids)
+        Milestone.objects.filter(goal_id__in=ids).delete()
+        Goal.objects.filter(id__in=ids).delete()
+        tracker.apply()
+        search.reindex(ids)
+    return len(ids), len(milestones)
+
+
+def restore_goals(user_id, goal_ids):
+    """Move a user's archived `goal_ids` back into the hot tables and return the ids restored."""
+    with transaction.atomic(using=shards.current()):
+        goals = list(ArchivedGoal.objects.filter(user_id=user_id, id__in=goal_ids).values())
+        if not goals:
+            return []
+        ids = [goal["id"] for goal in goals]
+        milestones = list(ArchivedMilestone.objects.filter(goal_id__in=ids).values())
+
+        # Stamped with the new version so delta sync hands them out again; the
+        # tombstones from archiving would otherwise delete them on older cursors.
+        # updated_at is set to now by the inserts.
+        version = bump_version(user_id)
+        Tombstone.objects.filter(user_id=user_id, kind="goal", object_id__in=ids).delete()
+        Tombstone.objects.filter(
+            user_id=user_id, kind="milestone", object_id__in=[milestone["id"] for milestone in milestones],
+        ).delete()
+        for goal in goals:
+            del goal["archived_at"]
+        Goal.objects.bulk_create([Goal(**{**goal, "version": version}) for goal in goals])
+        Milestone.objects.bulk_create([Milestone(**{**milestone, "version": version}) for milestone in milestones])
+        ArchivedMilestone.objects.filter(goal_id__in=ids).delete()
+        ArchivedGoal.objects.filter(id__in=ids).delete()
+        SummaryTracker().apply(ids)
+        search.reindex(ids)
+    return ids
+
+
+def run(batch_size=DEFAULT_BATCH_SIZE, pause=0.0, user_id=None, dry_run=False, now=None):
+    """
+    Archive every eligible goal on the current shard and return the run's stats.
+
+    Goals are walked in primary key order `batch_size` at a time and the eligible
+    ones of each batch are archived in one transaction, so writers are never
+    locked out for longer than one small copy. `pause` seconds between batches
+    leaves room for them on busy databases.
+    """
+    now = now or timezone.now()
+    started = time.perf_counter()
+    stats = {"scanned": 0, "batches": 0, "goals": 0, "milestones": 0}
+    goals = Goal.objects.order_by("id")
+    if user_id is not None:
+        goals = goals.filter(user_id=user_id)
+
+    last_id = 0
+    while True:
+        batch = list(goals.filter(id__gt=last_id).values_list("id", flat=True)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1]
+        stats["scanned"] += len(batch)
+        stats["batches"] += 1
+        if dry_run:
+            stats["goals"] += eligible(Goal.objects.filter(id__in=batch), now).count()
+            continue
+        moved, milestones = archive_goals(batch, now)
+        stats["goals"] += moved
+        stats["milestones"] += milestones
+        if pause:
+            time.sleep(pause)
+
+    stats["elapsedSeconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+
+def list_goals(user_id, params, mode):
+    """
+    The goal listing for ?archived=include|only, in the same shapes as the plain one.
+
+    With include, active and archived goals are fetched separately in the same
+    keyset order and merged, so a page still reads at most limit + 1 rows from
+    each table.
+    """
+    fields = parse_fields(params.get("fields"))
+    sort, field, descending = parse_sort(params.get("sort"))
+    paged = "limit" in params or "cursor" in params
+    sources = [(ArchivedGoal, ArchivedMilestone, True)]
+    if mode == "include":
+        sources.insert(0, (Goal, Milestone, False))
+
+    rows = []
+    for model, milestone_model, archived in sources:
+        goals = filter_goals(model.objects.filter(user_id=user_id), params)
+        if paged:
+            goals, page_info = page_queryset(goals, params)
+        else:
+            goals = order_goals(goals, sort)
+        part = list(goal_values(goals, fields, extra=[field]))
+        for row, data in zip(part, build_goals(part, fields, milestone_model)):
+            data["archived"] = archived
+            rows.append((row, data))
+
+    if len(sources) > 1:
+        rows.sort(key=lambda pair: (pair[0][field], pair[0]["id"]), reverse=descending)
+    if not paged:
+        return [data for _, data in rows]
+
+    rows = rows[:parse_limit(params.get("limit")) + 1]
+    page, next_cursor = split_page([row for row, _ in rows], page_info)
+    return {"results": [data for _, data in rows[:len(page)]], "next_cursor": next_cursor}
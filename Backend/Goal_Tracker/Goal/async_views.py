@@ -0,0 +1,309 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+
+from . import mutations
+from .counters import agoal_progress
+from .archive import list_goals as list_archived_goals, parse_archived
+from .cache import goal_list_cache
+from .events import OVERFLOW, EventStream, TooManySubscribers, broker, format_event
+from .models import Goal, Milestone, User
+from User.auth import owns
+from .pagination import InvalidQuery, filter_goals, order_goals, page_queryset, split_page
+from .serializers import DEFAULT_FIELDS, abuild_goals, asaved_goal, dumps, goal_values, parse_fields, serialize_milestone
+from .sync import changes_since
+from .versioning import aget_version, list_etag, list_last_modified
+from Goal_Tracker import shards
+from Goal_Tracker.routers import replica_reads
+
+# Native coroutine versions of the views in views.py, used when ASYNC_VIEWS is on
+# and the project is served through Goal_Tracker.asgi. Reads go through the async
+# ORM; writes run the shared helpers in mutations.py on a worker thread because
+# they need a transaction.
+
+
+@csrf_exempt
+async def index(request):
+    return HttpResponse("Hello, world. You're at the Goal index.")
+
+
+@csrf_exempt
+@replica_reads
+async def goal(request, id):
+    if not owns(request, id):
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+    # Look the version up asynchronously so condition() below finds it already cached
+    request._goal_data_version = await aget_version(id)
+    return await _goal(request, id)
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=list_etag, last_modified_func=list_last_modified)
+async def _goal(request, id):
+    version = request._goal_data_version
+    if version is not None and not request.GET:
+        payload = await goal_list_cache.aget(id, version[0])
+        if payload is None:
+            goals = goal_values(Goal.objects.filter(user_id=id).order_by('id'), DEFAULT_FIELDS)
+            payload = dumps(await abuild_goals([row async for row in goals], DEFAULT_FIELDS))
+            await goal_list_cache.aset(id, version[0], payload)
+        return HttpResponse(payload, content_type="application/json")
+
+    goals = Goal.objects.filter(user_id=id)
+
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+        archived = parse_archived(request.GET.get("archived"))
+        if archived != "exclude":
+            data = await sync_to_async(list_archived_goals)(id, request.GET, archived)
+            return HttpResponse(dumps(data), content_type="application/json")
+        goals = filter_goals(goals, request.GET)
+
+        # Without paging parameters keep returning the plain list the frontend expects.
+        if "limit" not in request.GET and "cursor" not in request.GET:
+            goals = goal_values(order_goals(goals, request.GET.get("sort")), fields)
+            data = await abuild_goals([row async for row in goals], fields)
+            return HttpResponse(dumps(data), content_type="application/json")
+
+        page, page_info = page_queryset(goals, request.GET)
+    except InvalidQuery as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    rows, next_cursor = split_page([row async for row in goal_values(page, fields, extra=[page_info[1]])], page_info)
+    return HttpResponse(dumps({
+        "results": await abuild_goals(rows, fields),
+        "next_cursor": next_cursor,
+    }), content_type="application/json")
+
+
+@csrf_exempt
+async def create_goal(request):
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            title = data.get("title")
+            description = data.get("description")
+            category = data.get("category")
+            priority = data.get("priority")
+            target_date = data.get("targetDate")
+
+            if not owns(request, data.get("id")):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
+            user = getattr(request, "user_record", None) or await User.objects.filter(id=data.get("id")).afirst()
+            if not title or not description or not category or not priority or not target_date:
+                return JsonResponse({"error": "Please fill all the fields!"}, status=400)
+
+            goal = Goal(
+                user=user,
+                title=title,
+                description=description,
+                category=category,
+                priority=priority,
+                target_date=target_date
+            )
+            await sync_to_async(mutations.save_goal)(goal)
+
+            return JsonResponse({"message": "Goal Created successfully", "goal": await asaved_goal(goal.id)}, status=200)
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data!"}, status=400)
+
+
+@csrf_exempt
+async def create_milestone(request):
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            goal_id = data.get("goal_id")
+            title = data.get("title")
+
+            if not goal_id or not title:
+                return JsonResponse({"error": "Please fill all the fields!"}, status=400)
+
+            goal = await Goal.objects.filter(id=goal_id).afirst()
+            if not goal:
+                return JsonResponse({"error": "Goal not found!"}, status=404)
+            if not owns(request, goal.user_id):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
+
+            milestone = Milestone(goal=goal, title=title, status=False)
+            await sync_to_async(mutations.save_milestone)(milestone, goal.user_id)
+
+            return JsonResponse({
+                "message": "Milestone Created successfully",
+                "milestone": serialize_milestone(milestone),
+                "progress": await agoal_progress(goal.id),
+            }, status=200)
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data!"}, status=400)
+
+
+@csrf_exempt
+async def update_goal(request, goal_id):
+    if request.method == 'PUT':
+        try:
+            data = json.loads(request.body)
+            goal = await Goal.objects.filter(id=goal_id).afirst()
+
+            if not goal:
+                return JsonResponse({"error": "Goal not found!"}, status=404)
+            if not owns(request, goal.user_id):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
+
+            goal.title = data.get("title", goal.title)
+            goal.description = data.get("description", goal.description)
+            goal.category = data.get("category", goal.category)
+            goal.priority = data.get("priority", goal.priority)
+            goal.target_date = data.get("targetDate", goal.target_date)
+
+            await sync_to_async(mutations.save_goal)(goal)
+            return JsonResponse({"message": "Goal updated successfully", "goal": await asaved_goal(goal.id)}, status=200)
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data!"}, status=400)
+
+
+@csrf_exempt
+async def delete_goal(request, goal_id):
+    if request.method == 'DELETE':
+        goal = await Goal.objects.filter(id=goal_id).afirst()
+
+        if not goal:
+            return JsonResponse({"error": "Goal not found!"}, status=404)
+        if not owns(request, goal.user_id):
+            return JsonResponse({"error": "Forbidden!"}, status=403)
+
+        await sync_to_async(mutations.delete_goal)(goal)
+        return JsonResponse({"message": "Goal deleted successfully"}, status=200)
+
+
+@csrf_exempt
+async def update_milestone(request, milestone_id):
+    if request.method == 'PUT':
+        try:
+            data = json.loads(request.body)
+            milestone = await Milestone.objects.filter(id=milestone_id).select_related('goal').afirst()
+
+            if not milestone:
+                return JsonResponse({"error": "Milestone not found!"}, status=404)
+            if not owns(request, milestone.goal.user_id):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
+
+            milestone.title = data.get("title", milestone.title)
+            milestone.status = data.get("status", milestone.status)
+
+            await sync_to_async(mutations.save_milestone)(milestone, milestone.goal.user_id)
+            return JsonResponse({
+                "message": "Milestone updated successfully",
+                "milestone": serialize_milestone(milestone),
+                "progress": await agoal_progress(milestone.goal_id),
+            }, status=200)
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data!"}, status=400)
+
+
+@csrf_exempt
+async def delete_milestone(request, milestone_id):
+    if request.method == 'DELETE':
+        milestone = await Milestone.objects.filter(id=milestone_id).select_related('goal').afirst()
+
+        if not milestone:
+            return JsonResponse({"error": "Milestone not found!"}, status=404)
+        if not owns(request, milestone.goal.user_id):
+            return JsonResponse({"error": "Forbidden!"}, status=403)
+
+        await sync_to_async(mutations.delete_milestone)(milestone, milestone.goal.user_id)
+        return JsonResponse({
+            "message": "Milestone deleted successfully",
+            "progress": await agoal_progress(milestone.goal_id),
+        }, status=200)
+
+
+@csrf_exempt
+async def events(request, id):
+    # A stream holds its connection open; WSGI would tie up a whole worker thread per tab
+    if "wsgi.version" in request.META:
+        return JsonResponse({"error": "Event streams need the ASGI server!"}, status=501)
+    if not owns(request, id):
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+
+    # EventSource sends Last-Event-ID when it reconnects; a first connection can pass ?since=
+    since = request.headers.get("Last-Event-ID") or request.GET.get("since")
+    try:
+        since = int(since) if since else None
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor!"}, status=400)
+
+    if await aget_version(id) is None:
+        return JsonResponse({"error": "User not found!"}, status=404)
+    try:
+        subscriber = broker.subscribe(id)
+    except TooManySubscribers:
+        return JsonResponse({"error": "Too many open streams!"}, status=429)
+
+    # The stream outlives the request, and with it the shard binding ShardMiddleware made
+    chunks = _stream(subscriber, since, shards.current())
+    response = StreamingHttpResponse(EventStream(subscriber, chunks), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+async def _stream(subscriber, since, alias):
+    user_id = subscriber.user_id
+
+    async def read(func, *args):
+        with shards.use(alias):
+            return await func(*args)
+    try:
+        # Subscribed before reading the version, so nothing committed in between is missed
+        version = await read(aget_version, user_id)
+        if version is None:
+            return
+        cursor = version[0]
+
+        yield b"retry: %d\n\n" % settings.EVENT_STREAM_RETRY_MS
+        if since is not None and since != cursor:
+            changes = await read(sync_to_async(changes_since), user_id, since)
+            yield format_event("change", dumps(changes), changes["cursor"])
+            cursor = changes["cursor"]
+        yield format_event("ready", event_id=cursor)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), settings.EVENT_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                # Writes served by another worker process never reach this broker,
+                # so every heartbeat also checks whether the version moved.
+                version = await read(aget_version, user_id)
+                if version is None:
+                    return
+                if version[0] == cursor:
+                    yield b": ping\n\n"
+                    continue
+                event = OVERFLOW
+
+            if event is OVERFLOW:
+                broker.recover(subscriber)
+                base, changes = cursor, None
+            else:
+                base, changes = event
+            if base > cursor or changes is None:
+                changes = await read(sync_to_async(changes_since), user_id, cursor)
+                if changes is None:
+                    return
+            # Several commits can land in one delta, so later events may already be covered
+            if changes["cursor"] <= cursor:
+                continue
+            cursor = changes["cursor"]
+            yield format_event("change", dumps(changes), cursor)
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,227 @@
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from Goal_Tracker import shards
+
+from . import search
+from .counters import recount
+from .models import Goal, Milestone
+from .summary import SummaryTracker
+from .sync import record_tombstones
+from .versioning import bump_version
+
+MAX_OPERATIONS = 500
+
+GOAL_FIELDS = {
+    "title": "title",
+    "description": "description",
+    "category": "category",
+    "priority": "priority",
+    "targetDate": "target_date",
+}
+MILESTONE_FIELDS = {
+    "title": "title",
+    "status": "status",
+}
+
+
+def clean_goal_data(data, partial):
+    """Translate request keys to model fields, returning (fields, error)."""
+    fields = {}
+    for key, field in GOAL_FIELDS.items():
+        if key in data:
+            fields[field] = data[key]
+        elif not partial:
+            return None, "Please fill all the fields!"
+    for field in ("title", "description"):
+        if field in fields and not fields[field]:
+            return None, "Please fill all the fields!"
+    if "category" in fields and fields["category"] not in dict(Goal.CATEGORY_CHOICES):
+        return None, "Invalid category!"
+    if "priority" in fields and fields["priority"] not in dict(Goal.PRIORITY_CHOICES):
+        return None, "Invalid priority!"
+    if "target_date" in fields:
+        try:
+            fields["target_date"] = datetime.date.fromisoformat(fields["target_date"])
+        except (TypeError, ValueError):
+            return None, "Invalid date!"
+    return fields, None
+
+
+def clean_milestone_data(data):
+    fields = {field: data[key] for key, field in MILESTONE_FIELDS.items() if key in data}
+    if "title" in fields and not fields["title"]:
+        return None, "Please fill all the fields!"
+    if "status" in fields and not isinstance(fields["status"], bool):
+        return None, "Invalid status!"
+    return fields, None
+
+
+def validate_operations(user_id, operations):
+    """
+    Check every operation before anything is written.
+
+    Returns (plan, errors). `errors` lists {"index", "error"} for each invalid
+    operation; the plan is only usable when it is empty.
+    """
+    if not isinstance(operations, list) or not operations:
+        return None, [{"index": None, "error": "No operations given!"}]
+    if len(operations) > MAX_OPERATIONS:
+        return None, [{"index": None, "error": "At most %d operations per batch!" % MAX_OPERATIONS}]
+
+    plan = {
+        "goal": {"create": [], "update": [], "delete": []},
+        "milestone": {"create": [], "update": [], "delete": []},
+    }
+    errors = []
+    refs = set()
+
+    # Resolve every referenced id with one query per model, scoped to the user.
+    ids = {"goal": set(), "milestone": set()}
+    for op in operations:
+        if not isinstance(op, dict) or op.get("type") not in ids:
+            continue
+        if op.get("op") in ("update", "delete") and isinstance(op.get("id"), int):
+            ids[op["type"]].add(op["id"])
+        data = op.get("data")
+        if op["type"] == "milestone" and isinstance(data, dict) and isinstance(data.get("goal_id"), int):
+            ids["goal"].add(data["goal_id"])
+    own_goals = set(Goal.objects.filter(user_id=user_id, id__in=ids["goal"]).values_list("id", flat=True))
+    own_milestones = set(
+        Milestone.objects.filter(goal__user_id=user_id, id__in=ids["milestone"]).values_list("id", flat=True)
+    )
+
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            errors.append({"index": index, "error": "Invalid operation!"})
+            continue
+        kind, action, data = op.get("type"), op.get("op"), op.get("data") or {}
+        if kind not in plan or action not in plan[kind] or not isinstance(data, dict):
+            errors.append({"index": index, "error": "Invalid operation!"})
+            continue
+
+        if action in ("update", "delete"):
+            owned = own_goals if kind == "goal" else own_milestones
+            if op.get("id") not in owned:
+                errors.append({"index": index, "error": "%s not found!" % kind.capitalize()})
+                continue
+
+        if kind == "goal" and action in ("create", "update"):
+            fields, error = clean_goal_data(data, partial=action == "update")
+        elif kind == "milestone" and action in ("create", "update"):
+            fields, error = clean_milestone_data(data)
+            if not error and action == "create":
+                if not fields.get("title"):
+                    error = "Please fill all the fields!"
+                elif "goal_ref" in data:
+                    if not isinstance(data["goal_ref"], str) or data["goal_ref"] not in refs:
+                        error = "Unknown goal_ref!"
+                elif data.get("goal_id") not in own_goals:
+                    error = "Goal not found!"
+        else:
+            fields, error = {}, None
+        if error:
+            errors.append({"index": index, "error": error})
+            continue
+
+        if kind == "goal" and action == "create" and op.get("ref") is not None:
+            if not isinstance(op["ref"], str) or op["ref"] in refs:
+                errors.append({"index": index, "error": "Invalid or duplicate ref!"})
+                continue
+            refs.add(op["ref"])
+
+        plan[kind][action].append({"index": index, "id": op.get("id"), "ref": op.get("ref"), "data": data, "fields": fields})
+
+    return plan, errors
+
+
+def apply_operations(user_id, plan):
+    """
+    Apply a validated plan in a single transaction and return per-operation results.
+
+    Creates run before updates and deletes, goals before milestones, so milestones
+    can point at goals created earlier in the same batch through `goal_ref`.
+    """
+    results = {}
+    now = timezone.now()
+    with transaction.atomic(using=shards.current()):
+        version = bump_version(user_id)
+
+        # Snapshot every existing goal the batch can change for the dashboard summary
+        milestone_targets = [op["id"] for op in plan["milestone"]["update"] + plan["milestone"]["delete"]]
+        tracker = SummaryTracker(
+            [op["id"] for op in plan["goal"]["update"] + plan["goal"]["delete"]]
+            + [op["data"]["goal_id"] for op in plan["milestone"]["create"] if "goal_ref" not in op["data"]]
+            + list(Milestone.objects.filter(id__in=milestone_targets).values_list("goal_id", flat=True))
+        )
+
+        goal_ops = plan["goal"]["create"]
+        goals = Goal.objects.bulk_create([
+            Goal(user_id=user_id, version=version, **op["fields"]) for op in goal_ops
+        ])
+        goal_refs = {}
+        for op, goal in zip(goal_ops, goals):
+            if op["ref"] is not None:
+                goal_refs[op["ref"]] = goal.id
+            results[op["index"]] = {"index": op["index"], "status": "created", "id": goal.id}
+
+        updates = plan["goal"]["update"]
+        if updates:
+            targets = Goal.objects.in_bulk([op["id"] for op in updates])
+            changed = {"version", "updated_at"}
+            for op in updates:
+                goal = targets[op["id"]]
+                for field, value in op["fields"].items():
+                    setattr(goal, field, value)
+                    changed.add(field)
+                goal.version, goal.updated_at = version, now
+                results[op["index"]] = {"index": op["index"], "status": "updated", "id": goal.id}
+            Goal.objects.bulk_update(targets.values(), sorted(changed))
+
+        milestone_ops = plan["milestone"]["create"]
+        milestones = Milestone.objects.bulk_create([
+            Milestone(
+                goal_id=goal_refs[op["data"]["goal_ref"]] if "goal_ref" in op["data"] else op["data"]["goal_id"],
+                title=op["fields"]["title"],
+                status=op["fields"].get("status", False),
+                version=version,
+            )
+            for op in milestone_ops
+        ])
+        # Goals whose milestone counters need recomputing once everything is applied.
+        touched = {milestone.goal_id for milestone in milestones}
+        for op, milestone in zip(milestone_ops, milestones):
+            results[op["index"]] = {"index": op["index"], "status": "created", "id": milestone.id}
+
+        updates = plan["milestone"]["update"]
+        if updates:
+            targets = Milestone.objects.in_bulk([op["id"] for op in updates])
+            changed = {"version", "updated_at"}
+            for op in updates:
+                milestone = targets[op["id"]]
+                for field, value in op["fields"].items():
+                    setattr(milestone, field, value)
+                    changed.add(field)
+                milestone.version, milestone.updated_at = version, now
+                touched.add(milestone.goal_id)
+                results[op["index"]] = {"index": op["index"], "status": "updated", "id": milestone.id}
+            Milestone.objects.bulk_update(targets.values(), sorted(changed))
+
+        milestone_ids = [op["id"] for op in plan["milestone"]["delete"]]
+        goal_ids = [op["id"] for op in plan["goal"]["delete"]]
+        touched.update(Milestone.objects.filter(id__in=milestone_ids).values_list("goal_id", flat=True))
+        # Milestones of deleted goals go with them through the cascade; tombstone those too.
+        cascaded = Milestone.objects.filter(goal_id__in=goal_ids).exclude(id__in=milestone_ids).values_list("id", flat=True)
+        record_tombstones(user_id, version, "milestone", milestone_ids + list(cascaded))
+        record_tombstones(user_id, version, "goal", goal_ids)
+        Milestone.objects.filter(id__in=milestone_ids).delete()
+        Goal.objects.filter(id__in=goal_ids).delete()
+        recount(Goal.objects.filter(id__in=touched - set(goal_ids)))
+        tracker.apply(goal.id for goal in goals)
+        search.reindex(tracker.goal_ids)
+        for op in plan["milestone"]["delete"] + plan["goal"]["delete"]:
+            results[op["index"]] = {"index": op["index"], "status": "deleted", "id": op["id"]}
+
+    return version, [results[index] for index in sorted(results)]
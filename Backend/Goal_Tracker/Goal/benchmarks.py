@@ -0,0 +1,55 @@
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+
+# Small helpers shared by the bench_* management commands.
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (which need not be sorted)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """Summarize per-request latencies (seconds) from a run that took `elapsed` seconds."""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def run_threads(make_sender, total, concurrency):
+    """
+    Send `total` requests from `concurrency` threads and return (latencies, errors, elapsed).
+
+    make_sender() runs once in each thread and returns a function that sends one
+    request and returns its status code, so every thread can own its client.
+    """
+    def worker(count):
+        send = make_sender()
+        timings, failures = [], 0
+        for _ in range(count):
+            start = time.perf_counter()
+            status = send()
+            timings.append(time.perf_counter() - start)
+            failures += status >= 400
+        connections.close_all()
+        return timings, failures
+
+    shares = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(worker, shares))
+    elapsed = time.perf_counter() - start
+    return [t for timings, _ in outcomes for t in timings], sum(f for _, f in outcomes), elapsed
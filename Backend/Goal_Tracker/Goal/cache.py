@@ -0,0 +1,90 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class GoalListCache:
+    """
+    Per-user cache of the serialized goal list.
+
+    Entries hold the exact JSON bytes sent to the client together with the user's
+    data_version they were built from, so a read only hits when the stored version
+    matches the current one. Mutations go through bump_version(), which drops the
+    user's entry once the transaction commits.
+
+    Storage is whichever Django cache alias GOAL_LIST_CACHE_ALIAS points at. The
+    local-memory backend evicts in least-recently-used order once MAX_ENTRIES is
+    reached; the file backend culls by CULL_FREQUENCY. Payloads larger than
+    GOAL_LIST_CACHE_MAX_BYTES are never stored so one huge account cannot push
+    everyone else out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.skipped = 0
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, "GOAL_LIST_CACHE_ALIAS", "default")]
+
+    @property
+    def max_bytes(self):
+        return getattr(settings, "GOAL_LIST_CACHE_MAX_BYTES", 1024 * 1024)
+
+    def key(self, user_id):
+        return "goal-list:%s" % user_id
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def get(self, user_id, version):
+        return self._check(self.cache.get(self.key(user_id)), version)
+
+    async def aget(self, user_id, version):
+        return self._check(await self.cache.aget(self.key(user_id)), version)
+
+    def _check(self, entry, version):
+        if entry is None:
+            self._count("misses")
+            return None
+        cached_version, payload = entry
+        if cached_version != version:
+            self._count("stale")
+            self._count("misses")
+            return None
+        self._count("hits")
+        return payload
+
+    def set(self, user_id, version, payload):
+        if len(payload) > self.max_bytes:
+            self._count("skipped")
+            return
+        self.cache.set(self.key(user_id), (version, payload))
+
+    async def aset(self, user_id, version, payload):
+        if len(payload) > self.max_bytes:
+            self._count("skipped")
+            return
+        await self.cache.aset(self.key(user_id), (version, payload))
+
+    def invalidate(self, user_id):
+        self.cache.delete(self.key(user_id))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "skipped": self.skipped,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+goal_list_cache = GoalListCache()
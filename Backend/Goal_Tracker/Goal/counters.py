@@ -0,0 +1,50 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Goal, Milestone
+
+# Goal.milestone_count / completed_count are kept up to date incrementally by the
+# write paths. recount() rebuilds them from the milestone rows in a single UPDATE,
+# for batch writes that touch many goals and for repairing drift.
+
+
+def _milestone_count(**filters):
+    counts = (
+        Milestone.objects.filter(goal=OuterRef("pk"), **filters)
+        .order_by()
+        .values("goal")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def recount(goals=None):
+    """Recompute the counters of `goals` (a Goal queryset, default all) and return the rows updated."""
+    if goals is None:
+        goals = Goal.objects.all()
+    return goals.update(
+        milestone_count=_milestone_count(),
+        completed_count=_milestone_count(status=True),
+    )
+
+
+def progress_filter(completed):
+    """Q object matching goals whose milestones are all done (or not)."""
+    done = Q(milestone_count__gt=0, milestone_count=F("completed_count"))
+    return done if completed else ~done
+
+
+def goal_progress(goal_id):
+    completed, total = Goal.objects.filter(id=goal_id).values_list('completed_count', 'milestone_count').first() or (0, 0)
+    return {"goalId": goal_id, "completed": completed, "total": total}
+
+
+async def agoal_progress(goal_id):
+    completed, total = await Goal.objects.filter(id=goal_id).values_list('completed_count', 'milestone_count').afirst() or (0, 0)
+    return {"goalId": goal_id, "completed": completed, "total": total}
+
+
+def with_live_counts(goals):
+    """Annotate `goals` with live_total / live_completed counted straight from the milestone rows."""
+    return goals.annotate(live_total=_milestone_count(), live_completed=_milestone_count(status=True))
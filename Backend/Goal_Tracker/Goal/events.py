@@ -0,0 +1,151 @@
+import asyncio
+import threading
+
+from django.conf import settings
+
+from .sync import changes_since
+
+# In-process pub/sub behind the /events/ stream. A committed write publishes the
+# user's delta (the same shape /sync/ returns, paired with the version it starts
+# from) to every open stream of that user in this process, so tabs stay current
+# without refetching. Each subscriber has a bounded queue; a client too slow to
+# drain it loses the backlog and its stream catches up from the database with
+# one changes_since() call instead.
+#
+# Streams served by other worker processes do not see these events. They notice
+# the new data_version on their next heartbeat and catch up the same way.
+
+# Put on a subscriber's queue in place of its backlog when the queue overflows
+OVERFLOW = object()
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class Subscriber:
+    def __init__(self, user_id, loop, max_queued):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(max_queued)
+        self.overflowed = False
+
+    def offer(self, event):
+        # Only ever called on the subscriber's own event loop
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+
+class EventBroker:
+    def __init__(self, max_queued, max_subscribers):
+        self.max_queued = max_queued
+        self.max_subscribers = max_subscribers
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id):
+        """Register a stream for a user; call from the coroutine that will read the queue."""
+        subscriber = Subscriber(user_id, asyncio.get_running_loop(), self.max_queued)
+        with self._lock:
+            subscribers = self._subscribers.setdefault(user_id, set())
+            if len(subscribers) >= self.max_subscribers:
+                raise TooManySubscribers()
+            subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def recover(self, subscriber):
+        # The stream has dropped the backlog and is catching up from the database
+        with self._lock:
+            subscriber.overflowed = False
+            self.overflows += 1
+
+    def has_subscribers(self, user_id):
+        return user_id in self._subscribers
+
+    def publish(self, user_id, event):
+        """Hand an event to every stream of a user. Safe to call from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.published += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.offer, event)
+            except RuntimeError:
+                # The stream's loop has shut down; its finally block unsubscribes it
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+                "published": self.published,
+                "overflows": self.overflows,
+            }
+
+
+broker = EventBroker(
+    max_queued=getattr(settings, "EVENT_STREAM_QUEUE_SIZE", 100),
+    max_subscribers=getattr(settings, "EVENT_STREAM_MAX_PER_USER", 10),
+)
+
+
+def notify(user_id, version):
+    """
+    Publish what changed at `version` to the user's open streams.
+
+    Runs after the write commits. Nothing is read when nobody is listening; when
+    someone is, the delta is read once and shared by all of the user's streams.
+    """
+    if not broker.has_subscribers(user_id):
+        return
+    changes = changes_since(user_id, version - 1)
+    if changes is not None:
+        # Streams behind version - 1 (say, after a write served by another process)
+        # cannot apply this delta and read their own.
+        broker.publish(user_id, (version - 1, changes))
+
+
+class EventStream:
+    """
+    Streaming content for one subscriber.
+
+    Django closes the response once the client is gone or the stream ends, and
+    that close() unsubscribes even if the stream was never iterated.
+    """
+
+    def __init__(self, subscriber, chunks):
+        self.subscriber = subscriber
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self.chunks.__aiter__()
+
+    def close(self):
+        broker.unsubscribe(self.subscriber)
+
+
+def format_event(name, data=None, event_id=None):
+    """Encode one server-sent event; `data` must already be JSON bytes."""
+    lines = []
+    if event_id is not None:
+        lines.append(b"id: %d" % event_id)
+    lines.append(b"event: " + name.encode())
+    lines.append(b"data: " + (data if data is not None else b"{}"))
+    return b"\n".join(lines) + b"\n\n"
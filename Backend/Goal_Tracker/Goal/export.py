@@ -0,0 +1,97 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import Goal, Milestone
+
+# Exports never hold more than one chunk of goals in memory: iterator(chunk_size)
+# reads the goals in batches and the milestones prefetch runs once per batch, and
+# every record is written out as soon as it is built.
+
+DEFAULT_CHUNK_SIZE = 500
+
+CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CSV_HEADER = [
+    "goal_id", "user_id", "title", "description", "category", "priority", "target_date",
+    "milestone_id", "milestone_title", "milestone_status",
+]
+
+
+def export_goals(user_id=None):
+    """Goals to export, all users when `user_id` is None, with their milestones prefetched."""
+    goals = Goal.objects.order_by("id")
+    if user_id is not None:
+        goals = goals.filter(user_id=user_id)
+    milestones = Milestone.objects.order_by("id").only("id", "goal_id", "title", "status")
+    return goals.prefetch_related(Prefetch("milestones", queryset=milestones))
+
+
+def goal_record(goal):
+    return {
+        "id": goal.id,
+        "userId": goal.user_id,
+        "title": goal.title,
+        "description": goal.description,
+        "category": goal.category,
+        "priority": goal.priority,
+        "targetDate": goal.target_date,
+        "milestones": [
+            {"id": milestone.id, "title": milestone.title, "status": milestone.status}
+            for milestone in goal.milestones.all()
+        ],
+    }
+
+
+def _records(goals, chunk_size):
+    for goal in goals.iterator(chunk_size=chunk_size):
+        yield goal_record(goal)
+
+
+def stream_json(goals, chunk_size=DEFAULT_CHUNK_SIZE):
+    yield "["
+    separator = ""
+    for record in _records(goals, chunk_size):
+        yield separator + json.dumps(record, cls=DjangoJSONEncoder)
+        separator = ","
+    yield "]\n"
+
+
+def stream_ndjson(goals, chunk_size=DEFAULT_CHUNK_SIZE):
+    for record in _records(goals, chunk_size):
+        yield json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+class _Echo:
+    # csv.writer only needs write(); hand each formatted line straight back
+    def write(self, value):
+        return value
+
+
+def stream_csv(goals, chunk_size=DEFAULT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_HEADER)
+    for record in _records(goals, chunk_size):
+        goal = [
+            record["id"], record["userId"], record["title"], record["description"],
+            record["category"], record["priority"], record["targetDate"].isoformat(),
+        ]
+        # One row per milestone; goals without milestones still get a row of their own
+        for milestone in record["milestones"] or [None]:
+            if milestone is None:
+                yield writer.writerow(goal + ["", "", ""])
+            else:
+                yield writer.writerow(goal + [milestone["id"], milestone["title"], milestone["status"]])
+
+
+STREAMS = {
+    "json": stream_json,
+    "ndjson": stream_ndjson,
+    "csv": stream_csv,
+}
@@ -0,0 +1,213 @@
+import codecs
+import csv
+import json
+import time
+
+from django.db import transaction
+
+from Goal_Tracker import shards
+
+from . import search
+from .batch import GOAL_FIELDS, clean_goal_data, clean_milestone_data
+from .counters import recount
+from .models import Goal, Milestone
+from .summary import SummaryTracker
+from .versioning import bump_version
+
+# Rows are validated one at a time and buffered; every `batch_size` rows the buffer
+# is written with bulk_create in its own transaction, together with the version bump,
+# milestone counters and dashboard summary. Goal references are kept in memory, so
+# milestones can point at any goal imported earlier in the same file.
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+FORMATS = ("csv", "ndjson")
+
+CSV_GOAL_COLUMNS = {
+    "title": "title",
+    "description": "description",
+    "category": "category",
+    "priority": "priority",
+    "target_date": "targetDate",
+}
+
+
+def _csv_status(value):
+    value = (value or "").strip().lower()
+    if value in ("", "0", "false", "no"):
+        return False
+    if value in ("1", "true", "yes"):
+        return True
+    return value
+
+
+def read_csv(lines):
+    """
+    Yield (row number, item) from CSV lines.
+
+    Columns match export_goals' CSV: a goal_ref (or goal_id) column groups rows into
+    one goal and milestone_title / milestone_status add a milestone to it.
+    """
+    reader = csv.DictReader(lines)
+    for row in reader:
+        row_number = reader.line_num
+        ref = row.get("goal_ref") or row.get("goal_id") or None
+        goal = {key: row.get(column) for column, key in CSV_GOAL_COLUMNS.items()}
+        milestones = []
+        if row.get("milestone_title"):
+            milestones.append({"title": row["milestone_title"], "status": _csv_status(row.get("milestone_status"))})
+        yield row_number, {"type": "goal", "ref": ref, "data": goal, "milestones": milestones}
+
+
+def read_ndjson(lines):
+    """
+    Yield (row number, item) from NDJSON lines.
+
+    A line is either a goal in export_goals' shape, optionally with nested milestones,
+    or {"type": "milestone", "goal_ref": ..., "title": ..., "status": ...}.
+    """
+    for row_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield row_number, {"error": "Invalid JSON data!"}
+            continue
+        if not isinstance(record, dict):
+            yield row_number, {"error": "Invalid row!"}
+        elif record.get("type") == "milestone":
+            yield row_number, {"type": "milestone", "goal_ref": record.get("goal_ref"), "data": record}
+        else:
+            ref = record.get("ref", record.get("id"))
+            yield row_number, {"type": "goal", "ref": ref, "data": record, "milestones": record.get("milestones") or []}
+
+
+READERS = {
+    "csv": read_csv,
+    "ndjson": read_ndjson,
+}
+
+
+class Importer:
+    """Validate and insert goal and milestone rows for one user in batches."""
+
+    def __init__(self, user_id, batch_size=DEFAULT_BATCH_SIZE):
+        self.user_id = user_id
+        self.batch_size = batch_size
+        # ref -> goal id for written goals, or the pending Goal for buffered ones
+        self.refs = {}
+        self.goals = []
+        self.milestones = []
+        self.buffered = 0
+        self.rows = 0
+        self.goals_created = 0
+        self.milestones_created = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def _milestone(self, goal, data):
+        if not isinstance(data, dict):
+            return None, "Invalid milestone!"
+        fields, error = clean_milestone_data({key: data[key] for key in ("title", "status") if key in data})
+        if error:
+            return None, error
+        if not fields.get("title"):
+            return None, "Please fill all the fields!"
+        return Milestone(goal_id=goal if isinstance(goal, int) else None, title=fields["title"],
+                         status=fields.get("status", False)), None
+
+    def add(self, row_number, item):
+        self.rows += 1
+        if "error" in item:
+            return self.error(row_number, item["error"])
+        ref = item.get("goal_ref") if item["type"] == "milestone" else item.get("ref")
+        ref = None if ref is None else str(ref)
+
+        if item["type"] == "goal" and (ref is None or ref not in self.refs):
+            data = item["data"]
+            fields, error = clean_goal_data({key: data.get(key) for key in GOAL_FIELDS if data.get(key) is not None}, partial=False)
+            if error:
+                return self.error(row_number, error)
+            goal = Goal(user_id=self.user_id, **fields)
+            milestones = []
+            for milestone_data in item["milestones"]:
+                milestone, error = self._milestone(None, milestone_data)
+                if error:
+                    return self.error(row_number, error)
+                milestones.append(milestone)
+            if ref is not None:
+                self.refs[ref] = goal
+            self.goals.append(goal)
+            self.milestones.extend((goal, milestone) for milestone in milestones)
+        else:
+            # Further rows for a goal that is already known only add milestones
+            if ref is None or ref not in self.refs:
+                return self.error(row_number, "Unknown goal_ref!")
+            milestones = item["milestones"] if item["type"] == "goal" else [item["data"]]
+            for milestone_data in milestones:
+                milestone, error = self._milestone(self.refs[ref], milestone_data)
+                if error:
+                    return self.error(row_number, error)
+                self.milestones.append((self.refs[ref], milestone))
+
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.goals and not self.milestones:
+            return
+        existing = {goal for goal, _ in self.milestones if isinstance(goal, int)}
+        with transaction.atomic(using=shards.current()):
+            version = bump_version(self.user_id)
+            tracker = SummaryTracker(existing)
+            for goal in self.goals:
+                goal.version = version
+            Goal.objects.bulk_create(self.goals, batch_size=self.batch_size)
+            for goal, milestone in self.milestones:
+                milestone.goal_id = goal if isinstance(goal, int) else goal.id
+                milestone.version = version
+            Milestone.objects.bulk_create([milestone for _, milestone in self.milestones], batch_size=self.batch_size)
+            touched = existing | {milestone.goal_id for _, milestone in self.milestones}
+            recount(Goal.objects.filter(id__in=touched))
+            tracker.apply(goal.id for goal in self.goals)
+            search.reindex(tracker.goal_ids)
+
+        self.goals_created += len(self.goals)
+        self.milestones_created += len(self.milestones)
+        # Later batches reference the goals just written by id
+        self.refs = {ref: goal if isinstance(goal, int) else goal.id for ref, goal in self.refs.items()}
+        self.goals, self.milestones, self.buffered = [], [], 0
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "goalsCreated": self.goals_created,
+            "milestonesCreated": self.milestones_created,
+            "errorCount": self.error_count,
+            "errors": self.errors,
+            "elapsedSeconds": round(elapsed, 3),
+            "rowsPerSecond": round(self.rows / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def import_rows(user_id, lines, import_format, batch_size=DEFAULT_BATCH_SIZE):
+    """Import text `lines` in `import_format` for a user and return the run's stats."""
+    importer = Importer(user_id, batch_size=batch_size)
+    for row_number, item in READERS[import_format](lines):
+        importer.add(row_number, item)
+    importer.flush()
+    return importer.stats()
+
+
+def decode_lines(chunks, encoding="utf-8"):
+    """Decode an iterable of byte lines, such as a request body, as it is read."""
+    return codecs.iterdecode(chunks, encoding)
@@ -0,0 +1,38 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Goal.archive import DEFAULT_BATCH_SIZE, run
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Move finished and long past-due goals into the archive tables, a batch at a time. "
+        "Meant to run on a schedule (e.g. nightly from cron); see ARCHIVE_PAST_DUE_DAYS and ARCHIVE_QUIET_DAYS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only archive this user's goals.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Goals scanned per batch and transaction.")
+        parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches.")
+        parser.add_argument("--dry-run", action="store_true", help="Count the eligible goals without moving them.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        totals = {}
+        for alias in shards.scope(options["user"]):
+            stats = run(options["batch_size"], options["pause"], options["user"], options["dry_run"])
+            for key, value in stats.items():
+                totals[key] = round(totals.get(key, 0) + value, 3)
+            if options["verbosity"] > 1:
+                self.stdout.write("%s: %s" % (alias, json.dumps(stats)))
+
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        self.stdout.write(self.style.SUCCESS(
+            "%s %d goals and %d milestones after scanning %d in %d batches (%.2fs)" % (
+                verb, totals["goals"], totals["milestones"], totals["scanned"], totals["batches"], totals["elapsedSeconds"],
+            )
+        ))
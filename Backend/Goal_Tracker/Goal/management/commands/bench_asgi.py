@@ -0,0 +1,106 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+
+from Goal.benchmarks import run_threads, summarize
+
+# Each mode runs in its own process because the view implementation is picked
+# when the URLconf is imported.
+MODES = {
+    "wsgi": {"GOAL_TRACKER_ASYNC_VIEWS": "0"},
+    "asgi-sync": {"GOAL_TRACKER_ASYNC_VIEWS": "0"},
+    "asgi-async": {"GOAL_TRACKER_ASYNC_VIEWS": "1"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare latency and throughput of the goal API through the WSGI handler, "
+        "the ASGI handler with sync views, and the ASGI handler with native async views. "
+        "Run seed_data first so the target user has goals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, required=True, help="User id whose goal list is requested.")
+        parser.add_argument(
+            "--path", default="/goal/goal/{user}/?sort=id",
+            help="Request path; {user} is substituted. The default bypasses the list cache.",
+        )
+        parser.add_argument("--requests", type=int, default=500, help="Requests per concurrency level.")
+        parser.add_argument("--concurrency", default="1,8,32", help="Comma separated concurrency levels.")
+        parser.add_argument("--modes", default=",".join(MODES), help="Comma separated subset of %s." % ", ".join(MODES))
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--mode", help="Internal: run a single mode in this process.")
+
+    def handle(self, *args, **options):
+        path = options["path"].format(user=options["user"])
+        levels = [int(level) for level in options["concurrency"].split(",")]
+
+        if options["mode"]:
+            # Accept the test clients' host name and stop DEBUG from recording every query.
+            setup_test_environment(debug=False)
+            results = [self.run_mode(options["mode"], path, options["requests"], level) for level in levels]
+            self.stdout.write(json.dumps(results))
+            return
+
+        results = []
+        for mode in options["modes"].split(","):
+            if mode not in MODES:
+                raise CommandError("Unknown mode %r" % mode)
+            argv = [
+                sys.executable, sys.argv[0], "bench_asgi", "--mode", mode,
+                "--user", str(options["user"]), "--path", options["path"],
+                "--requests", str(options["requests"]), "--concurrency", options["concurrency"],
+            ]
+            env = {**os.environ, **MODES[mode], "DJANGO_SETTINGS_MODULE": os.environ["DJANGO_SETTINGS_MODULE"]}
+            output = subprocess.run(argv, env=env, check=True, capture_output=True, text=True).stdout
+            for result in json.loads(output.strip().splitlines()[-1]):
+                results.append(result)
+                self.stdout.write(
+                    "%(mode)-11s c=%(concurrency)-3d %(throughput_rps)8.1f req/s  "
+                    "p50 %(p50_ms)7.2fms  p95 %(p95_ms)7.2fms  p99 %(p99_ms)7.2fms  errors %(errors)d" % result
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"path": path, "results": results}, f, indent=2)
+
+    def run_mode(self, mode, path, total, concurrency):
+        if mode == "wsgi":
+            latencies, errors, elapsed = self.run_wsgi(path, total, concurrency)
+        else:
+            latencies, errors, elapsed = asyncio.run(self.run_asgi(path, total, concurrency))
+        return {"mode": mode, "concurrency": concurrency, "async_views": settings.ASYNC_VIEWS,
+                **summarize(latencies, elapsed, errors)}
+
+    def run_wsgi(self, path, total, concurrency):
+        def sender():
+            client = Client()
+            return lambda: client.get(path).status_code
+
+        return run_threads(sender, total, concurrency)
+
+    async def run_asgi(self, path, total, concurrency):
+        client = AsyncClient()
+        gate = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+
+        async def one():
+            nonlocal errors
+            async with gate:
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code >= 400
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        return latencies, errors, time.perf_counter() - start
@@ -0,0 +1,252 @@
+import datetime
+import itertools
+import json
+import subprocess
+import urllib.error
+import urllib.request
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from Goal import search, urls as goal_urls
+from Goal.benchmarks import run_threads, summarize
+from Goal.counters import recount
+from Goal.models import Goal, Milestone
+from Goal.summary import rebuild
+from User import urls as user_urls
+from User.models import User
+
+
+def goal_body(ctx):
+    return {
+        "id": ctx["user"], "title": "bench goal", "description": "d", "category": "Health",
+        "priority": "Medium", "targetDate": "2025-06-01",
+    }
+
+
+def import_body(ctx):
+    return "\n".join(json.dumps({**goal_body(ctx), "ref": i, "milestones": [{"title": "m"}]}) for i in range(20))
+
+
+# url name -> scenarios of (label, builder). A builder takes the context and returns
+# (method, path, body); bodies that are not strings are sent as JSON.
+SCENARIOS = {
+    "index": [("index", lambda ctx: ("GET", reverse("index"), None))],
+    "goal": [
+        ("goal", lambda ctx: ("GET", reverse("goal", args=[ctx["user"]]), None)),
+        ("goal?sort&limit", lambda ctx: ("GET", reverse("goal", args=[ctx["user"]]) + "?sort=target_date&limit=50", None)),
+        ("goal?fields", lambda ctx: ("GET", reverse("goal", args=[ctx["user"]]) + "?fields=title,progress&completed=false", None)),
+        ("goal?archived", lambda ctx: ("GET", reverse("goal", args=[ctx["user"]]) + "?archived=include&limit=50", None)),
+    ],
+    "sync": [("sync", lambda ctx: ("GET", reverse("sync", args=[ctx["user"]]) + "?since=%d" % ctx["version"], None))],
+    "dashboard": [("dashboard", lambda ctx: ("GET", reverse("dashboard", args=[ctx["user"]]), None))],
+    "search": [
+        ("search", lambda ctx: ("GET", reverse("search", args=[ctx["user"]]) + "?q=learn", None)),
+        ("search?prefix", lambda ctx: ("GET", reverse("search", args=[ctx["user"]]) + "?q=ru&fields=title", None)),
+    ],
+    "export": [("export?ndjson", lambda ctx: ("GET", reverse("export", args=[ctx["user"]]) + "?format=ndjson", None))],
+    "import_goals": [("import_goals", lambda ctx: ("POST", reverse("import_goals", args=[ctx["user"]]), import_body(ctx)))],
+    "create_goal": [("create_goal", lambda ctx: ("POST", reverse("create_goal"), goal_body(ctx)))],
+    "update_goal": [("update_goal", lambda ctx: (
+        "PUT", reverse("update_goal", args=[next(ctx["goals"])]), {"title": "renamed", "priority": "High"},
+    ))],
+    "delete_goal": [("delete_goal", lambda ctx: ("DELETE", reverse("delete_goal", args=[next(ctx["spare_goals"])]), None))],
+    "create_milestone": [("create_milestone", lambda ctx: (
+        "POST", reverse("create_milestone"), {"goal_id": next(ctx["goals"]), "title": "bench step"},
+    ))],
+    "update_milestone": [("update_milestone", lambda ctx: (
+        "PUT", reverse("update_milestone", args=[next(ctx["milestones"])]), {"status": next(ctx["flip"])},
+    ))],
+    "delete_milestone": [("delete_milestone", lambda ctx: (
+        "DELETE", reverse("delete_milestone", args=[next(ctx["spare_milestones"])]), None,
+    ))],
+    "batch": [("batch", lambda ctx: ("POST", reverse("batch"), {"id": ctx["user"], "operations": [
+        {"op": "create", "type": "goal", "ref": "g", "data": {k: v for k, v in goal_body(ctx).items() if k != "id"}},
+        {"op": "create", "type": "milestone", "data": {"goal_ref": "g", "title": "m"}},
+        {"op": "update", "type": "milestone", "id": next(ctx["milestones"]), "data": {"status": True}},
+    ]}))],
+    "createuser": [("createuser", lambda ctx: ("POST", reverse("createuser"), {
+        "name": "bench", "email": "bench-%s@example.com" % uuid.uuid4().hex, "password": ctx["password"],
+    }))],
+    "login": [("login", lambda ctx: ("POST", reverse("login"), {"email": ctx["email"], "password": ctx["password"]}))],
+}
+
+# Endpoints that are not request/response shaped, so latency percentiles say nothing
+# about them, or that use up state a run cannot replenish (each goal restores once)
+UNBENCHED = {"events", "restore_goal"}
+
+
+def url_names():
+    return [pattern.name for module in (goal_urls, user_urls) for pattern in module.urlpatterns if pattern.name]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every endpoint in Goal/urls.py and User/urls.py at several concurrency levels "
+        "and record latency percentiles, throughput and SQL queries per request as JSON. "
+        "Writes change the data, so run it against a database filled by seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="User to drive; defaults to the seeded user with the most goals.")
+        parser.add_argument("--password", default="password123", help="The user's password, for the login endpoint.")
+        parser.add_argument("--endpoints", help="Comma separated url names; defaults to all of them.")
+        parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level.")
+        parser.add_argument("--concurrency", default="1,8", help="Comma separated concurrency levels.")
+        parser.add_argument("--base-url", help="Send requests to a running server instead of the in-process test client.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--compare", help="A previous --output file to print changes against.")
+
+    def handle(self, *args, **options):
+        names = url_names()
+        missing = [name for name in names if name not in SCENARIOS and name not in UNBENCHED]
+        if missing:
+            self.stderr.write("No scenario for: %s" % ", ".join(missing))
+        selected = options["endpoints"].split(",") if options["endpoints"] else [name for name in names if name in SCENARIOS]
+        unknown = [name for name in selected if name not in SCENARIOS]
+        if unknown:
+            raise CommandError("Unknown endpoints: %s" % ", ".join(unknown))
+
+        levels = [int(level) for level in options["concurrency"].split(",")]
+        setup_test_environment(debug=False)
+        ctx = self.context(options, options["requests"] * (len(levels) + 1))
+
+        results = []
+        for name in selected:
+            for label, build in SCENARIOS[name]:
+                queries = self.count_queries(ctx, build) if not options["base_url"] else None
+                for level in levels:
+                    latencies, errors, elapsed = run_threads(
+                        lambda: self.sender(ctx, build, options["base_url"]), options["requests"], level,
+                    )
+                    result = {"endpoint": label, "concurrency": level, "queries": queries, **summarize(latencies, elapsed, errors)}
+                    results.append(result)
+                    self.stdout.write(
+                        "%(endpoint)-18s c=%(concurrency)-3d %(throughput_rps)8.1f req/s  p50 %(p50_ms)8.2fms  "
+                        "p95 %(p95_ms)8.2fms  p99 %(p99_ms)8.2fms  queries %(queries)s  errors %(errors)d" % result
+                    )
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": timezone.now().isoformat(),
+                "target": options["base_url"] or "test-client",
+                "async_views": settings.ASYNC_VIEWS,
+                "sqlite_profile": getattr(settings, "SQLITE_PROFILE", None),
+                "user": ctx["user"],
+                "uncovered": missing,
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def context(self, options, pool_size):
+        user_id = options["user"]
+        if user_id is None:
+            top = User.objects.annotate(n=Count("goals")).order_by("-n").values_list("id", flat=True).first()
+            if top is None:
+                raise CommandError("No users found; run seed_data first")
+            user_id = top
+        user = User.objects.filter(id=user_id).values("email", "data_version").first()
+        if user is None:
+            raise CommandError("User %s not found" % user_id)
+
+        goals = list(Goal.objects.filter(user_id=user_id).values_list("id", flat=True)[:500])
+        milestones = list(Milestone.objects.filter(goal__user_id=user_id).values_list("id", flat=True)[:500])
+        if not goals or not milestones:
+            raise CommandError("User %s needs goals and milestones; run seed_data first" % user_id)
+
+        # Throwaway rows for the delete endpoints, one per request they will send
+        spare_goals = Goal.objects.bulk_create([
+            Goal(user_id=user_id, title="spare", description="d", category="Health", priority="Low",
+                 target_date=datetime.date(2025, 1, 1))
+            for _ in range(pool_size)
+        ])
+        spare_milestones = Milestone.objects.bulk_create([
+            Milestone(goal_id=goals[i % len(goals)], title="spare") for i in range(pool_size)
+        ])
+        recount(Goal.objects.filter(id__in=goals))
+        rebuild([user_id])
+        search.reindex(goals + [goal.id for goal in spare_goals])
+
+        return {
+            "user": user_id,
+            "email": user["email"],
+            "password": options["password"],
+            "version": max(user["data_version"] - 10, 1),
+            "goals": itertools.cycle(goals),
+            "milestones": itertools.cycle(milestones),
+            "flip": itertools.cycle([True, False]),
+            "spare_goals": iter([goal.id for goal in spare_goals]),
+            "spare_milestones": iter([milestone.id for milestone in spare_milestones]),
+        }
+
+    def sender(self, ctx, build, base_url):
+        if base_url:
+            return lambda: self.send_http(base_url, *build(ctx))
+        client = Client(raise_request_exception=False)
+
+        def send():
+            method, path, body = build(ctx)
+            data = body if isinstance(body, str) or body is None else json.dumps(body)
+            response = client.generic(method, path, data or "", content_type="application/json")
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+            return response.status_code
+
+        return send
+
+    def send_http(self, base_url, method, path, body):
+        data = body if isinstance(body, str) or body is None else json.dumps(body)
+        request = urllib.request.Request(
+            base_url.rstrip("/") + path, data=data.encode() if data else None, method=method,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def count_queries(self, ctx, build):
+        send = self.sender(ctx, build, None)
+        with CaptureQueriesContext(connection) as captured:
+            send()
+        return len(captured.captured_queries)
+
+    def compare(self, path, results):
+        with open(path) as f:
+            previous = {(r["endpoint"], r["concurrency"]): r for r in json.load(f)["results"]}
+        self.stdout.write("\nChange against %s:" % path)
+        for result in results:
+            before = previous.get((result["endpoint"], result["concurrency"]))
+            if before is None:
+                continue
+            self.stdout.write("%-18s c=%-3d p50 %+7.1f%%  p95 %+7.1f%%  req/s %+7.1f%%  queries %s -> %s" % (
+                result["endpoint"], result["concurrency"],
+                self.change(before["p50_ms"], result["p50_ms"]), self.change(before["p95_ms"], result["p95_ms"]),
+                self.change(before["throughput_rps"], result["throughput_rps"]), before["queries"], result["queries"],
+            ))
+
+    @staticmethod
+    def change(before, after):
+        return (after - before) / before * 100 if before else 0.0
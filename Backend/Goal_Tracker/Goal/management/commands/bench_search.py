@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from Goal import search
+from Goal.benchmarks import percentile
+from User.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the FTS5 goal search with the LIKE based search it replaced. "
+        "Run seed_data first; the user with the most goals is searched by default."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int)
+        parser.add_argument("--queries", default="marathon,learn span,budget,ru,read books,meditate daily,xyzzy")
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per query; the median is reported.")
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError("The search index needs SQLite FTS5")
+        user_id = options["user"] or User.objects.annotate(n=Count("goals")).order_by("-n").values_list("id", flat=True).first()
+        if user_id is None:
+            raise CommandError("No users found; run seed_data first")
+
+        self.stdout.write("user %d, %d runs per query" % (user_id, options["repeat"]))
+        for query in options["queries"].split(","):
+            fts, fts_hits = self.time(lambda: search.search(user_id, query, options["limit"]), options["repeat"])
+            like, like_hits = self.time(lambda: search.like_search(user_id, query, options["limit"]), options["repeat"])
+            self.stdout.write("%-16r fts %8.3fms (%2d hits)  like %8.3fms (%2d hits)  x%.1f" % (
+                query, fts, len(fts_hits), like, len(like_hits), like / fts if fts else 0.0,
+            ))
+
+    def time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - start)
+        return percentile(timings, 50) * 1000, result
@@ -0,0 +1,113 @@
+import datetime
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from Goal import serializers
+from Goal.benchmarks import percentile
+from Goal.models import Goal, Milestone
+from User.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+def serialize_goal(goal):
+    return {
+        "id": goal.id,
+        "title": goal.title,
+        "description": goal.description,
+        "category": goal.category,
+        "priority": goal.priority,
+        "targetDate": goal.target_date,
+        "progress": {"completed": goal.completed_count, "total": goal.milestone_count},
+        "milestones": [serializers.serialize_milestone(milestone) for milestone in goal.milestones.all()],
+    }
+
+
+def model_path(user_id):
+    # What the list view did before Goal/serializers.py
+    goals = Goal.objects.filter(user_id=user_id).prefetch_related("milestones").order_by("id")
+    return json.dumps([serialize_goal(goal) for goal in goals], cls=DjangoJSONEncoder).encode()
+
+
+def values_path(user_id, fields=serializers.DEFAULT_FIELDS, encoder=None):
+    rows = list(serializers.goal_values(Goal.objects.filter(user_id=user_id).order_by("id"), fields))
+    data = serializers.build_goals(rows, fields)
+    if encoder == "json":
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+    return serializers.dumps(data)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the goal list serialization through model instances against the values() "
+        "path in Goal/serializers.py. Rows are created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000", help="Comma separated goal counts.")
+        parser.add_argument("--milestones", type=int, default=3, help="Milestones per goal.")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per path; the median is reported.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        paths = {
+            "models": model_path,
+            "values+json": lambda user_id: values_path(user_id, encoder="json"),
+            "values+fields": lambda user_id: values_path(user_id, fields=("id", "title", "progress")),
+        }
+        if serializers.orjson is not None:
+            paths["values+orjson"] = values_path
+
+        results = []
+        try:
+            with transaction.atomic():
+                for size in [int(size) for size in options["sizes"].split(",")]:
+                    user = self.populate(size, options["milestones"])
+                    baseline = None
+                    for name, func in paths.items():
+                        result = self.measure(name, func, user.id, size, options["repeat"])
+                        # Speedups are relative to the first (model instance) path
+                        baseline = baseline or result["median_ms"]
+                        result["speedup"] = round(baseline / max(result["median_ms"], 0.01), 2)
+                        results.append(result)
+                        self.stdout.write(
+                            "%(goals)7d goals  %(path)-14s %(median_ms)10.1fms  %(bytes)11d bytes  x%(speedup).2f" % result
+                        )
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"results": results}, f, indent=2)
+
+    def populate(self, size, milestones_per_goal):
+        user = User.objects.create(name="bench", email="bench-%d@example.invalid" % size, password="!")
+        goals = Goal.objects.bulk_create([
+            Goal(
+                user=user, title="goal %d" % i, description="description of goal %d" % i,
+                category="Health", priority="High", target_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=i % 365),
+                milestone_count=milestones_per_goal, completed_count=i % (milestones_per_goal + 1),
+            )
+            for i in range(size)
+        ], batch_size=1000)
+        Milestone.objects.bulk_create([
+            Milestone(goal=goal, title="step %d" % j, status=j < goal.completed_count)
+            for goal in goals
+            for j in range(milestones_per_goal)
+        ], batch_size=1000)
+        return user
+
+    def measure(self, name, func, user_id, size, repeat):
+        timings, size_bytes = [], 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            size_bytes = len(func(user_id))
+            timings.append(time.perf_counter() - start)
+        return {"goals": size, "path": name, "median_ms": round(percentile(timings, 50) * 1000, 2), "bytes": size_bytes}
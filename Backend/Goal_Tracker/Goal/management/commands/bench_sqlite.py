@@ -0,0 +1,179 @@
+import datetime
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from Goal.benchmarks import summarize
+from Goal.models import Goal, Milestone
+from Goal.summary import rebuild
+from User.models import User
+
+PROFILES = ("default", "production")
+
+
+class LockedErrors(logging.Handler):
+    """Count 'database is locked' failures logged by the request handler, per thread."""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = {}
+
+    def emit(self, record):
+        error = record.exc_info[1] if record.exc_info else None
+        if isinstance(error, OperationalError) and "locked" in str(error):
+            self.threads[record.thread] = self.threads.get(record.thread, 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and writers against a scratch SQLite database once per "
+        "connection profile and report throughput, latency and 'database is locked' errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma separated subset of %s." % ", ".join(PROFILES))
+        parser.add_argument("--readers", type=int, default=8, help="Threads listing goals.")
+        parser.add_argument("--writers", type=int, default=4, help="Threads creating goals and toggling milestones.")
+        parser.add_argument("--seconds", type=float, default=10.0, help="How long each profile runs.")
+        parser.add_argument("--goals", type=int, default=200, help="Goals seeded per writer.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--run", action="store_true", help="Internal: run one profile in this process.")
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            setup_test_environment(debug=False)
+            self.stdout.write(json.dumps(self.run(options)))
+            return
+
+        results = []
+        for profile in options["profiles"].split(","):
+            if profile not in PROFILES:
+                raise CommandError("Unknown profile %r" % profile)
+            # The profile is read when settings are imported, so each one gets its own process and database
+            with tempfile.TemporaryDirectory() as scratch:
+                argv = [
+                    sys.executable, sys.argv[0], "bench_sqlite", "--run",
+                    "--readers", str(options["readers"]), "--writers", str(options["writers"]),
+                    "--seconds", str(options["seconds"]), "--goals", str(options["goals"]),
+                ]
+                env = {
+                    **os.environ,
+                    "GOAL_TRACKER_SQLITE_PROFILE": profile,
+                    "GOAL_TRACKER_DB_NAME": os.path.join(scratch, "bench.sqlite3"),
+                }
+                output = subprocess.run(argv, env=env, check=True, capture_output=True, text=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            for kind in ("reads", "writes"):
+                self.stdout.write(
+                    "%-10s %-6s %8.1f req/s  p50 %7.2fms  p95 %7.2fms  p99 %7.2fms  errors %d (locked %d)" % (
+                        profile, kind, result[kind]["throughput_rps"], result[kind]["p50_ms"],
+                        result[kind]["p95_ms"], result[kind]["p99_ms"], result[kind]["errors"], result[kind]["locked"],
+                    )
+                )
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"results": results}, f, indent=2)
+
+    def seed(self, writers, goals_per_writer):
+        users = User.objects.bulk_create([
+            User(name="writer %d" % i, email="writer%d@example.invalid" % i, password="!") for i in range(writers)
+        ])
+        goals = Goal.objects.bulk_create([
+            Goal(
+                user=user, title="goal %d" % i, description="d", category="Health", priority="High",
+                target_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=i % 365), milestone_count=2,
+            )
+            for user in users
+            for i in range(goals_per_writer)
+        ], batch_size=1000)
+        milestones = Milestone.objects.bulk_create([
+            Milestone(goal=goal, title="step %d" % i) for goal in goals for i in range(2)
+        ], batch_size=1000)
+        rebuild()
+        by_user = {user.id: [] for user in users}
+        for milestone in milestones:
+            by_user[milestone.goal.user_id].append(milestone.id)
+        return by_user
+
+    def run(self, options):
+        call_command("migrate", verbosity=0)
+        milestones = self.seed(options["writers"], options["goals"])
+        user_ids = list(milestones)
+        connections.close_all()
+
+        stop = threading.Event()
+        stats = {"reads": [], "writes": []}
+        lock = threading.Lock()
+        # Test clients in different threads share the exception signal, so errors are
+        # read from status codes and classified from the request log of their own thread.
+        locked = LockedErrors()
+        logging.getLogger("django.request").addHandler(locked)
+
+        def reader(i):
+            client = Client(raise_request_exception=False)
+            path = "/goal/goal/%d/?sort=id&limit=50" % user_ids[i % len(user_ids)]
+            self.loop(stop, stats, lock, "reads", lambda: client.get(path))
+
+        def writer(i):
+            client = Client(raise_request_exception=False)
+            user_id = user_ids[i % len(user_ids)]
+            own = milestones[user_id]
+            state = {"n": 0}
+
+            def write():
+                state["n"] += 1
+                if state["n"] % 2:
+                    return client.post("/goal/create_goal/", json.dumps({
+                        "id": user_id, "title": "t", "description": "d", "category": "Health",
+                        "priority": "Low", "targetDate": "2025-06-01",
+                    }), content_type="application/json")
+                return client.put("/goal/update_milestone/%d/" % own[state["n"] % len(own)], json.dumps({
+                    "status": bool(state["n"] % 4),
+                }), content_type="application/json")
+
+            self.loop(stop, stats, lock, "writes", write)
+
+        threads = {"reads": [], "writes": []}
+        threads["reads"] = [threading.Thread(target=reader, args=(i,)) for i in range(options["readers"])]
+        threads["writes"] = [threading.Thread(target=writer, args=(i,)) for i in range(options["writers"])]
+        start = time.perf_counter()
+        for thread in threads["reads"] + threads["writes"]:
+            thread.start()
+        time.sleep(options["seconds"])
+        stop.set()
+        for thread in threads["reads"] + threads["writes"]:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        logging.getLogger("django.request").removeHandler(locked)
+
+        result = {"profile": settings.SQLITE_PROFILE, "readers": options["readers"], "writers": options["writers"]}
+        for kind, samples in stats.items():
+            result[kind] = {
+                **summarize([latency for latency, _ in samples], elapsed, sum(failed for _, failed in samples)),
+                "locked": sum(locked.threads.get(thread.ident, 0) for thread in threads[kind]),
+            }
+        return result
+
+    def loop(self, stop, stats, lock, kind, request):
+        samples = []
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = request()
+            samples.append((time.perf_counter() - start, response.status_code >= 400))
+        connections.close_all()
+        with lock:
+            stats[kind].extend(samples)
@@ -0,0 +1,64 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROFILES = ("full", "api")
+
+# Keys reported by Goal_Tracker.startup, in the order they are printed
+MEASURES = ("import_ms", "first_response_ms", "ready_ms", "process_ms", "modules", "request_us", "overhead_us")
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh worker processes under each settings profile and report the median "
+        "import time, time to first response and per-request middleware overhead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default=",".join(PROFILES), help="Comma separated subset of %s." % ", ".join(PROFILES))
+        parser.add_argument("--runs", type=int, default=7, help="Processes started per profile.")
+        parser.add_argument("--path", default="/goal/index/", help="Path requested by each process.")
+        parser.add_argument("--requests", type=int, default=2000, help="Warm requests used to measure overhead.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        results = []
+        for profile in options["profiles"].split(","):
+            if profile not in PROFILES:
+                raise CommandError("Unknown profile %r" % profile)
+            # Settings are read once per process, so every run is a new interpreter
+            env = {**os.environ, "GOAL_TRACKER_PROFILE": profile}
+            argv = [sys.executable, "-m", "Goal_Tracker.startup", options["path"], str(options["requests"])]
+            runs = []
+            for _ in range(options["runs"]):
+                start = time.perf_counter()
+                output = subprocess.run(argv, env=env, cwd=settings.BASE_DIR, check=True, capture_output=True, text=True).stdout
+                run = json.loads(output.strip().splitlines()[-1])
+                run["process_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                if run["status"] >= 400:
+                    raise CommandError("%s answered %s with %d" % (profile, options["path"], run["status"]))
+                runs.append(run)
+
+            result = {"profile": profile, "path": options["path"], "runs": len(runs)}
+            result.update({key: round(statistics.median(run[key] for run in runs), 2) for key in MEASURES})
+            results.append(result)
+            self.stdout.write(
+                "%-5s import %7.1fms  first response %6.1fms  ready %7.1fms  process %7.1fms  "
+                "modules %4d  request %6.1fus  overhead %6.1fus" % tuple([profile] + [result[key] for key in MEASURES])
+            )
+
+        if len(results) > 1:
+            base, lean = results[0], results[-1]
+            self.stdout.write("%s vs %s: %s" % (lean["profile"], base["profile"], ", ".join(
+                "%s %+.1f%%" % (key, (lean[key] - base[key]) / base[key] * 100) for key in MEASURES if base[key]
+            )))
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump({"results": results}, f, indent=2)
@@ -0,0 +1,34 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Goal.summary import check, rebuild
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = "Compare the dashboard summary table against a fresh aggregate of the goal and milestone rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only check this user's summary.")
+        parser.add_argument("--fix", action="store_true", help="Rebuild the summary of every user with a mismatch.")
+
+    def handle(self, *args, **options):
+        user_ids = [options["user"]] if options["user"] else None
+        mismatches, fixed = [], 0
+        for _ in shards.scope(options["user"]):
+            found = check(user_ids)
+            for mismatch in found:
+                self.stdout.write(json.dumps(mismatch, default=str))
+            if found and options["fix"]:
+                users = sorted({mismatch["user_id"] for mismatch in found})
+                rebuild(users)
+                fixed += len(users)
+            mismatches += found
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Summary is consistent"))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS("Rebuilt the summary of %d users" % fixed))
+        else:
+            raise CommandError("%d summary buckets differ from the goal rows" % len(mismatches))
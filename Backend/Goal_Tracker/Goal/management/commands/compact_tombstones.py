@@ -0,0 +1,20 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Goal.sync import compact_tombstones
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = "Delete delta-sync tombstones older than the retention window."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=30, help="Keep tombstones younger than this many days.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options["days"])
+        removed = sum(compact_tombstones(cutoff, batch_size=options["batch_size"]) for _ in shards.scope())
+        self.stdout.write(self.style.SUCCESS("Removed %d tombstones older than %s" % (removed, cutoff.isoformat())))
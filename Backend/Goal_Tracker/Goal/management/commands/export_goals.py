@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Goal.export import DEFAULT_CHUNK_SIZE, STREAMS, export_goals
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = "Stream goals and milestones as JSON, NDJSON or CSV, for one user or everyone."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(STREAMS), default="ndjson")
+        parser.add_argument("--user", type=int, help="Only export this user's goals.")
+        parser.add_argument("--output", help="Write to this file instead of stdout.")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Goals read per query.")
+
+    def handle(self, *args, **options):
+        if shards.enabled() and not options["user"] and options["format"] != "ndjson":
+            # One document per shard would not concatenate into valid JSON or CSV
+            raise CommandError("Exporting every user from several shards needs --format ndjson")
+        out = open(options["output"], "w", newline="") if options["output"] else sys.stdout
+        try:
+            for _ in shards.scope(options["user"]):
+                out.writelines(STREAMS[options["format"]](export_goals(options["user"]), chunk_size=options["chunk_size"]))
+        finally:
+            if out is not sys.stdout:
+                out.close()
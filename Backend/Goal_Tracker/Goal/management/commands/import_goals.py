@@ -0,0 +1,43 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Goal.importer import DEFAULT_BATCH_SIZE, FORMATS, import_rows
+from Goal_Tracker import shards
+from User.models import User
+
+
+class Command(BaseCommand):
+    help = "Bulk import goals and milestones for a user from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for stdin.")
+        parser.add_argument("--user", type=int, required=True, help="User who will own the imported goals.")
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Rows per insert transaction.")
+
+    def handle(self, *args, **options):
+        if not User.objects.filter(id=options["user"]).exists():
+            raise CommandError("User %s not found" % options["user"])
+        import_format = options["format"] or options["path"].rsplit(".", 1)[-1].lower()
+        if import_format not in FORMATS:
+            raise CommandError("Cannot tell the format of %s; pass --format" % options["path"])
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        with shards.for_user(options["user"]):
+            if options["path"] == "-":
+                stats = import_rows(options["user"], sys.stdin, import_format, batch_size=options["batch_size"])
+            else:
+                with open(options["path"], newline="", encoding="utf-8") as f:
+                    stats = import_rows(options["user"], f, import_format, batch_size=options["batch_size"])
+
+        for error in stats["errors"]:
+            self.stderr.write("row %(row)s: %(error)s" % error)
+        self.stdout.write(self.style.SUCCESS(
+            "Imported %(goalsCreated)d goals and %(milestonesCreated)d milestones from %(rows)d rows "
+            "in %(elapsedSeconds).2fs (%(rowsPerSecond).0f rows/s), %(errorCount)d errors" % stats
+        ))
+        if options["verbosity"] > 1:
+            self.stdout.write(json.dumps(stats))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from Goal.models import Goal
+from Goal_Tracker import shards
+from User.models import User, UserShard
+
+
+class Command(BaseCommand):
+    help = (
+        "Move users to the shard the hash ring assigns them, or one user to --to. "
+        "Users stay online: reads are served throughout and writes get a 503 with "
+        "Retry-After for the few seconds their rows are being copied."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only move this user.")
+        parser.add_argument("--to", help="Shard to move --user to, instead of the one the ring picks.")
+        parser.add_argument("--limit", type=int, help="Move at most this many users.")
+        parser.add_argument("--drain", type=float, default=2.0, help="Seconds to let in-flight writes finish before copying.")
+        parser.add_argument("--dry-run", action="store_true", help="Only print the moves.")
+
+    def handle(self, *args, **options):
+        if not shards.enabled():
+            raise CommandError("No shards configured; set GOAL_TRACKER_SHARDS to the shard files.")
+        if options["to"] and not options["user"]:
+            raise CommandError("--to needs --user")
+        if options["to"] and options["to"] not in shards.aliases():
+            raise CommandError("Unknown shard %r, pick one of %s" % (options["to"], ", ".join(shards.aliases())))
+
+        moves = []
+        users = User.objects.using("default").order_by("id").values_list("id", flat=True)
+        if options["user"]:
+            users = users.filter(id=options["user"])
+            if not users:
+                raise CommandError("User %s not found" % options["user"])
+        ring = shards.ring()
+        directory = dict(UserShard.objects.using("default").values_list("user_id", "alias"))
+        for user_id in users.iterator():
+            source = directory.get(user_id, "default")
+            target = options["to"] or ring.place(user_id)
+            if source != target:
+                moves.append((user_id, source, target))
+        moves = moves[:options["limit"]]
+
+        moved = goals = 0
+        for user_id, source, target in moves:
+            if options["dry_run"]:
+                with shards.use(source):
+                    count = Goal.objects.filter(user_id=user_id).aggregate(count=Count("id"))["count"]
+                self.stdout.write("user %d: %s -> %s (%d goals)" % (user_id, source, target, count))
+                continue
+            start = time.perf_counter()
+            try:
+                count = shards.move_user(user_id, target, drain=options["drain"])
+            except shards.MoveAborted as e:
+                self.stderr.write("user %d: %s, left on %s" % (user_id, e, source))
+                continue
+            moved += 1
+            goals += count
+            self.stdout.write("user %d: %s -> %s, %d goals in %.1fms" % (
+                user_id, source, target, count, (time.perf_counter() - start) * 1000,
+            ))
+
+        if not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS("Moved %d of %d users (%d goals)" % (moved, len(moves), goals)))
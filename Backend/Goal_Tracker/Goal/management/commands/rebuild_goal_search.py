@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Goal import search
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from the goal and milestone rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only reindex this user's goals.")
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError("The search index needs SQLite FTS5")
+        user_ids = [options["user"]] if options["user"] else None
+        written = sum(search.rebuild(user_ids) for _ in shards.scope(options["user"]))
+        self.stdout.write(self.style.SUCCESS("Indexed %d goals" % written))
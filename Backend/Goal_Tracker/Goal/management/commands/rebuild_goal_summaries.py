@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from Goal.summary import rebuild
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard summary table from the goal and milestone rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only rebuild this user's summary.")
+
+    def handle(self, *args, **options):
+        user_ids = [options["user"]] if options["user"] else None
+        written = sum(rebuild(user_ids) for _ in shards.scope(options["user"]))
+        self.stdout.write(self.style.SUCCESS("Wrote %d summary buckets" % written))
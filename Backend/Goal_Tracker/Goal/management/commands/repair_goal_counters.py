@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from Goal.counters import recount
+from Goal.models import Goal
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = "Recompute Goal.milestone_count and completed_count from the milestone rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, help="Only repair this user's goals.")
+
+    def handle(self, *args, **options):
+        updated = 0
+        for _ in shards.scope(options["user"]):
+            goals = Goal.objects.all()
+            if options["user"]:
+                goals = goals.filter(user_id=options["user"])
+            updated += recount(goals)
+        self.stdout.write(self.style.SUCCESS("Recounted milestones for %d goals" % updated))
@@ -0,0 +1,106 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from Goal import search
+from Goal.models import Goal, Milestone
+from Goal.summary import rebuild
+from User.models import User
+
+CATEGORY_WEIGHTS = {"Health": 25, "Career": 20, "Finance": 15, "Personal": 15, "Education": 15, "Wellness": 10}
+PRIORITY_WEIGHTS = {"High": 20, "Medium": 50, "Low": 30}
+TITLES = {
+    "Health": ["Run a half marathon", "Drink more water", "Cut down on sugar", "Walk 10k steps a day"],
+    "Career": ["Get promoted", "Learn system design", "Ship the side project", "Find a mentor"],
+    "Finance": ["Build an emergency fund", "Pay off the card", "Start investing", "Track every expense"],
+    "Personal": ["Read 20 books", "Learn to cook", "Call family weekly", "Declutter the flat"],
+    "Education": ["Finish the online course", "Learn Spanish", "Pass the certification", "Study statistics"],
+    "Wellness": ["Meditate daily", "Sleep by 11pm", "Journal every evening", "Take a digital detox"],
+}
+STEPS = ["Plan", "Research", "First draft", "Week 1", "Week 2", "Halfway", "Review", "Final push", "Wrap up"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed users, goals and milestones with skewed, realistic distributions for load "
+        "tests and benchmarks. Every seeded user can log in with --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--goals", type=float, default=20, help="Mean goals per user; the spread is long-tailed.")
+        parser.add_argument("--milestones", type=float, default=4, help="Mean milestones per goal.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; also part of the seeded emails.")
+        parser.add_argument("--password", default="password123")
+        parser.add_argument("--batch-size", type=int, default=500, help="Users written per transaction.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        email = "seed%d-%%d@example.com" % options["seed"]
+        if User.objects.filter(email=email % 0).exists():
+            raise CommandError("Users for --seed %d already exist; pick another seed" % options["seed"])
+        # Hash once: every seeded user shares the password and hashing is deliberately slow
+        password = make_password(options["password"])
+        today = timezone.localdate()
+
+        started = time.perf_counter()
+        totals = {"users": 0, "goals": 0, "milestones": 0}
+        for first in range(0, options["users"], options["batch_size"]):
+            count = min(options["batch_size"], options["users"] - first)
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(name="Seed user %d" % i, email=email % i, password=password) for i in range(first, first + count)
+                ])
+                goals, steps = [], []
+                for user in users:
+                    # Most users keep a few goals, a few keep very many
+                    for _ in range(min(int(rng.expovariate(1 / options["goals"])), int(options["goals"] * 10))):
+                        goal, milestones = self.make_goal(rng, user, today, options["milestones"])
+                        goals.append(goal)
+                        steps.append(milestones)
+                Goal.objects.bulk_create(goals, batch_size=1000)
+                milestones = []
+                for goal, goal_steps in zip(goals, steps):
+                    for milestone in goal_steps:
+                        milestone.goal = goal
+                        milestones.append(milestone)
+                Milestone.objects.bulk_create(milestones, batch_size=1000)
+                rebuild([user.id for user in users])
+                search.reindex([goal.id for goal in goals])
+            totals["users"] += len(users)
+            totals["goals"] += len(goals)
+            totals["milestones"] += len(milestones)
+
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        self.stdout.write(self.style.SUCCESS(
+            "Seeded %(users)d users, %(goals)d goals and %(milestones)d milestones" % totals
+            + " in %.1fs (emails %s)" % (time.perf_counter() - started, email.replace("%d", "N"))
+        ))
+
+    def make_goal(self, rng, user, today, mean_milestones):
+        category = rng.choices(list(CATEGORY_WEIGHTS), weights=list(CATEGORY_WEIGHTS.values()))[0]
+        target_date = today + datetime.timedelta(days=rng.randint(-180, 365))
+        # Goals already past their date are more likely to be done
+        done_odds = 0.7 if target_date < today else 0.3
+        milestones = [
+            Milestone(title=STEPS[i % len(STEPS)], status=rng.random() < done_odds)
+            for i in range(rng.randint(0, int(mean_milestones * 2)))
+        ]
+        goal = Goal(
+            user=user,
+            title=rng.choice(TITLES[category]),
+            description="Seeded %s goal" % category.lower(),
+            category=category,
+            priority=rng.choices(list(PRIORITY_WEIGHTS), weights=list(PRIORITY_WEIGHTS.values()))[0],
+            target_date=target_date,
+            milestone_count=len(milestones),
+            completed_count=sum(milestone.status for milestone in milestones),
+        )
+        return goal, milestones
@@ -0,0 +1,46 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Goal.reminders import DEFAULT_BATCH_SIZE, run_once
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue due-soon and overdue goal reminders and deliver them. Runs once (e.g. from cron), "
+        "or keeps running as a worker with --interval; see the REMINDER_* settings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0, help="Run every this many seconds instead of once.")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Goals read per scan query.")
+        parser.add_argument("--no-deliver", action="store_true", help="Only queue reminders, leave sending to another worker.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        if options["interval"] < 0:
+            raise CommandError("--interval must not be negative")
+
+        while True:
+            self.run(options)
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
+
+    def run(self, options):
+        totals = {}
+        for alias in shards.scope():
+            stats = run_once(deliver_reminders=not options["no_deliver"], batch_size=options["batch_size"])
+            for key, value in stats.items():
+                totals[key] = round(totals.get(key, 0) + value, 2)
+            if options["verbosity"] > 1:
+                self.stdout.write("%s: %s" % (alias, json.dumps(stats)))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Queued %d reminders after scanning %d goals, sent %d, skipped %d, failed %d (%.1fms)" % (
+                totals["queued"], totals["scanned"], totals["sent"], totals["skipped"], totals["failed"], totals["elapsedMs"],
+            )
+        ))
@@ -0,0 +1,32 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from Goal_Tracker import shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Migrate every shard database named in GOAL_TRACKER_SHARDS and start each one's "
+        "goal tables at its own id range, so goal and milestone ids never collide."
+    )
+
+    def handle(self, *args, **options):
+        if not shards.enabled():
+            raise CommandError("No shards configured; set GOAL_TRACKER_SHARDS to the shard files.")
+        # Check every shard before migrating any, rather than failing halfway through
+        for alias in shards.aliases():
+            vendor = connections[alias].vendor
+            if vendor not in shards.ID_RANGE_VENDORS:
+                raise CommandError(
+                    "Shard %r uses %s, but shard id ranges only work on %s."
+                    % (alias, vendor, " or ".join(shards.ID_RANGE_VENDORS))
+                )
+        for alias in shards.aliases():
+            call_command("migrate", database=alias, verbosity=max(0, options["verbosity"] - 1))
+            # 'default' keeps the ids it already handed out
+            if alias != "default":
+                start = shards.reserve_ids(alias)
+                self.stdout.write("%s: migrated, new ids from %d" % (alias, start + 1))
+            else:
+                self.stdout.write("%s: migrated" % alias)
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over the read replica files named in "
+        "GOAL_TRACKER_REPLICAS, once or every --interval seconds. A local stand-in "
+        "for replication: the replicas lag the primary by up to one interval."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=0, help="Seconds between snapshots; 0 takes one and exits.")
+
+    def handle(self, *args, **options):
+        if not settings.REPLICA_DATABASES:
+            raise CommandError("No replicas configured; set GOAL_TRACKER_REPLICAS to the replica files.")
+        if connection.vendor != "sqlite":
+            raise CommandError("Snapshots only work with SQLite databases.")
+
+        while True:
+            for alias in settings.REPLICA_DATABASES:
+                start = time.perf_counter()
+                self.snapshot(settings.DATABASES["default"]["NAME"], settings.DATABASES[alias]["NAME"])
+                self.stdout.write("%s <- default in %.1fms" % (alias, (time.perf_counter() - start) * 1000))
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def snapshot(self, source_name, target_name):
+        # The online backup API copies a consistent snapshot while the primary keeps taking
+        # writes, and swaps the pages in under a lock so replica readers never see half a copy.
+        timeout = settings.SQLITE_PRAGMAS["busy_timeout"] / 1000
+        source = sqlite3.connect(source_name, timeout=timeout)
+        target = sqlite3.connect(target_name, timeout=timeout)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Goal', '0007_initial'),
+        ('User', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['user', 'target_date', 'id'], name='goal_user_target_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['user', 'title', 'id'], name='goal_user_title_idx'),
+        ),
+    ]
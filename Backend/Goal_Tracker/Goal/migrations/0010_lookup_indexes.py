@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Goal', '0009_delta_sync'),
+        ('User', '0004_user_email_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['user', 'category'], name='goal_user_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='milestone',
+            index=models.Index(fields=['goal', 'status'], name='milestone_goal_status_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:16
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Goal = apps.get_model('Goal', 'Goal')
+    Milestone = apps.get_model('Goal', 'Milestone')
+    db = schema_editor.connection.alias
+
+    def count(**filters):
+        counts = Milestone.objects.using(db).filter(goal=OuterRef('pk'), **filters).order_by().values('goal').annotate(n=Count('id')).values('n')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    Goal.objects.using(db).update(milestone_count=count(), completed_count=count(status=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Goal', '0010_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goal',
+            name='completed_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='goal',
+            name='milestone_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
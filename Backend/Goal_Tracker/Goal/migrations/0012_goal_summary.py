@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def backfill_summary(apps, schema_editor):
+    Goal = apps.get_model('Goal', 'Goal')
+    GoalSummary = apps.get_model('Goal', 'GoalSummary')
+    db = schema_editor.connection.alias
+
+    done = Q(milestone_count__gt=0, milestone_count=F('completed_count'))
+    rows = Goal.objects.using(db).order_by().values('user_id', 'category', 'priority', 'target_date').annotate(
+        goal_count=Count('id'),
+        completed_goal_count=Count('id', filter=done),
+        total=Sum('milestone_count'),
+        completed=Sum('completed_count'),
+    )
+    GoalSummary.objects.using(db).bulk_create([
+        GoalSummary(
+            user_id=row['user_id'], category=row['category'], priority=row['priority'], target_date=row['target_date'],
+            goal_count=row['goal_count'], completed_goal_count=row['completed_goal_count'],
+            milestone_count=row['total'], completed_milestone_count=row['completed'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Goal', '0011_goal_milestone_counters'),
+        ('User', '0004_user_email_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoalSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('Health', 'Health'), ('Career', 'Career'), ('Finance', 'Finance'), ('Personal', 'Personal'), ('Education', 'Education'), ('Wellness', 'Wellness')], max_length=200)),
+                ('priority', models.CharField(choices=[('High', 'High'), ('Medium', 'Medium'), ('Low', 'Low')], max_length=200)),
+                ('target_date', models.DateField()),
+                ('goal_count', models.IntegerField(default=0)),
+                ('completed_goal_count', models.IntegerField(default=0)),
+                ('milestone_count', models.IntegerField(default=0)),
+                ('completed_milestone_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_summaries', to='User.user')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'category', 'priority', 'target_date'), name='goal_summary_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
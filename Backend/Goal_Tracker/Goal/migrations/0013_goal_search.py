@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:41
+
+from django.db import migrations
+
+# FTS5 index over goal title, description and milestone titles, see Goal/search.py.
+# SQLite only; other databases fall back to LIKE searches.
+
+CREATE = """
+CREATE VIRTUAL TABLE goal_search USING fts5(
+    owner, title, description, milestones,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+BACKFILL = """
+INSERT INTO goal_search (rowid, owner, title, description, milestones)
+SELECT g.id, 'u' || g.user_id, g.title, g.description,
+       COALESCE((SELECT group_concat(m.title, ' ') FROM "Goal_milestone" m WHERE m.goal_id = g.id), '')
+FROM "Goal_goal" g
+"""
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE)
+        schema_editor.execute(BACKFILL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE goal_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Goal', '0012_goal_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
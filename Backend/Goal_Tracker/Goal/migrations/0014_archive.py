@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Goal', '0013_goal_search'),
+        ('User', '0006_usershard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGoal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('category', models.CharField(choices=[('Health', 'Health'), ('Career', 'Career'), ('Finance', 'Finance'), ('Personal', 'Personal'), ('Education', 'Education'), ('Wellness', 'Wellness')], max_length=200)),
+                ('priority', models.CharField(choices=[('High', 'High'), ('Medium', 'Medium'), ('Low', 'Low')], max_length=200)),
+                ('target_date', models.DateField()),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('milestone_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_goals', to='User.user')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedMilestone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('status', models.BooleanField(default=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+                ('goal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='milestones', to='Goal.archivedgoal')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedgoal',
+            index=models.Index(fields=['user', 'target_date', 'id'], name='archived_user_target_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedgoal',
+            index=models.Index(fields=['user', 'title', 'id'], name='archived_user_title_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Goal', '0014_archive'),
+        ('User', '0006_usershard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('due_soon', 'Due soon'), ('overdue', 'Overdue')], max_length=20)),
+                ('target_date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('next_attempt_at', models.DateTimeField(null=True)),
+                ('claim', models.CharField(blank=True, max_length=32)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, max_length=20)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReminderMark',
+            fields=[
+                ('kind', models.CharField(choices=[('due_soon', 'Due soon'), ('overdue', 'Overdue')], max_length=20, primary_key=True, serialize=False)),
+                ('scanned_through', models.DateField()),
+                ('scanned_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='goal',
+            index=models.Index(fields=['target_date', 'updated_at'], name='goal_target_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='goal',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='Goal.goal'),
+        ),
+        migrations.AddField(
+            model_name='reminder',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='User.user'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('delivered_at__isnull', True)), fields=['next_attempt_at'], name='reminder_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reminder',
+            index=models.Index(condition=models.Q(('delivered_at__isnull', True)), fields=['claim'], name='reminder_claim_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminder',
+            constraint=models.UniqueConstraint(fields=('goal', 'kind', 'target_date'), name='reminder_once'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+# Summary buckets keyed on the exact target date came to about one row per goal.
+# They are now keyed on the target month, and rebuilt from the goal rows.
+
+
+def _rebuild(apps, schema_editor, field, bucket):
+    Goal = apps.get_model('Goal', 'Goal')
+    GoalSummary = apps.get_model('Goal', 'GoalSummary')
+    db = schema_editor.connection.alias
+
+    GoalSummary.objects.using(db).all().delete()
+    done = Q(milestone_count__gt=0, milestone_count=F('completed_count'))
+    rows = Goal.objects.using(db).order_by().values('user_id', 'category', 'priority', bucket=bucket).annotate(
+        goal_count=Count('id'),
+        completed_goal_count=Count('id', filter=done),
+        total=Sum('milestone_count'),
+        completed=Sum('completed_count'),
+    )
+    GoalSummary.objects.using(db).bulk_create([
+        GoalSummary(
+            user_id=row['user_id'], category=row['category'], priority=row['priority'], **{field: row['bucket']},
+            goal_count=row['goal_count'], completed_goal_count=row['completed_goal_count'],
+            milestone_count=row['total'], completed_milestone_count=row['completed'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+def by_month(apps, schema_editor):
+    _rebuild(apps, schema_editor, 'target_month', TruncMonth('target_date'))
+
+
+def by_day(apps, schema_editor):
+    _rebuild(apps, schema_editor, 'target_date', F('target_date'))
+
+
+def clear(apps, schema_editor):
+    apps.get_model('Goal', 'GoalSummary').objects.using(schema_editor.connection.alias).all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Goal', '0015_reminders'),
+    ]
+
+    operations = [
+        # Going back, the per-day rows are rebuilt once the old column is in place
+        migrations.RunPython(migrations.RunPython.noop, by_day),
+        migrations.RemoveConstraint(
+            model_name='goalsummary',
+            name='goal_summary_bucket',
+        ),
+        migrations.RenameField(
+            model_name='goalsummary',
+            old_name='target_date',
+            new_name='target_month',
+        ),
+        migrations.AddConstraint(
+            model_name='goalsummary',
+            constraint=models.UniqueConstraint(fields=('user', 'category', 'priority', 'target_month'), name='goal_summary_bucket'),
+        ),
+        migrations.RunPython(by_month, clear),
+    ]
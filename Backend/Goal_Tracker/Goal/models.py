@@ -26,14 +26,184 @@ class Goal(models.Model):
     category = models.CharField(max_length=200, choices=CATEGORY_CHOICES)
     priority = models.CharField(max_length=200, choices=PRIORITY_CHOICES)
     target_date = models.DateField()
+    # User.data_version at the time of the last change, used by delta sync.
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by the milestone write paths with F() updates; see Goal/counters.py.
+    milestone_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination walks a user's goals in (sort key, id) order.
+            models.Index(fields=['user', 'target_date', 'id'], name='goal_user_target_date_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='goal_user_title_idx'),
+            models.Index(fields=['user', 'version'], name='goal_user_version_idx'),
+            models.Index(fields=['user', 'category'], name='goal_user_category_idx'),
+            # The reminder scheduler range-scans target dates across all users, and spots
+            # goals re-dated since its last run without reading their rows.
+            models.Index(fields=['target_date', 'updated_at'], name='goal_target_date_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+# Write goals and milestones through Goal/mutations.py (the views, batch endpoint and
+# admin all do); a bare save() or delete() leaves the counters, summary and search
+# index behind until repair_goal_counters / rebuild_goal_summaries / rebuild_goal_search.
 class Milestone(models.Model):
     goal = models.ForeignKey(Goal, on_delete=models.CASCADE, related_name='milestones')
     title = models.CharField(max_length=200)
     status = models.BooleanField(default=False)
-    
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['goal', 'version'], name='milestone_goal_version_idx'),
+            models.Index(fields=['goal', 'status'], name='milestone_goal_status_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+class Tombstone(models.Model):
+    """Marker left behind by a delete so delta sync can report it."""
+
+    KIND_CHOICES = [
+        ('goal', 'Goal'),
+        ('milestone', 'Milestone'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tombstones')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    version = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'version'], name='tombstone_user_version_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_at_idx'),
+        ]
+
+    def __str__(self):
+        return "%s %s" % (self.kind, self.object_id)
+
+class GoalSummary(models.Model):
+    """
+    Per-user goal and milestone totals bucketed by category, priority and target month.
+
+    Kept current by the write paths through Goal/summary.py so the dashboard never
+    has to aggregate all of a user's goals and milestones.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='goal_summaries')
+    category = models.CharField(max_length=200, choices=Goal.CATEGORY_CHOICES)
+    priority = models.CharField(max_length=200, choices=Goal.PRIORITY_CHOICES)
+    # First day of the month the goals are due in
+    target_month = models.DateField()
+    goal_count = models.IntegerField(default=0)
+    completed_goal_count = models.IntegerField(default=0)
+    milestone_count = models.IntegerField(default=0)
+    completed_milestone_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category', 'priority', 'target_month'], name='goal_summary_bucket'),
+        ]
+
+    def __str__(self):
+        return "%s %s %s %s" % (self.user_id, self.category, self.priority, self.target_month)
+
+class ArchivedGoal(models.Model):
+    """
+    A goal moved out of the hot tables by archive_goals, with its original id.
+
+    Same columns as Goal so the listing filters, sorts and serializers work on
+    both; see Goal/archive.py.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_goals')
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    category = models.CharField(max_length=200, choices=Goal.CATEGORY_CHOICES)
+    priority = models.CharField(max_length=200, choices=Goal.PRIORITY_CHOICES)
+    target_date = models.DateField()
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+    milestone_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'target_date', 'id'], name='archived_user_target_date_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='archived_user_title_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+class ArchivedMilestone(models.Model):
+    goal = models.ForeignKey(ArchivedGoal, on_delete=models.CASCADE, related_name='milestones')
+    title = models.CharField(max_length=200)
+    status = models.BooleanField(default=False)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return self.title
+
+class Reminder(models.Model):
+    """
+    Outbox row for one "due soon" or "overdue" notification.
+
+    At most one per goal, kind and target date, so rescanning a date range never
+    queues a reminder twice. See Goal/reminders.py.
+    """
+
+    KIND_CHOICES = [
+        ('due_soon', 'Due soon'),
+        ('overdue', 'Overdue'),
+    ]
+
+    goal = models.ForeignKey(Goal, on_delete=models.CASCADE, related_name='reminders')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    target_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Pending rows are picked up once next_attempt_at passes; claiming one pushes it out by
+    # the lease so a crashed worker's rows are retried, and giving up clears it.
+    next_attempt_at = models.DateTimeField(null=True)
+    claim = models.CharField(max_length=32, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['goal', 'kind', 'target_date'], name='reminder_once'),
+        ]
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'], condition=models.Q(delivered_at__isnull=True), name='reminder_pending_idx',
+            ),
+            models.Index(fields=['claim'], condition=models.Q(delivered_at__isnull=True), name='reminder_claim_idx'),
+        ]
+
+    def __str__(self):
+        return "%s %s %s" % (self.kind, self.goal_id, self.target_date)
+
+
+class ReminderMark(models.Model):
+    """High-water mark of the reminder scheduler: target dates up to `scanned_through` are queued."""
+
+    kind = models.CharField(max_length=20, primary_key=True, choices=Reminder.KIND_CHOICES)
+    scanned_through = models.DateField()
+    # Start of the last run; goals saved after it are checked again for late re-dating
+    scanned_at = models.DateTimeField()
+
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return "%s through %s" % (self.kind, self.scanned_through)
@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models import F
+
+from Goal_Tracker import shards
+
+from . import search
+from .models import Goal, Milestone
+from .summary import SummaryTracker
+from .sync import record_tombstones
+from .versioning import bump_version
+
+# Every single-object write goes through these helpers so the version bump,
+# tombstones, milestone counters, dashboard summary, search index and the row
+# change always commit together. The
+# async views call them through sync_to_async because transactions are not
+# available in async code.
+
+# Columns an edit may touch; the milestone counters are left to the F() updates below.
+GOAL_EDIT_FIELDS = ['title', 'description', 'category', 'priority', 'target_date', 'version', 'updated_at']
+
+
+def _adjust_counters(goal_id, milestones=0, completed=0):
+    if milestones or completed:
+        tracker = SummaryTracker([goal_id])
+        Goal.objects.filter(id=goal_id).update(
+            milestone_count=F('milestone_count') + milestones,
+            completed_count=F('completed_count') + completed,
+        )
+        tracker.apply()
+
+
+def save_goal(goal):
+    with transaction.atomic(using=shards.current()):
+        goal.version = bump_version(goal.user_id)
+        tracker = SummaryTracker([goal.pk] if goal.pk else [])
+        if goal.pk is None:
+            goal.save()
+        else:
+            goal.save(update_fields=GOAL_EDIT_FIELDS)
+        tracker.apply([goal.pk])
+        search.reindex([goal.pk])
+
+
+def delete_goal(goal):
+    with transaction.atomic(using=shards.current()):
+        version = bump_version(goal.user_id)
+        milestone_ids = list(goal.milestones.values_list('id', flat=True))
+        record_tombstones(goal.user_id, version, 'goal', [goal.id])
+        record_tombstones(goal.user_id, version, 'milestone', milestone_ids)
+        tracker = SummaryTracker([goal.id])
+        goal.delete()
+        tracker.apply()
+        search.reindex([goal.id])
+
+
+def save_milestone(milestone, user_id):
+    milestone.status = Milestone._meta.get_field('status').to_python(milestone.status)
+    with transaction.atomic(using=shards.current()):
+        milestone.version = bump_version(user_id)
+        if milestone.pk is None:
+            milestone.save()
+            _adjust_counters(milestone.goal_id, milestones=1, completed=int(milestone.status))
+            search.reindex([milestone.goal_id])
+            return
+        # Flip the status with a conditional UPDATE so the counter moves by exactly
+        # the rows that really changed, even when two requests race.
+        flipped = Milestone.objects.filter(id=milestone.pk).exclude(status=milestone.status).update(status=milestone.status)
+        milestone.save()
+        if flipped:
+            _adjust_counters(milestone.goal_id, completed=1 if milestone.status else -1)
+        search.reindex([milestone.goal_id])
+
+
+def delete_milestone(milestone, user_id):
+    with transaction.atomic(using=shards.current()):
+        version = bump_version(user_id)
+        record_tombstones(user_id, version, 'milestone', [milestone.id])
+        # Split on status so the counters follow what was actually deleted.
+        if Milestone.objects.filter(id=milestone.pk, status=True).delete()[0]:
+            _adjust_counters(milestone.goal_id, milestones=-1, completed=-1)
+        elif Milestone.objects.filter(id=milestone.pk).delete()[0]:
+            _adjust_counters(milestone.goal_id, milestones=-1)
+        search.reindex([milestone.goal_id])
+
@@ -0,0 +1,166 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+from .counters import progress_filter
+from .models import Goal
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Sort keys accepted by the goal listing, mapped to the model field they order on.
+# Every ordering is completed with the primary key so the keyset stays unique.
+SORT_FIELDS = {
+    "id": "id",
+    "target_date": "target_date",
+    "title": "title",
+    "progress": "progress",
+}
+
+
+class InvalidQuery(ValueError):
+    """Raised when the listing query parameters cannot be applied."""
+
+
+def parse_sort(value):
+    value = value or "id"
+    descending = value.startswith("-")
+    key = value[1:] if descending else value
+    if key not in SORT_FIELDS:
+        raise InvalidQuery("Invalid sort order!")
+    return value, SORT_FIELDS[key], descending
+
+
+def parse_limit(value):
+    if value in (None, ""):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidQuery("Invalid limit!")
+    if limit < 1:
+        raise InvalidQuery("Invalid limit!")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise InvalidQuery("Invalid date: %s" % value)
+
+
+def encode_cursor(sort, goal, field):
+    # Pages are value rows from the serializers, carrying the sort column
+    value, goal_id = goal[field], goal["id"]
+    if isinstance(value, datetime.date):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, goal_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sort, field):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError):
+        raise InvalidQuery("Invalid cursor!")
+    # A cursor only makes sense for the ordering it was issued under.
+    if cursor_sort != sort or isinstance(last_id, bool) or not isinstance(last_id, int):
+        raise InvalidQuery("Invalid cursor!")
+    # Forged cursors must fail here with a 400, not in the keyset filter
+    if field in ("title", "target_date") and not isinstance(value, str):
+        raise InvalidQuery("Invalid cursor!")
+    if field == "progress" and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        raise InvalidQuery("Invalid cursor!")
+    if field == "id" and value != last_id:
+        raise InvalidQuery("Invalid cursor!")
+    if field == "target_date":
+        value = _parse_date(value)
+    return value, last_id
+
+
+def filter_goals(queryset, params):
+    """Apply the category/priority/target date/completion filters from `params`."""
+    categories = params.getlist("category")
+    if categories:
+        valid = {choice for choice, _ in Goal.CATEGORY_CHOICES}
+        if not set(categories) <= valid:
+            raise InvalidQuery("Invalid category!")
+        queryset = queryset.filter(category__in=categories)
+
+    priorities = params.getlist("priority")
+    if priorities:
+        valid = {choice for choice, _ in Goal.PRIORITY_CHOICES}
+        if not set(priorities) <= valid:
+            raise InvalidQuery("Invalid priority!")
+        queryset = queryset.filter(priority__in=priorities)
+
+    if params.get("target_date_from"):
+        queryset = queryset.filter(target_date__gte=_parse_date(params["target_date_from"]))
+    if params.get("target_date_to"):
+        queryset = queryset.filter(target_date__lte=_parse_date(params["target_date_to"]))
+
+    completed = params.get("completed")
+    if completed:
+        # Answered from the goal's own milestone counters, without touching milestones.
+        if completed not in ("true", "false"):
+            raise InvalidQuery("Invalid completed flag!")
+        queryset = queryset.filter(progress_filter(completed == "true"))
+
+    return queryset
+
+
+def order_goals(queryset, sort):
+    _, field, descending = parse_sort(sort)
+    if field == "progress":
+        # Completed share of milestones; goals without milestones count as 0.
+        queryset = queryset.annotate(progress=Case(
+            When(milestone_count=0, then=Value(0.0)),
+            default=F("completed_count") * 1.0 / F("milestone_count"),
+            output_field=FloatField(),
+        ))
+    if field == "id":
+        return queryset.order_by("-id" if descending else "id")
+    if descending:
+        return queryset.order_by("-" + field, "-id")
+    return queryset.order_by(field, "id")
+
+
+def page_queryset(queryset, params):
+    """
+    Narrow `queryset` to one keyset page, returning (page queryset, page info).
+
+    The page is located with a WHERE clause on the sort key instead of an OFFSET,
+    so fetching page 1000 costs the same as fetching page 1. One extra row is
+    selected so split_page() can tell whether another page follows.
+    """
+    sort, field, descending = parse_sort(params.get("sort"))
+    limit = parse_limit(params.get("limit"))
+    queryset = order_goals(queryset, sort)
+
+    cursor = params.get("cursor")
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, field)
+        if field == "id":
+            queryset = queryset.filter(id__lt=last_id) if descending else queryset.filter(id__gt=last_id)
+        elif descending:
+            queryset = queryset.filter(Q(**{field + "__lt": value}) | Q(**{field: value, "id__lt": last_id}))
+        else:
+            queryset = queryset.filter(Q(**{field + "__gt": value}) | Q(**{field: value, "id__gt": last_id}))
+
+    return queryset[:limit + 1], (sort, field, limit)
+
+
+def split_page(goals, page_info):
+    """Trim the look-ahead row from a fetched page and build the next cursor."""
+    sort, field, limit = page_info
+    next_cursor = None
+    if len(goals) > limit:
+        goals = goals[:limit]
+        next_cursor = encode_cursor(sort, goals[-1], field)
+    return goals, next_cursor
+
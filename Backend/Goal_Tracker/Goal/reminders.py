@@ -0,0 +1,180 @@
+import datetime
+import time
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from Goal_Tracker import shards
+from User.models import User
+
+from .counters import progress_filter
+from .models import Goal, Reminder, ReminderMark
+
+# "Due soon" reminders go out for goals whose target date comes within
+# REMINDER_DUE_SOON_DAYS, "overdue" ones the day after an unfinished goal's target
+# date has passed. Instead of scanning every goal on each run, the scheduler keeps a
+# high-water mark per kind (ReminderMark) and only range-scans the target dates
+# that entered its window since the last run, through the (target_date, updated_at)
+# index. A goal re-dated into the already scanned due-soon window is found by a
+# second range scan over that window limited to goals saved since the last run.
+# Goals moved into the past by an edit are not reminded as overdue.
+#
+# Reminders are queued in the Reminder outbox, one per goal, kind and target date,
+# and delivered separately: a batch is claimed with a lease, each reminder is sent
+# with its own stable idempotency key, and failures are retried with backoff.
+
+DUE_SOON = "due_soon"
+OVERDUE = "overdue"
+DEFAULT_BATCH_SIZE = 500
+
+
+def _mark(kind, today, now):
+    # A fresh database starts at today instead of reminding about every goal ever due
+    mark, _ = ReminderMark.objects.get_or_create(
+        kind=kind, defaults={"scanned_through": today - datetime.timedelta(days=1), "scanned_at": now},
+    )
+    return mark
+
+
+def _queue(kind, goals, stats):
+    # Conflicts are reminders queued by an earlier run; counting over the batch's goals
+    # (the unique index's prefix) tells how many were new.
+    queued = Reminder.objects.filter(kind=kind, goal_id__in=[goal[0] for goal in goals])
+    before = queued.count()
+    Reminder.objects.bulk_create([
+        Reminder(goal_id=goal_id, user_id=user_id, kind=kind, target_date=target_date, next_attempt_at=timezone.now())
+        for goal_id, user_id, target_date in goals
+    ], ignore_conflicts=True)
+    stats["queued"] += queued.count() - before
+
+
+def _scan(kind, goals, batch_size, stats):
+    """Queue reminders for the unfinished `goals`, walked in (target_date, id) keyset batches."""
+    goals = goals.filter(progress_filter(False)).order_by("target_date", "id").values_list("id", "user_id", "target_date")
+    last = None
+    while True:
+        batch = goals
+        if last is not None:
+            batch = batch.filter(Q(target_date__gt=last[2]) | Q(target_date=last[2], id__gt=last[0]))
+        batch = list(batch[:batch_size])
+        if not batch:
+            return
+        stats["scanned"] += len(batch)
+        _queue(kind, batch, stats)
+        last = batch[-1]
+
+
+def schedule(today=None, now=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Queue the reminders that became due since the last run on the current shard."""
+    now = now or timezone.now()
+    today = today or timezone.localdate(now)
+    stats = {"scanned": 0, "queued": 0}
+    windows = {
+        DUE_SOON: today + datetime.timedelta(days=settings.REMINDER_DUE_SOON_DAYS),
+        OVERDUE: today - datetime.timedelta(days=1),
+    }
+    for kind, high in windows.items():
+        with transaction.atomic(using=shards.current()):
+            mark = _mark(kind, today, now)
+            low = mark.scanned_through
+            if kind == DUE_SOON:
+                # Dates already scanned, or that left the window while no run happened, only
+                # need the goals saved since the last run; earlier ones are queued already.
+                low = max(low, today - datetime.timedelta(days=1))
+                late = Goal.objects.filter(target_date__gte=today, target_date__lte=low, updated_at__gte=mark.scanned_at)
+                _scan(kind, late, batch_size, stats)
+            if high > low:
+                _scan(kind, Goal.objects.filter(target_date__gt=low, target_date__lte=high), batch_size, stats)
+            mark.scanned_through = max(mark.scanned_through, high)
+            mark.scanned_at = now
+            mark.save()
+    return stats
+
+
+def idempotency_key(reminder):
+    return "reminder-%s-%s-%s" % (reminder.goal_id, reminder.kind, reminder.target_date.isoformat())
+
+
+def send_email(reminder, goal, user):
+    """Default REMINDER_SENDER: one email per reminder with a Message-ID derived from its key."""
+    if reminder.kind == DUE_SOON:
+        subject = "Goal due %s: %s" % (goal.target_date.isoformat(), goal.title)
+    else:
+        subject = "Goal overdue: %s" % goal.title
+    body = "Hi %s,\n\n\"%s\" was due %s and is %d/%d milestones along.\n" % (
+        user.name, goal.title, goal.target_date.isoformat(), goal.completed_count, goal.milestone_count,
+    )
+    message = EmailMessage(subject, body, to=[user.email], headers={
+        # A retried send repeats the Message-ID, so mail systems can drop the duplicate
+        "Message-ID": "<%s@goal-tracker>" % idempotency_key(reminder),
+    })
+    message.send()
+
+
+def _claim(batch_size, now):
+    token = uuid.uuid4().hex
+    ids = list(
+        Reminder.objects.filter(delivered_at__isnull=True, next_attempt_at__lte=now)
+        .order_by("next_attempt_at").values_list("id", flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    lease = now + datetime.timedelta(seconds=settings.REMINDER_LEASE_SECONDS)
+    # Only rows still unclaimed are taken, so two workers never send the same reminder
+    Reminder.objects.filter(id__in=ids, delivered_at__isnull=True, next_attempt_at__lte=now).update(
+        claim=token, next_attempt_at=lease,
+    )
+    return list(Reminder.objects.filter(claim=token, delivered_at__isnull=True).order_by("id"))
+
+
+def deliver(batch_size=100, now=None, sender=None):
+    """Send the pending reminders of the current shard and return (sent, skipped, failed)."""
+    sender = sender or import_string(settings.REMINDER_SENDER)
+    now = now or timezone.now()
+    sent = skipped = failed = 0
+    while True:
+        reminders = _claim(batch_size, now)
+        if not reminders:
+            return sent, skipped, failed
+        goals = Goal.objects.in_bulk([reminder.goal_id for reminder in reminders])
+        users = User.objects.in_bulk([reminder.user_id for reminder in reminders])
+        for reminder in reminders:
+            goal = goals.get(reminder.goal_id)
+            done = {"claim": "", "delivered_at": timezone.now()}
+            finished = goal is not None and goal.milestone_count and goal.milestone_count == goal.completed_count
+            if goal is None or finished or goal.target_date != reminder.target_date:
+                # Re-dated or finished since it was queued; the new date gets its own reminder
+                Reminder.objects.filter(id=reminder.id).update(outcome="skipped", **done)
+                skipped += 1
+                continue
+            try:
+                sender(reminder, goal, users[reminder.user_id])
+            except Exception as e:
+                attempts = reminder.attempts + 1
+                retry = None
+                if attempts < settings.REMINDER_MAX_ATTEMPTS:
+                    retry = timezone.now() + datetime.timedelta(seconds=settings.REMINDER_RETRY_SECONDS * 2 ** (attempts - 1))
+                Reminder.objects.filter(id=reminder.id).update(
+                    claim="", attempts=attempts, next_attempt_at=retry, last_error=repr(e)[:1000],
+                    outcome="" if retry else "failed",
+                )
+                failed += 1
+                continue
+            Reminder.objects.filter(id=reminder.id).update(outcome="sent", attempts=reminder.attempts + 1, **done)
+            sent += 1
+
+
+def run_once(today=None, deliver_reminders=True, batch_size=DEFAULT_BATCH_SIZE):
+    """One scheduler pass over the current shard, returning its stats."""
+    started = time.perf_counter()
+    stats = schedule(today=today, batch_size=batch_size)
+    stats.update(sent=0, skipped=0, failed=0)
+    if deliver_reminders:
+        stats["sent"], stats["skipped"], stats["failed"] = deliver()
+    stats["elapsedMs"] = round((time.perf_counter() - started) * 1000, 2)
+    return stats
@@ -0,0 +1,122 @@
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from Goal_Tracker import shards
+from Goal_Tracker.routers import read_database
+
+from .models import Goal
+from .pagination import InvalidQuery
+
+# Full-text search over goal titles, descriptions and milestone titles through the
+# SQLite FTS5 table goal_search (migration 0013). There is one document per goal,
+# keyed by the goal id as rowid; the owner column holds "u<user id>" so a search is
+# an intersection of the user's postings with the query's instead of a filter over
+# every match. The write paths call reindex() with the goals they touched, inside
+# their transaction.
+
+MAX_TERMS = 8
+TERM = re.compile(r"(\w+)(\*?)")
+# bm25 weights per column: owner, title, description, milestones
+RANK = "bm25(goal_search, 0.0, 10.0, 2.0, 4.0)"
+
+
+def available():
+    return connections[shards.current()].vendor == "sqlite"
+
+
+def _in_clause(ids):
+    return ",".join(["%s"] * len(ids))
+
+
+def reindex(goal_ids):
+    """Refresh the search documents of `goal_ids`; ids of deleted goals just drop out."""
+    ids = [goal_id for goal_id in set(goal_ids) if goal_id is not None]
+    if not ids or not available():
+        return
+    with connections[shards.current()].cursor() as cursor:
+        # Keep each statement well inside SQLite's bound parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            cursor.execute("DELETE FROM goal_search WHERE rowid IN (%s)" % _in_clause(chunk), chunk)
+            cursor.execute(
+                """
+                INSERT INTO goal_search (rowid, owner, title, description, milestones)
+                SELECT g.id, 'u' || g.user_id, g.title, g.description,
+                       COALESCE((SELECT group_concat(m.title, ' ') FROM "Goal_milestone" m WHERE m.goal_id = g.id), '')
+                FROM "Goal_goal" g WHERE g.id IN (%s)
+                """ % _in_clause(chunk),
+                chunk,
+            )
+
+
+def rebuild(user_ids=None):
+    """Rebuild the index for `user_ids` (default everyone) and return the documents written."""
+    if not available():
+        return 0
+    goals = Goal.objects.all() if user_ids is None else Goal.objects.filter(user_id__in=user_ids)
+    with connections[shards.current()].cursor() as cursor:
+        if user_ids is None:
+            cursor.execute("DELETE FROM goal_search")
+        else:
+            for user_id in user_ids:
+                cursor.execute("DELETE FROM goal_search WHERE goal_search MATCH %s", ['owner:u%d' % user_id])
+    ids = list(goals.values_list("id", flat=True))
+    reindex(ids)
+    if user_ids is None:
+        with connections[shards.current()].cursor() as cursor:
+            cursor.execute("INSERT INTO goal_search (goal_search) VALUES ('optimize')")
+    return len(ids)
+
+
+def match_expression(user_id, query):
+    """
+    Build the FTS5 query for a user's search box input.
+
+    Words are matched as quoted phrases so FTS5 operators in the input are inert.
+    The last word is a prefix match as the user is probably still typing it, and
+    any word can be made one by ending it with *.
+    """
+    terms = TERM.findall(query.lower())[:MAX_TERMS]
+    if not terms:
+        raise InvalidQuery("Please enter a search term!")
+    last = len(terms) - 1
+    parts = ['"%s"%s' % (word, "*" if star or i == last else "") for i, (word, star) in enumerate(terms)]
+    return "owner:u%d AND %s" % (int(user_id), " AND ".join(parts))
+
+
+# Columns a snippet may come from. The owner column matches every query, so left to
+# pick (-1) FTS5 would often quote the owner token instead of the user's text.
+SNIPPET_COLUMNS = (1, 2, 3)
+SNIPPET = "snippet(goal_search, %d, char(2), char(3), '...', 12)"
+
+
+def best_snippet(snippets):
+    # The column with the most highlighted terms wins, the title on a tie; the control
+    # characters only stand in for the brackets until then so stored text can't skew it
+    best = max(snippets, key=lambda snippet: snippet.count("\x02"))
+    return best.replace("\x02", "[").replace("\x03", "]")
+
+
+def search(user_id, query, limit=20):
+    """Return [(goal id, score, snippet)] best match first."""
+    expression = match_expression(user_id, query)
+    snippets = ", ".join(SNIPPET % column for column in SNIPPET_COLUMNS)
+    # Raw SQL skips the database router, so ask it which copy this request reads from
+    with connections[read_database()].cursor() as cursor:
+        cursor.execute(
+            "SELECT rowid, %s, %s FROM goal_search "
+            "WHERE goal_search MATCH %%s ORDER BY 2 LIMIT %%s" % (RANK, snippets),
+            [expression, limit],
+        )
+        # bm25 scores are small on small indexes; rounding them would flatten the ranking
+        return [(row[0], -row[1], best_snippet(row[2:])) for row in cursor.fetchall()]
+
+
+def like_search(user_id, query, limit=20):
+    """The LIKE based search the index replaces; also the fallback on other databases."""
+    goals = Goal.objects.filter(user_id=user_id)
+    for word, _ in TERM.findall(query.lower())[:MAX_TERMS]:
+        goals = goals.filter(Q(title__icontains=word) | Q(description__icontains=word) | Q(milestones__title__icontains=word))
+    return list(goals.distinct().order_by("id").values_list("id", flat=True)[:limit])
@@ -0,0 +1,152 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from Goal_Tracker import metrics
+
+from .models import Goal, Milestone
+from .pagination import InvalidQuery
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - the stdlib encoder is used instead
+    orjson = None
+
+# List responses skip model instances entirely: goals are read with values(), the
+# milestones of a page come from one values_list() query per chunk of goal ids and
+# are grouped under their goal in a single pass, and the result is encoded straight
+# to bytes, with orjson when it is installed.
+
+# Response key -> columns it is built from.
+GOAL_COLUMNS = {
+    "id": ("id",),
+    "title": ("title",),
+    "description": ("description",),
+    "category": ("category",),
+    "priority": ("priority",),
+    "targetDate": ("target_date",),
+    "progress": ("completed_count", "milestone_count"),
+    "milestones": (),
+}
+DEFAULT_FIELDS = tuple(GOAL_COLUMNS)
+
+# Keeps each milestone query well inside SQLite's bound parameter limit.
+MILESTONE_CHUNK = 900
+
+
+def parse_fields(value):
+    """Parse ?fields=title,progress into a tuple of response keys; id is always included."""
+    if not value:
+        return DEFAULT_FIELDS
+    fields = ["id"]
+    for name in value.split(","):
+        name = name.strip()
+        if name not in GOAL_COLUMNS:
+            raise InvalidQuery("Invalid field: %s" % name)
+        if name not in fields:
+            fields.append(name)
+    return tuple(fields)
+
+
+def goal_columns(fields, extra=()):
+    columns = []
+    for name in fields:
+        columns.extend(column for column in GOAL_COLUMNS[name] if column not in columns)
+    columns.extend(column for column in extra if column not in columns)
+    return columns
+
+
+def goal_values(queryset, fields, extra=()):
+    """
+    Values queryset of the columns `fields` need, plus `extra` ones such as a sort key.
+
+    Any prefetch on `queryset` is dropped; milestones are loaded by build_goals().
+    """
+    return queryset.prefetch_related(None).values(*goal_columns(fields, extra))
+
+
+def milestone_queries(rows, model=Milestone):
+    ids = [row["id"] for row in rows]
+    for start in range(0, len(ids), MILESTONE_CHUNK):
+        yield (
+            model.objects.filter(goal_id__in=ids[start:start + MILESTONE_CHUNK])
+            .order_by("goal_id", "id")
+            .values_list("goal_id", "id", "title", "status")
+        )
+
+
+def assemble(rows, fields, milestone_rows=()):
+    """Turn goal value rows and (goal_id, id, title, status) milestone rows into response dicts."""
+    with metrics.timer("serialize"):
+        return _assemble(rows, fields, milestone_rows)
+
+
+def _assemble(rows, fields, milestone_rows):
+    milestones = {}
+    if "milestones" in fields:
+        for row in rows:
+            milestones[row["id"]] = []
+        for goal_id, milestone_id, title, status in milestone_rows:
+            milestones[goal_id].append({"id": milestone_id, "title": title, "status": status})
+
+    data = []
+    for row in rows:
+        goal = {}
+        for name in fields:
+            if name == "targetDate":
+                goal[name] = row["target_date"]
+            elif name == "progress":
+                goal[name] = {"completed": row["completed_count"], "total": row["milestone_count"]}
+            elif name == "milestones":
+                goal[name] = milestones[row["id"]]
+            else:
+                goal[name] = row[name]
+        data.append(goal)
+    return data
+
+
+def build_goals(rows, fields, milestones=Milestone):
+    """Response dicts for already fetched goal rows, loading their milestones if asked for."""
+    milestone_rows = []
+    if "milestones" in fields:
+        for query in milestone_queries(rows, milestones):
+            milestone_rows.extend(query)
+    return assemble(rows, fields, milestone_rows)
+
+
+async def abuild_goals(rows, fields):
+    milestone_rows = []
+    if "milestones" in fields:
+        for query in milestone_queries(rows):
+            milestone_rows.extend([row async for row in query])
+    return assemble(rows, fields, milestone_rows)
+
+
+def serialize_milestone(milestone):
+    return {
+        "id": milestone.id,
+        "title": milestone.title,
+        "status": milestone.status,
+    }
+
+
+def saved_goal(goal_id):
+    """
+    Re-read a goal after a write and serialize it the way the list endpoints do, so a
+    create or update echoes the stored values rather than what the client sent.
+    """
+    rows = list(goal_values(Goal.objects.filter(id=goal_id), DEFAULT_FIELDS))
+    return build_goals(rows, DEFAULT_FIELDS)[0]
+
+
+async def asaved_goal(goal_id):
+    rows = [row async for row in goal_values(Goal.objects.filter(id=goal_id), DEFAULT_FIELDS)]
+    return (await abuild_goals(rows, DEFAULT_FIELDS))[0]
+
+
+def dumps(data):
+    """Encode response data to JSON bytes."""
+    with metrics.timer("serialize"):
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
@@ -0,0 +1,192 @@
+import datetime
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from Goal_Tracker import shards
+
+from .counters import progress_filter, with_live_counts
+from .models import Goal, GoalSummary
+
+# GoalSummary holds one row of totals per (user, category, priority, target month)
+# so the dashboard reads a handful of rows instead of aggregating every goal. The
+# write paths snapshot the goals they touch before and after the change and fold
+# the difference into the matching buckets inside the same transaction.
+#
+# Overdue and due-this-week need the day, so the dashboard takes those from the
+# summary only for months wholly in the past, and counts the few goals due in the
+# months around today straight from the (user, target_date) index.
+
+BUCKET_FIELDS = ("user_id", "category", "priority", "target_month")
+GOAL_FIELDS = ("user_id", "category", "priority", "target_date")
+COUNT_FIELDS = ("goal_count", "completed_goal_count", "milestone_count", "completed_milestone_count")
+
+
+def _counts(milestones, completed):
+    # A goal only counts as completed once it has milestones and all of them are done
+    return (1, int(milestones > 0 and milestones == completed), milestones, completed)
+
+
+def _bucket(user_id, category, priority, target_date):
+    return (user_id, category, priority, target_date.replace(day=1))
+
+
+def _next_month(day):
+    return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def snapshot(goal_ids):
+    """Map goal id -> (bucket, counts) for the goals that currently exist."""
+    rows = Goal.objects.filter(id__in=goal_ids).values_list(
+        "id", *GOAL_FIELDS, "milestone_count", "completed_count"
+    )
+    return {row[0]: (_bucket(*row[1:5]), _counts(*row[5:])) for row in rows}
+
+
+def apply_changes(before, after):
+    """Move each goal's contribution from its `before` bucket to its `after` bucket."""
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for snapshots, sign in ((before, -1), (after, 1)):
+        for bucket, counts in snapshots.values():
+            for i, n in enumerate(counts):
+                deltas[bucket][i] += sign * n
+
+    for bucket, delta in deltas.items():
+        if not any(delta):
+            continue
+        key = dict(zip(BUCKET_FIELDS, bucket))
+        updated = GoalSummary.objects.filter(**key).update(**{
+            field: F(field) + n for field, n in zip(COUNT_FIELDS, delta)
+        })
+        if not updated:
+            GoalSummary.objects.create(**key, **dict(zip(COUNT_FIELDS, delta)))
+
+
+class SummaryTracker:
+    """
+    Snapshot goals before a write and apply the difference to the summary afterwards.
+
+    Must be used inside the transaction doing the write. Goals created by the write
+    are passed to apply() since their ids are not known up front.
+    """
+
+    def __init__(self, goal_ids=()):
+        self.goal_ids = set(goal_ids)
+        self.before = snapshot(self.goal_ids) if self.goal_ids else {}
+
+    def apply(self, goal_ids=()):
+        self.goal_ids.update(goal_ids)
+        apply_changes(self.before, snapshot(self.goal_ids))
+
+
+def fresh_aggregate(user_ids=None):
+    """Recompute the summary buckets from the goal and milestone rows themselves."""
+    goals = Goal.objects.all()
+    if user_ids is not None:
+        goals = goals.filter(user_id__in=user_ids)
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    rows = with_live_counts(goals).values_list(*GOAL_FIELDS, "live_total", "live_completed")
+    for row in rows.iterator(chunk_size=2000):
+        for i, n in enumerate(_counts(*row[4:])):
+            totals[_bucket(*row[:4])][i] += n
+    return {bucket: tuple(counts) for bucket, counts in totals.items()}
+
+
+def _stored(user_ids=None):
+    rows = GoalSummary.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    stored = {}
+    for row in rows.values_list(*BUCKET_FIELDS, *COUNT_FIELDS).iterator(chunk_size=2000):
+        # Buckets emptied by deletes are left behind as zero rows; they carry nothing
+        if any(row[4:]):
+            stored[row[:4]] = row[4:]
+    return stored
+
+
+def rebuild(user_ids=None):
+    """Replace the summary rows of `user_ids` (default everyone) and return how many were written."""
+    with transaction.atomic(using=shards.current()):
+        expected = fresh_aggregate(user_ids)
+        rows = GoalSummary.objects.all()
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        rows.delete()
+        GoalSummary.objects.bulk_create([
+            GoalSummary(**dict(zip(BUCKET_FIELDS, bucket)), **dict(zip(COUNT_FIELDS, counts)))
+            for bucket, counts in expected.items()
+        ], batch_size=1000)
+    return len(expected)
+
+
+def check(user_ids=None):
+    """List the buckets whose stored totals differ from a fresh aggregate."""
+    with shards.snapshot():
+        expected = fresh_aggregate(user_ids)
+        stored = _stored(user_ids)
+    mismatches = []
+    for bucket in sorted(expected.keys() | stored.keys(), key=str):
+        if expected.get(bucket) != stored.get(bucket):
+            mismatches.append({
+                **dict(zip(BUCKET_FIELDS, bucket)),
+                "stored": dict(zip(COUNT_FIELDS, stored.get(bucket, (0, 0, 0, 0)))),
+                "expected": dict(zip(COUNT_FIELDS, expected.get(bucket, (0, 0, 0, 0)))),
+            })
+    return mismatches
+
+
+def _rate(done, total):
+    return round(done / total, 4) if total else 0.0
+
+
+def dashboard(user_id, today=None):
+    """Build the dashboard payload for one user from their summary rows."""
+    today = today or timezone.localdate()
+    week_end = today + datetime.timedelta(days=7)
+    # Months from `near` up to `far` hold both sides of today and of the week ahead
+    near = today.replace(day=1)
+    far = _next_month(week_end - datetime.timedelta(days=1))
+    by_category = {choice: {"total": 0, "completed": 0} for choice, _ in Goal.CATEGORY_CHOICES}
+    by_priority = {choice: {"total": 0, "completed": 0} for choice, _ in Goal.PRIORITY_CHOICES}
+    goals = completed_goals = milestones = completed_milestones = overdue = 0
+
+    rows = GoalSummary.objects.filter(user_id=user_id, goal_count__gt=0).values_list(
+        "category", "priority", "target_month", *COUNT_FIELDS
+    )
+    for category, priority, target_month, total, done, m_total, m_done in rows:
+        goals += total
+        completed_goals += done
+        milestones += m_total
+        completed_milestones += m_done
+        for group, key in ((by_category, category), (by_priority, priority)):
+            entry = group.setdefault(key, {"total": 0, "completed": 0})
+            entry["total"] += total
+            entry["completed"] += done
+        if target_month < near:
+            overdue += total - done
+
+    due = Goal.objects.filter(user_id=user_id, target_date__gte=near, target_date__lt=far).filter(progress_filter(False))
+    counts = due.aggregate(
+        overdue=Count("id", filter=Q(target_date__lt=today)),
+        week=Count("id", filter=Q(target_date__gte=today, target_date__lt=week_end)),
+    )
+    overdue += counts["overdue"]
+    due_this_week = counts["week"]
+
+    return {
+        "userId": user_id,
+        "totalGoals": goals,
+        "completedGoals": completed_goals,
+        "completionRate": _rate(completed_goals, goals),
+        "overdue": overdue,
+        "dueThisWeek": due_this_week,
+        "milestones": {
+            "total": milestones,
+            "completed": completed_milestones,
+            "completionRate": _rate(completed_milestones, milestones),
+        },
+        "byCategory": by_category,
+        "byPriority": by_priority,
+    }
@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.models import Max
+
+from Goal_Tracker import shards
+from User.models import User
+
+from .models import Goal, Milestone, Tombstone
+
+
+def record_tombstones(user_id, version, kind, object_ids):
+    Tombstone.objects.bulk_create([
+        Tombstone(user_id=user_id, kind=kind, object_id=object_id, version=version)
+        for object_id in object_ids
+    ])
+
+
+def changes_since(user_id, since):
+    """
+    Return everything that changed for a user after version `since`.
+
+    The returned cursor is the user's current data_version; passing it back as
+    `since` on the next call yields only later changes. A cursor older than the
+    tombstone compaction floor (or from the future) cannot be answered
+    incrementally, so the full state is returned with "reset" set.
+    """
+    # Read the version and the rows from one snapshot so the cursor matches the data.
+    with shards.snapshot():
+        state = User.objects.filter(id=user_id).values("data_version", "sync_floor").first()
+        if state is None:
+            return None
+
+        reset = since <= 0 or since < state["sync_floor"] or since > state["data_version"]
+
+        goals = Goal.objects.filter(user_id=user_id).order_by("id")
+        milestones = Milestone.objects.filter(goal__user_id=user_id).order_by("id")
+        if not reset:
+            # Rows from before versioning (or bulk loaded) carry version 0, so a reset
+            # must not filter on version at all
+            goals = goals.filter(version__gt=since)
+            milestones = milestones.filter(version__gt=since)
+
+        deleted = {"goals": [], "milestones": []}
+        if not reset:
+            tombstones = Tombstone.objects.filter(user_id=user_id, version__gt=since).values_list("kind", "object_id")
+            for kind, object_id in tombstones:
+                deleted[kind + "s"].append(object_id)
+
+        return {
+            "cursor": state["data_version"],
+            "reset": reset,
+            "goals": [
+                {
+                    "id": goal["id"],
+                    "title": goal["title"],
+                    "description": goal["description"],
+                    "category": goal["category"],
+                    "priority": goal["priority"],
+                    "targetDate": goal["target_date"],
+                }
+                for goal in goals.values("id", "title", "description", "category", "priority", "target_date")
+            ],
+            "milestones": list(milestones.values("id", "goal_id", "title", "status")),
+            "deleted": deleted,
+        }
+
+
+def compact_tombstones(cutoff, batch_size=1000):
+    """
+    Delete tombstones older than `cutoff`, raising each affected user's sync_floor
+    so clients holding a cursor from before the compaction are told to reset.
+    """
+    removed = 0
+    while True:
+        with transaction.atomic(using=shards.current()):
+            batch = list(
+                Tombstone.objects.filter(deleted_at__lt=cutoff)
+                .order_by("id")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not batch:
+                return removed
+            floors = (
+                Tombstone.objects.filter(id__in=batch)
+                .values("user_id")
+                .annotate(floor=Max("version"))
+            )
+            for row in floors:
+                User.objects.filter(id=row["user_id"], sync_floor__lt=row["floor"]).update(sync_floor=row["floor"])
+            removed += Tombstone.objects.filter(id__in=batch).delete()[0]
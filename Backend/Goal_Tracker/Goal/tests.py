@@ -1,3 +1,1262 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.utils import timezone
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+
+from Goal_Tracker import routers, shards
+from User.auth import signer
+from User.models import User, UserShard
+from .batch import apply_operations, validate_operations
+from .cache import goal_list_cache
+from .counters import recount
+from .models import ArchivedGoal, Goal, GoalSummary, Milestone, Reminder
+from . import archive, async_views, events, mutations, reminders, search, summary, views
+from .export import export_goals, stream_csv, stream_json, stream_ndjson
+from .importer import import_rows
+from .sync import changes_since, compact_tombstones
+from .management.commands.bench_serialization import serialize_goal
+
+# Tables whose plans must never fall back to a full scan.
+INDEXED_TABLES = {"User_user", "Goal_goal", "Goal_milestone", "Goal_tombstone", "Goal_goalsummary", "Goal_reminder"}
+FULL_SCAN = re.compile(r"^SCAN (\w+)")
+
+
+class QueryPlanMixin:
+    """Assert that every statement issued by a block is answered through an index."""
+
+    def assertIndexed(self, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = func(*args, **kwargs)
+        statements = [q["sql"] for q in ctx.captured_queries if q["sql"].split()[0] in ("SELECT", "UPDATE", "DELETE")]
+        self.assertTrue(statements, "no queries were captured")
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute("EXPLAIN QUERY PLAN " + sql)
+                for row in cursor.fetchall():
+                    match = FULL_SCAN.match(row[-1])
+                    if match and match.group(1) in INDEXED_TABLES:
+                        self.fail("Full scan of %s in:\n%s\nplan: %s" % (match.group(1), sql, row[-1]))
+        return response
+
+
+def seed(users=30, goals_per_user=40, milestones_per_goal=4):
+    """Insert a realistic spread of users, goals and milestones and refresh planner statistics."""
+    categories = [choice for choice, _ in Goal.CATEGORY_CHOICES]
+    priorities = [choice for choice, _ in Goal.PRIORITY_CHOICES]
+    people = User.objects.bulk_create([
+        User(name="user %d" % i, email="user%d@example.com" % i, password="x") for i in range(users)
+    ])
+    goals = Goal.objects.bulk_create([
+        Goal(
+            user=person,
+            title="goal %d" % i,
+            description="description of goal %d" % i,
+            category=categories[i % len(categories)],
+            priority=priorities[i % len(priorities)],
+            target_date=datetime.date(2025, 1, 1) + datetime.timedelta(days=i * 7 % 365),
+        )
+        for person in people
+        for i in range(goals_per_user)
+    ])
+    Milestone.objects.bulk_create([
+        Milestone(goal=goal, title="step %d" % i, status=(goal.id + i) % 3 == 0)
+        for goal in goals
+        for i in range(milestones_per_goal)
+    ])
+    recount()
+    summary.rebuild()
+    search.rebuild()
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    return people
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class GoalQueryPlanTests(QueryPlanMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed()[0]
+        cls.goal = Goal.objects.filter(user=cls.user).first()
+        cls.milestone = cls.goal.milestones.first()
+
+    def put(self, url, data):
+        return self.client.put(url, json.dumps(data), content_type="application/json")
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type="application/json")
+
+    def test_goal_list(self):
+        url = "/goal/goal/%d/" % self.user.id
+        self.assertIndexed(self.client.get, url)
+        for sort in ("id", "-id", "target_date", "-target_date", "title", "-title", "progress", "-progress"):
+            response = self.assertIndexed(self.client.get, url, {"sort": sort, "limit": 10})
+            self.assertIndexed(self.client.get, url, {"sort": sort, "limit": 10, "cursor": response.json()["next_cursor"]})
+
+    def test_goal_list_fields(self):
+        url = "/goal/goal/%d/" % self.user.id
+        self.assertIndexed(self.client.get, url, {"fields": "title,progress", "sort": "progress", "limit": 10})
+
+    def test_goal_list_filters(self):
+        url = "/goal/goal/%d/" % self.user.id
+        self.assertIndexed(self.client.get, url, {"category": "Health"})
+        self.assertIndexed(self.client.get, url, {"target_date_from": "2025-03-01", "target_date_to": "2025-06-01", "sort": "target_date"})
+        self.assertIndexed(self.client.get, url, {"completed": "true"})
+        self.assertIndexed(self.client.get, url, {"completed": "false", "limit": 5})
+
+    def test_dashboard(self):
+        self.assertIndexed(self.client.get, "/goal/dashboard/%d/" % self.user.id)
+
+    def test_search(self):
+        self.assertIndexed(self.client.get, "/goal/search/%d/" % self.user.id, {"q": "goal desc"})
+
+    def test_export(self):
+        for export_format in ("json", "ndjson", "csv"):
+            response = self.client.get("/goal/export/%d/" % self.user.id, {"format": export_format})
+            self.assertIndexed(lambda: b"".join(response.streaming_content))
+
+    def test_import(self):
+        lines = "\n".join(json.dumps({
+            "ref": i, "title": "t", "description": "d", "category": "Health", "priority": "Low",
+            "targetDate": "2025-02-01", "milestones": [{"title": "m", "status": True}],
+        }) for i in range(3))
+        self.assertIndexed(self.client.post, "/goal/import/%d/?format=ndjson" % self.user.id, lines, content_type="application/x-ndjson")
+
+    def test_sync(self):
+        self.assertIndexed(self.client.get, "/goal/sync/%d/" % self.user.id)
+        self.assertIndexed(self.client.get, "/goal/sync/%d/" % self.user.id, {"since": 1})
+
+    def test_goal_mutations(self):
+        response = self.assertIndexed(self.post, "/goal/create_goal/", {
+            "id": self.user.id, "title": "t", "description": "d",
+            "category": "Health", "priority": "High", "targetDate": "2025-01-01",
+        })
+        goal_id = response.json()["goal"]["id"]
+        self.assertIndexed(self.put, "/goal/update_goal/%d/" % goal_id, {"title": "renamed"})
+        self.assertIndexed(self.client.delete, "/goal/delete_goal/%d/" % self.goal.id)
+
+    def test_milestone_mutations(self):
+        response = self.assertIndexed(self.post, "/goal/create_milestone/", {"goal_id": self.goal.id, "title": "m"})
+        milestone_id = response.json()["milestone"]["id"]
+        self.assertIndexed(self.put, "/goal/update_milestone/%d/" % milestone_id, {"status": True})
+        self.assertIndexed(self.client.delete, "/goal/delete_milestone/%d/" % self.milestone.id)
+
+    def test_batch(self):
+        self.assertIndexed(self.post, "/goal/batch/", {"id": self.user.id, "operations": [
+            {"op": "create", "type": "goal", "ref": "g", "data": {
+                "title": "t", "description": "d", "category": "Health", "priority": "Low", "targetDate": "2025-02-01",
+            }},
+            {"op": "create", "type": "milestone", "data": {"goal_ref": "g", "title": "m"}},
+            {"op": "update", "type": "milestone", "id": self.milestone.id, "data": {"status": True}},
+            {"op": "delete", "type": "goal", "id": self.goal.id},
+        ]})
+
+
+def forge_cursor(parts):
+    return base64.urlsafe_b64encode(json.dumps(parts).encode()).decode()
+
+
+class ListingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        # Shared target dates make the id tie-break part of the keyset
+        for i in range(7):
+            Goal.objects.create(
+                user=self.user, title="goal %d" % i, description="d", category="Health" if i % 2 else "Career",
+                priority="High", target_date=datetime.date(2025, 1, 1 + i // 2),
+                milestone_count=2, completed_count=2 if i < 3 else 0,
+            )
+
+    def get(self, **params):
+        return self.client.get("/goal/goal/%d/" % self.user.id, params)
+
+    def walk(self, **params):
+        ids, cursor = [], None
+        while True:
+            page = self.get(**params, **({"cursor": cursor} if cursor else {})).json()
+            ids.extend(goal["id"] for goal in page["results"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return ids
+
+    def test_cursor_round_trip(self):
+        goals = Goal.objects.filter(user=self.user)
+        for sort in ("id", "-target_date", "title", "-progress"):
+            expected = [goal["id"] for goal in self.get(sort=sort).json()]
+            self.assertEqual(self.walk(sort=sort, limit=2), expected)
+        self.assertEqual(self.walk(sort="-target_date", limit=3), list(goals.order_by("-target_date", "-id").values_list("id", flat=True)))
+        self.assertEqual(
+            self.walk(category="Health", completed="false", target_date_from="2025-01-02", limit=1),
+            list(goals.filter(category="Health", completed_count=0, target_date__gte="2025-01-02").order_by("id").values_list("id", flat=True)),
+        )
+
+    def test_invalid_parameters(self):
+        cursor = self.get(sort="title", limit=2).json()["next_cursor"]
+        for params in (
+            {"cursor": "not a cursor"}, {"cursor": cursor, "sort": "id"}, {"sort": "colour"}, {"limit": "0"},
+            {"limit": "x"}, {"category": "Hobbies"}, {"target_date_from": "soon"}, {"completed": "maybe"},
+            # Well-formed cursors carrying values of the wrong type
+            {"sort": "target_date", "cursor": forge_cursor(["target_date", 5, 1])},
+            {"sort": "title", "cursor": forge_cursor(["title", None, 1])},
+            {"sort": "progress", "cursor": forge_cursor(["progress", True, 1])},
+            {"sort": "id", "cursor": forge_cursor(["id", 1, True])},
+        ):
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn("error", response.json())
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.url = "/goal/goal/%d/" % self.user.id
+
+    def create_goal(self):
+        self.client.post("/goal/create_goal/", json.dumps({
+            "id": self.user.id, "title": "Run", "description": "d", "category": "Health",
+            "priority": "High", "targetDate": "2025-01-01",
+        }), content_type="application/json")
+
+    def test_matching_etag_is_answered_without_reading_goals(self):
+        self.create_goal()
+        etag = self.client.get(self.url)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in ctx.captured_queries if "Goal_" in q["sql"]])
+        # Each filter or page is its own representation
+        self.assertEqual(self.client.get(self.url, {"sort": "title"}, headers={"if-none-match": etag}).status_code, 200)
+
+        self.create_goal()
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_other_users_get_no_validators(self):
+        self.create_goal()
+        User.objects.filter(id=self.user.id).update(data_modified=timezone.now() - datetime.timedelta(minutes=5))
+        dashboard = "/goal/dashboard/%d/" % self.user.id
+        etags = {url: self.client.get(url)["ETag"] for url in (self.url, dashboard)}
+
+        other = User.objects.create(name="b", email="b@example.com", password="x")
+        self.client.cookies["user_auth"] = signer.sign(other.email)
+        for url, etag in etags.items():
+            response = self.client.get(url, headers={"if-none-match": etag, "if-modified-since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+            self.assertEqual(response.status_code, 403, url)
+            self.assertFalse(response.has_header("ETag"))
+            self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_if_modified_since(self):
+        self.create_goal()
+        User.objects.filter(id=self.user.id).update(data_modified=timezone.now() - datetime.timedelta(minutes=5))
+        modified = self.client.get(self.url)["Last-Modified"]
+        self.assertEqual(self.client.get(self.url, headers={"if-modified-since": modified}).status_code, 304)
+        self.create_goal()
+        self.assertEqual(self.client.get(self.url, headers={"if-modified-since": modified}).status_code, 200)
+
+
+class GoalListCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.url = "/goal/goal/%d/" % self.user.id
+        goal_list_cache.invalidate(self.user.id)
+
+    def create_goal(self, title):
+        return self.client.post("/goal/create_goal/", json.dumps({
+            "id": self.user.id, "title": title, "description": "d", "category": "Health",
+            "priority": "High", "targetDate": "2025-01-01",
+        }), content_type="application/json").json()["goal"]["id"]
+
+    def titles(self):
+        return [goal["title"] for goal in self.client.get(self.url).json()]
+
+    def test_writes_invalidate_the_cached_list(self):
+        goal_id = self.create_goal("Run")
+        self.assertEqual(self.titles(), ["Run"])
+        hits = goal_list_cache.hits
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.titles(), ["Run"])
+        self.assertEqual(goal_list_cache.hits, hits + 1)
+        self.assertFalse([q for q in ctx.captured_queries if "Goal_" in q["sql"]])
+
+        # The entry is dropped once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/goal/update_goal/%d/" % goal_id, json.dumps({"title": "Swim"}), content_type="application/json")
+        self.assertIsNone(goal_list_cache.cache.get(goal_list_cache.key(self.user.id)))
+        self.assertEqual(self.titles(), ["Swim"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/goal/create_milestone/", json.dumps({"goal_id": goal_id, "title": "5k"}), content_type="application/json")
+        self.assertEqual(self.client.get(self.url).json()[0]["milestones"][0]["title"], "5k")
+
+    @override_settings(GOAL_LIST_CACHE_MAX_BYTES=10)
+    def test_oversized_lists_are_not_stored(self):
+        self.create_goal("Run")
+        skipped = goal_list_cache.skipped
+        self.assertEqual(self.titles(), ["Run"])
+        self.assertEqual(goal_list_cache.skipped, skipped + 1)
+        self.assertIsNone(goal_list_cache.cache.get(goal_list_cache.key(self.user.id)))
+
+
+class BatchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.other = User.objects.create(name="b", email="b@example.com", password="x")
+        self.goal = Goal.objects.create(
+            user=self.user, title="Run", description="d", category="Health", priority="High", target_date="2025-01-01",
+        )
+        self.foreign = Goal.objects.create(
+            user=self.other, title="Theirs", description="d", category="Health", priority="High", target_date="2025-01-01",
+        )
+
+    def batch(self, operations):
+        return self.client.post("/goal/batch/", json.dumps({"id": self.user.id, "operations": operations}), content_type="application/json")
+
+    def new_goal(self, ref=None):
+        op = {"op": "create", "type": "goal", "data": {
+            "title": "Swim", "description": "d", "category": "Health", "priority": "Low", "targetDate": "2025-03-01",
+        }}
+        if ref:
+            op["ref"] = ref
+        return op
+
+    def assertUnchanged(self):
+        self.assertEqual(Goal.objects.filter(user=self.user).count(), 1)
+        self.assertFalse(Milestone.objects.exists())
+        self.assertEqual(User.objects.get(id=self.user.id).data_version, 0)
+
+    def test_goal_refs(self):
+        response = self.batch([
+            self.new_goal(ref="swim"),
+            {"op": "create", "type": "milestone", "data": {"goal_ref": "swim", "title": "1km", "status": True}},
+            {"op": "create", "type": "milestone", "data": {"goal_ref": "swim", "title": "5km"}},
+            {"op": "update", "type": "goal", "id": self.goal.id, "data": {"priority": "Low"}},
+        ]).json()
+        self.assertEqual([result["status"] for result in response["results"]], ["created", "created", "created", "updated"])
+        swim = Goal.objects.get(id=response["results"][0]["id"])
+        self.assertEqual(sorted(swim.milestones.values_list("title", flat=True)), ["1km", "5km"])
+        self.assertEqual((swim.milestone_count, swim.completed_count), (2, 1))
+        self.assertEqual(response["cursor"], 1)
+        self.assertEqual(Goal.objects.get(id=self.goal.id).priority, "Low")
+
+    def test_one_invalid_operation_rejects_the_batch(self):
+        response = self.batch([
+            self.new_goal(ref="swim"),
+            {"op": "create", "type": "milestone", "data": {"goal_ref": "run", "title": "m"}},
+            {"op": "delete", "type": "goal", "id": self.foreign.id},
+            self.new_goal(ref="swim"),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["index"] for error in response.json()["errors"]], [1, 2, 3])
+        self.assertUnchanged()
+        self.assertTrue(Goal.objects.filter(id=self.foreign.id).exists())
+
+    def test_failure_while_applying_rolls_back(self):
+        plan, errors = validate_operations(self.user.id, [
+            self.new_goal(),
+            {"op": "create", "type": "milestone", "data": {"goal_id": self.goal.id, "title": "m"}},
+            {"op": "delete", "type": "goal", "id": self.goal.id},
+        ])
+        self.assertEqual(errors, [])
+        with mock.patch("Goal.batch.recount", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                apply_operations(self.user.id, plan)
+        self.assertUnchanged()
+
+
+class AsyncViewTests(TestCase):
+    """The async views answer exactly like the sync ones, whichever the URLconf uses."""
+
+    def setUp(self):
+        self.sync_user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.async_user = User.objects.create(name="b", email="b@example.com", password="x")
+
+    def call(self, module, method, view, *args, data=None, params=None):
+        if module is async_views:
+            factory, run = AsyncRequestFactory(), async_to_sync
+        else:
+            factory, run = RequestFactory(), lambda func: func
+        if method == "get":
+            request = factory.get("/", params or {})
+        else:
+            request = getattr(factory, method)("/", json.dumps(data or {}), content_type="application/json")
+        response = run(getattr(module, view))(request, *args)
+        return response.status_code, json.loads(response.content) if response.content else None
+
+    def both(self, method, view, make_args=lambda user: (user.id,), data=None, params=None, strip=()):
+        results = []
+        for module, user in ((views, self.sync_user), (async_views, self.async_user)):
+            body = data(user) if callable(data) else data
+            status, payload = self.call(module, method, view, *make_args(user), data=body, params=params)
+            results.append((status, self.strip(payload, strip)))
+        self.assertEqual(results[0], results[1], view)
+        return results
+
+    def strip(self, payload, keys):
+        # Ids differ between the two users' rows; everything else must match
+        if isinstance(payload, list):
+            return [self.strip(item, keys) for item in payload]
+        if isinstance(payload, dict):
+            return {key: self.strip(value, keys) for key, value in payload.items() if key not in keys}
+        return payload
+
+    def test_same_results(self):
+        ids = {"goal_id", "id", "goalId", "next_cursor"}
+        for i, category in enumerate(("Health", "Career", "Health")):
+            self.both("post", "create_goal", lambda user: (), data=lambda user, i=i, category=category: {
+                "id": user.id, "title": "goal %d" % i, "description": "d", "category": category,
+                "priority": "High", "targetDate": "2025-01-0%d" % (3 - i),
+            }, strip=ids)
+        goals = {user.id: list(Goal.objects.filter(user=user).order_by("id")) for user in (self.sync_user, self.async_user)}
+        first = lambda user: (goals[user.id][0].id,)
+
+        self.both("post", "create_milestone", lambda user: (), data=lambda user: {"goal_id": goals[user.id][0].id, "title": "m"}, strip=ids)
+        milestones = {user.id: Milestone.objects.get(goal__user=user).id for user in (self.sync_user, self.async_user)}
+        self.both("put", "update_milestone", lambda user: (milestones[user.id],), data={"status": True}, strip=ids)
+        self.both("put", "update_goal", first, data={"title": "renamed", "targetDate": "2025-02-01"}, strip=ids)
+        self.both("put", "update_goal", lambda user: (0,), data={"title": "x"})
+
+        for params in ({}, {"category": "Health", "sort": "-target_date"}, {"limit": 2}, {"sort": "bad"}, {"fields": "title,progress"}):
+            self.both("get", "goal", params=params, strip=ids)
+
+        self.both("delete", "delete_milestone", lambda user: (milestones[user.id],), strip=ids)
+        self.both("delete", "delete_goal", first)
+        self.both("get", "goal", strip=ids)
+
+
+class SyncTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+
+    def create_goal(self, title):
+        response = self.client.post("/goal/create_goal/", json.dumps({
+            "id": self.user.id, "title": title, "description": "d", "category": "Health",
+            "priority": "High", "targetDate": "2025-01-01",
+        }), content_type="application/json")
+        return response.json()["goal"]["id"]
+
+    def sync(self, since):
+        return self.client.get("/goal/sync/%d/" % self.user.id, {"since": since}).json()
+
+    def test_full_sync_includes_rows_from_before_versioning(self):
+        # Bulk loaded rows, like the ones that existed before versioning, keep version 0
+        goal = Goal.objects.create(
+            user=self.user, title="Old", description="d", category="Health", priority="High", target_date="2025-01-01",
+        )
+        Milestone.objects.bulk_create([Milestone(goal=goal, title="m", status=False)])
+        User.objects.filter(id=self.user.id).update(data_version=3)
+        changes = self.sync(0)
+        self.assertTrue(changes["reset"])
+        self.assertEqual([row["id"] for row in changes["goals"]], [goal.id])
+        self.assertEqual(len(changes["milestones"]), 1)
+
+    def test_tombstones_and_floor_reset(self):
+        kept = self.create_goal("Kept")
+        gone = self.create_goal("Gone")
+        cursor = self.sync(0)["cursor"]
+        self.client.delete("/goal/delete_goal/%d/" % gone)
+        added = self.create_goal("Added")
+
+        changes = self.sync(cursor)
+        self.assertFalse(changes["reset"])
+        self.assertEqual([row["id"] for row in changes["goals"]], [added])
+        self.assertEqual(changes["deleted"]["goals"], [gone])
+        self.assertEqual(self.client.get("/goal/sync/%d/" % self.user.id, {"since": "x"}).status_code, 400)
+
+        # Once the tombstone is compacted away the old cursor can only be answered in full
+        self.assertEqual(compact_tombstones(timezone.now() + datetime.timedelta(seconds=1)), 1)
+        changes = self.sync(cursor)
+        self.assertTrue(changes["reset"])
+        self.assertEqual(sorted(row["id"] for row in changes["goals"]), [kept, added])
+        self.assertEqual(changes["deleted"]["goals"], [])
+
+
+@unittest.skipUnless(settings.DATABASES["default"].get("OPTIONS", {}).get("transaction_mode") == "IMMEDIATE", "Needs the production SQLite profile")
+class SnapshotTransactionTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+
+    def begins(self, work):
+        with CaptureQueriesContext(connection) as queries:
+            work()
+        return [query["sql"] for query in queries if query["sql"].startswith("BEGIN")]
+
+    def test_reads_begin_deferred_and_writes_immediate(self):
+        self.assertEqual(self.begins(lambda: changes_since(self.user.id, 0)), ["BEGIN DEFERRED"])
+        self.assertEqual(self.begins(summary.check), ["BEGIN DEFERRED"])
+        goal = Goal(user=self.user, title="t", description="d", category="Health", priority="High", target_date="2025-01-01")
+        self.assertEqual(self.begins(lambda: mutations.save_goal(goal)), ["BEGIN IMMEDIATE"])
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+
+class WriteResponseTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+
+    def send(self, method, url, data):
+        return getattr(self.client, method)(url, json.dumps(data), content_type="application/json").json()
+
+    def listed(self):
+        return {goal["id"]: goal for goal in self.client.get("/goal/goal/%d/" % self.user.id).json()}
+
+    def test_writes_return_what_the_list_returns(self):
+        goal = self.send("post", "/goal/create_goal/", {
+            "id": self.user.id, "title": "Run", "description": "d", "category": "Health",
+            "priority": "High", "targetDate": "2025-01-01",
+        })["goal"]
+        self.assertEqual(goal, self.listed()[goal["id"]])
+
+        created = self.send("post", "/goal/create_milestone/", {"goal_id": goal["id"], "title": "5k"})
+        self.assertEqual(created["progress"], {"goalId": goal["id"], "completed": 0, "total": 1})
+        updated = self.send("put", "/goal/update_milestone/%d/" % created["milestone"]["id"], {"status": True})
+        self.assertEqual(updated["milestone"], {"id": created["milestone"]["id"], "title": "5k", "status": True})
+        self.assertEqual(updated["progress"]["completed"], 1)
+
+        # A loosely formatted date comes back the way every read returns it
+        goal = self.send("put", "/goal/update_goal/%d/" % goal["id"], {"title": "Run far", "targetDate": "2025-2-3"})["goal"]
+        self.assertEqual(goal["targetDate"], "2025-02-03")
+        self.assertEqual(goal["progress"], {"completed": 1, "total": 1})
+        self.assertEqual(goal, self.listed()[goal["id"]])
+
+
+class MilestoneCounterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.goal = Goal.objects.create(
+            user=self.user, title="t", description="d", category="Health", priority="High",
+            target_date=datetime.date(2025, 1, 1),
+        )
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type="application/json")
+
+    def assertCounters(self, total, completed):
+        self.goal.refresh_from_db()
+        self.assertEqual((self.goal.milestone_count, self.goal.completed_count), (total, completed))
+        # A full recount must agree with the incrementally maintained values.
+        recount(Goal.objects.filter(id=self.goal.id))
+        self.goal.refresh_from_db()
+        self.assertEqual((self.goal.milestone_count, self.goal.completed_count), (total, completed))
+
+    def test_single_writes(self):
+        ids = [self.post("/goal/create_milestone/", {"goal_id": self.goal.id, "title": "m%d" % i}).json()["milestone"]["id"] for i in range(3)]
+        self.assertCounters(3, 0)
+        for _ in range(2):
+            response = self.client.put("/goal/update_milestone/%d/" % ids[0], json.dumps({"status": True}), content_type="application/json")
+        self.assertEqual(response.json()["progress"], {"goalId": self.goal.id, "completed": 1, "total": 3})
+        self.assertCounters(3, 1)
+        self.client.delete("/goal/delete_milestone/%d/" % ids[0])
+        self.client.delete("/goal/delete_milestone/%d/" % ids[1])
+        self.assertCounters(1, 0)
+
+    def test_batch(self):
+        self.post("/goal/batch/", {"id": self.user.id, "operations": [
+            {"op": "create", "type": "milestone", "data": {"goal_id": self.goal.id, "title": "m%d" % i, "status": i < 2}}
+            for i in range(5)
+        ]})
+        self.assertCounters(5, 2)
+        response = self.client.get("/goal/goal/%d/" % self.user.id, {"completed": "false", "sort": "-progress"})
+        self.assertEqual(response.json()[0]["progress"], {"completed": 2, "total": 5})
+
+
+@unittest.skipUnless("django.contrib.admin" in settings.INSTALLED_APPS, "the API profile has no admin")
+class AdminTests(TestCase):
+
+    def setUp(self):
+        from django.contrib.auth.models import User as AdminUser
+        self.client.force_login(AdminUser.objects.create_superuser("admin", "admin@example.com", "password"))
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+
+    def test_admin_edits_go_through_the_write_paths(self):
+        self.client.post("/admin/Goal/goal/add/", {
+            "user": self.user.id, "title": "Run a marathon", "description": "d", "category": "Health",
+            "priority": "High", "target_date": "2025-01-01",
+        })
+        goal = Goal.objects.get()
+        self.client.post("/admin/Goal/milestone/add/", {"goal": goal.id, "title": "5k", "status": "on"})
+        milestone = Milestone.objects.get()
+        goal.refresh_from_db()
+        self.assertEqual((goal.milestone_count, goal.completed_count), (1, 1))
+        self.assertEqual(summary.check(), [])
+        self.assertEqual([match[0] for match in search.search(self.user.id, "5k")], [goal.id])
+
+        self.client.post("/admin/Goal/milestone/%d/change/" % milestone.id, {"title": "10k"})
+        goal.refresh_from_db()
+        self.assertEqual(goal.completed_count, 0)
+        self.client.post("/admin/Goal/milestone/%d/delete/" % milestone.id, {"post": "yes"})
+        cursor = changes_since(self.user.id, 0)["cursor"]
+        self.assertEqual(cursor, 4)
+
+        self.client.post("/admin/Goal/goal/", {"action": "delete_selected", "_selected_action": [goal.id], "post": "yes"})
+        self.assertFalse(Goal.objects.exists())
+        changes = changes_since(self.user.id, cursor)
+        self.assertEqual(changes["deleted"]["goals"], [goal.id])
+        self.assertEqual(summary.check(), [])
+        self.assertEqual(self.client.get("/admin/Goal/goalsummary/add/").status_code, 403)
+
+
+class GoalSummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.today = datetime.date.today()
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type="application/json")
+
+    def put(self, url, data):
+        return self.client.put(url, json.dumps(data), content_type="application/json")
+
+    def create_goal(self, days, category="Health", priority="High"):
+        return self.post("/goal/create_goal/", {
+            "id": self.user.id, "title": "t", "description": "d", "category": category, "priority": priority,
+            "targetDate": (self.today + datetime.timedelta(days=days)).isoformat(),
+        }).json()["goal"]["id"]
+
+    def assertConsistent(self):
+        self.assertEqual(summary.check(), [])
+
+    def test_incremental_updates_match_fresh_aggregate(self):
+        overdue = self.create_goal(-3)
+        soon = self.create_goal(2, category="Career", priority="Low")
+        later = self.create_goal(30)
+        milestone = self.post("/goal/create_milestone/", {"goal_id": soon, "title": "m"}).json()["milestone"]["id"]
+        self.put("/goal/update_milestone/%d/" % milestone, {"status": True})
+        self.put("/goal/update_goal/%d/" % later, {"category": "Finance", "targetDate": self.today.isoformat()})
+        self.assertConsistent()
+
+        data = self.client.get("/goal/dashboard/%d/" % self.user.id).json()
+        self.assertEqual((data["totalGoals"], data["completedGoals"]), (3, 1))
+        self.assertEqual((data["overdue"], data["dueThisWeek"]), (1, 1))
+        self.assertEqual(data["byCategory"]["Finance"], {"total": 1, "completed": 0})
+        self.assertEqual(data["byPriority"]["Low"], {"total": 1, "completed": 1})
+        self.assertEqual(data["milestones"], {"total": 1, "completed": 1, "completionRate": 1.0})
+
+        self.client.delete("/goal/delete_milestone/%d/" % milestone)
+        self.client.delete("/goal/delete_goal/%d/" % overdue)
+        self.post("/goal/batch/", {"id": self.user.id, "operations": [
+            {"op": "create", "type": "goal", "ref": "g", "data": {
+                "title": "t", "description": "d", "category": "Health", "priority": "Low", "targetDate": "2025-02-01",
+            }},
+            {"op": "create", "type": "milestone", "data": {"goal_ref": "g", "title": "m", "status": True}},
+            {"op": "create", "type": "milestone", "data": {"goal_id": soon, "title": "m"}},
+            {"op": "update", "type": "goal", "id": later, "data": {"priority": "Medium"}},
+        ]})
+        self.assertConsistent()
+
+    def test_buckets_are_monthly(self):
+        for day in ("2025-01-10", "2025-01-15", "2025-03-05", "2025-03-31", "2025-04-02", "2025-04-20"):
+            Goal.objects.create(user=self.user, title="t", description="d", category="Health", priority="High", target_date=day)
+        summary.rebuild([self.user.id])
+        self.assertEqual(GoalSummary.objects.filter(user=self.user).count(), 3)
+        # The week ahead runs into the next month, and part of this month is overdue
+        data = summary.dashboard(self.user.id, today=datetime.date(2025, 3, 30))
+        self.assertEqual((data["overdue"], data["dueThisWeek"]), (3, 2))
+
+    def test_rebuild_repairs_drift(self):
+        self.create_goal(1)
+        GoalSummary.objects.update(goal_count=5)
+        self.assertEqual(len(summary.check()), 1)
+        summary.rebuild([self.user.id])
+        self.assertConsistent()
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed(users=2, goals_per_user=7, milestones_per_goal=2)
+        Goal.objects.create(
+            user=cls.users[0], title="empty, \"quoted\"", description="d", category="Health", priority="High",
+            target_date=datetime.date(2025, 1, 1),
+        )
+
+    def test_formats_agree(self):
+        goals = export_goals(self.users[0].id)
+        # A chunk size that does not divide the goal count exercises the per-chunk prefetch
+        as_json = json.loads("".join(stream_json(goals, chunk_size=3)))
+        as_ndjson = [json.loads(line) for line in "".join(stream_ndjson(goals, chunk_size=3)).splitlines()]
+        as_csv = list(csv.DictReader(io.StringIO("".join(stream_csv(goals, chunk_size=3)))))
+        self.assertEqual(as_json, as_ndjson)
+        self.assertEqual(len(as_json), 8)
+        self.assertEqual(sum(len(goal["milestones"]) for goal in as_json), 14)
+        self.assertEqual(len(as_csv), 15)
+        self.assertEqual(as_csv[-1]["title"], 'empty, "quoted"')
+        self.assertEqual(len(json.loads("".join(stream_json(export_goals(), chunk_size=4)))), 15)
+
+    def test_endpoint(self):
+        response = self.client.get("/goal/export/%d/" % self.users[1].id, {"format": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual({json.loads(line)["userId"] for line in lines}, {self.users[1].id})
+        self.assertEqual(self.client.get("/goal/export/%d/" % self.users[1].id, {"format": "xml"}).status_code, 400)
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+
+    def test_csv_groups_rows_across_batches(self):
+        rows = [
+            "goal_ref,title,description,category,priority,target_date,milestone_title,milestone_status",
+            "a,Run,d,Health,High,2025-01-01,5k,true",
+            "b,Save,d,Finance,Low,2025-02-01,,",
+            "a,,,,,,10k,false",
+            "c,Bad,d,Sleep,High,2025-01-01,,",
+            "c,,,,,,orphan,false",
+            "b,,,,,,budget,maybe",
+            "a,,,,,,half,1",
+        ]
+        stats = import_rows(self.user.id, rows, "csv", batch_size=2)
+        self.assertEqual((stats["rows"], stats["goalsCreated"], stats["milestonesCreated"], stats["errorCount"]), (7, 2, 3, 3))
+        self.assertEqual([error["row"] for error in stats["errors"]], [5, 6, 7])
+        run = Goal.objects.get(user=self.user, title="Run")
+        self.assertEqual((run.milestone_count, run.completed_count), (3, 2))
+        self.assertEqual(summary.check(), [])
+        self.user.refresh_from_db()
+        # Four valid rows in batches of two: one version bump per batch
+        self.assertEqual(self.user.data_version, 2)
+
+    def test_export_round_trip(self):
+        source = seed(users=1, goals_per_user=5, milestones_per_goal=3)[0]
+        exported = "".join(stream_ndjson(export_goals(source.id))).splitlines()
+        response = self.client.post(
+            "/goal/import/%d/?format=ndjson&batch_size=2" % self.user.id, "\n".join(exported), content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.json()["goalsCreated"], 5)
+        self.assertEqual(response.json()["milestonesCreated"], 15)
+        imported = [json.loads(line) for line in "".join(stream_ndjson(export_goals(self.user.id))).splitlines()]
+        strip = lambda goal: {**goal, "id": None, "userId": None, "milestones": [m["title"] for m in goal["milestones"]]}
+        self.assertEqual([strip(goal) for goal in imported], [strip(json.loads(line)) for line in exported])
+        self.assertEqual(summary.check(), [])
+
+
+class SerializerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed(users=1, goals_per_user=12, milestones_per_goal=3)[0]
+        Goal.objects.create(
+            user=cls.user, title="empty", description="d", category="Health", priority="High",
+            target_date=datetime.date(2025, 1, 1),
+        )
+
+    def setUp(self):
+        # Ids repeat between test cases, so do not let another case's cached list answer
+        caches[settings.GOAL_LIST_CACHE_ALIAS].clear()
+
+    def test_matches_model_serialization(self):
+        url = "/goal/goal/%d/" % self.user.id
+        goals = Goal.objects.filter(user=self.user).prefetch_related("milestones").order_by("id")
+        expected = json.loads(json.dumps([serialize_goal(goal) for goal in goals], default=str))
+        self.assertEqual(self.client.get(url).json(), expected)
+        self.assertEqual(self.client.get(url, {"sort": "id"}).json(), expected)
+
+        pages, cursor = [], None
+        while True:
+            params = {"sort": "-progress", "limit": 5, **({"cursor": cursor} if cursor else {})}
+            page = self.client.get(url, params).json()
+            pages.extend(page["results"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        self.assertEqual(sorted(pages, key=lambda goal: goal["id"]), expected)
+
+    def test_fields(self):
+        url = "/goal/goal/%d/" % self.user.id
+        data = self.client.get(url, {"fields": "title,progress"}).json()
+        self.assertEqual(set(data[0]), {"id", "title", "progress"})
+        self.assertEqual(self.client.get(url, {"fields": "password"}).status_code, 400)
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.user = seed(users=1, goals_per_user=3, milestones_per_goal=2)[0]
+
+    def test_server_timing_and_exposition(self):
+        response = self.client.get("/goal/goal/%d/" % self.user.id, {"sort": "id"})
+        timing = response["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=[\d.]+, total;dur=[\d.]+$')
+
+        text = self.client.get("/metrics/").content.decode()
+        self.assertIn('goal_tracker_requests_total{view="goal",method="GET",status="200"}', text)
+        self.assertIn('goal_tracker_request_queries_bucket{view="goal",le="+Inf"}', text)
+        self.assertIn("goal_tracker_goal_list_cache_hits", text)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_request_log(self):
+        with self.assertLogs("goal_tracker.slow_requests", "WARNING") as logs:
+            self.client.get("/goal/dashboard/%d/" % self.user.id)
+        self.assertIn("Goal_goalsummary", logs.output[0])
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token(self):
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.assertEqual(self.client.get("/metrics/", headers={"Authorization": "Bearer secret"}).status_code, 200)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.other = User.objects.create(name="b", email="b@example.com", password="x")
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type="application/json")
+
+    def create_goal(self, user, title, description):
+        return self.post("/goal/create_goal/", {
+            "id": user.id, "title": title, "description": description, "category": "Health",
+            "priority": "High", "targetDate": "2025-01-01",
+        }).json()["goal"]["id"]
+
+    def search(self, query, user=None):
+        response = self.client.get("/goal/search/%d/" % (user or self.user).id, {"q": query})
+        return [goal["id"] for goal in response.json()["results"]]
+
+    def test_index_follows_writes(self):
+        marathon = self.create_goal(self.user, "Run a marathon", "Build up to 42km")
+        savings = self.create_goal(self.user, "Save money", "Marathon entry fees add up")
+        self.create_goal(self.other, "Marathon", "Someone else's goal")
+
+        # Title matches outrank description matches, and only the user's goals come back
+        self.assertEqual(self.search("marathon"), [marathon, savings])
+        self.assertEqual(self.search("mara"), [marathon, savings])
+        self.assertEqual(self.search("42km"), [marathon])
+
+        milestone = self.post("/goal/create_milestone/", {"goal_id": savings, "title": "Open an ISA"}).json()["milestone"]["id"]
+        self.assertEqual(self.search("isa"), [savings])
+        self.client.put("/goal/update_milestone/%d/" % milestone, json.dumps({"title": "Open a pension"}), content_type="application/json")
+        self.assertEqual(self.search("isa"), [])
+        self.assertEqual(self.search("pension"), [savings])
+
+        self.client.put("/goal/update_goal/%d/" % marathon, json.dumps({"title": "Run a 10k"}), content_type="application/json")
+        self.assertEqual(self.search("marathon"), [savings])
+        self.client.delete("/goal/delete_goal/%d/" % savings)
+        self.assertEqual(self.search("marathon"), [])
+
+        self.post("/goal/batch/", {"id": self.user.id, "operations": [
+            {"op": "create", "type": "goal", "ref": "g", "data": {
+                "title": "Learn Spanish", "description": "d", "category": "Education", "priority": "Low", "targetDate": "2025-02-01",
+            }},
+            {"op": "create", "type": "milestone", "data": {"goal_ref": "g", "title": "Duolingo streak"}},
+        ]})
+        self.assertEqual(len(self.search("duolingo spanish")), 1)
+
+    def test_match_text_comes_from_the_goal(self):
+        self.create_goal(self.user, "Run a marathon", "Build up to [42km]")
+        savings = self.create_goal(self.user, "Save money", "Marathon entry fees add up")
+        results = self.client.get("/goal/search/%d/" % self.user.id, {"q": "marathon"}).json()["results"]
+        self.assertEqual([result["match"] for result in results], ["Run a [marathon]", "[Marathon] entry fees add up"])
+        self.assertGreater(results[0]["score"], results[1]["score"])
+        self.assertGreater(results[1]["score"], 0)
+        self.assertEqual(search.search(self.user.id, "42km")[0][2], "Build up to [[42km]]")
+        self.assertEqual(search.search(self.user.id, "fees money")[0][0], savings)
+
+    def test_query_syntax_is_inert(self):
+        self.create_goal(self.user, "Run a marathon", "d")
+        self.assertEqual(len(self.search('marathon OR "x" NEAR(')), 0)
+        self.assertEqual(len(self.search("run*  mara")), 1)
+        self.assertEqual(self.client.get("/goal/search/%d/" % self.user.id, {"q": "  "}).status_code, 400)
+
+
+def parse_event(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.decode().strip().split("\n"))
+    return fields.get("event"), int(fields["id"]) if "id" in fields else None, json.loads(fields.get("data", "null"))
+
+
+class EventStreamTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+
+    def create_goal(self, title, commit=True):
+        def post():
+            return self.client.post("/goal/create_goal/", json.dumps({
+                "id": self.user.id, "title": title, "description": "d", "category": "Health",
+                "priority": "High", "targetDate": "2025-01-01",
+            }), content_type="application/json").json()["goal"]["id"]
+        if not commit:
+            return post()
+        # The test transaction never commits, so run the on_commit hooks by hand
+        with self.captureOnCommitCallbacks(execute=True):
+            return post()
+
+    async def open_stream(self, **headers):
+        response = await self.async_client.get("/goal/events/%d/" % self.user.id, headers=headers)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response)
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+        # Closed like the ASGI handler does once the client goes away
+        self.addCleanup(response.close)
+        return stream
+
+    async def next_event(self, stream):
+        return parse_event(await asyncio.wait_for(anext(stream), 5))
+
+    async def test_live_changes(self):
+        stream = await self.open_stream()
+        self.assertEqual(await self.next_event(stream), ("ready", 0, {}))
+        self.assertEqual(events.broker.stats()["subscribers"], 1)
+
+        goal_id = await sync_to_async(self.create_goal)("Run")
+        name, event_id, data = await self.next_event(stream)
+        self.assertEqual((name, event_id), ("change", 1))
+        self.assertEqual([goal["id"] for goal in data["goals"]], [goal_id])
+
+    async def test_closing_unsubscribes(self):
+        response = await self.async_client.get("/goal/events/%d/" % self.user.id)
+        with mock.patch.object(events.broker, "max_subscribers", 1):
+            self.assertEqual((await self.async_client.get("/goal/events/%d/" % self.user.id)).status_code, 429)
+        response.close()
+        self.assertEqual(events.broker.stats()["subscribers"], 0)
+
+    async def test_resume_from_last_event_id(self):
+        first = await sync_to_async(self.create_goal)("Run")
+        second = await sync_to_async(self.create_goal)("Swim")
+        stream = await self.open_stream(**{"Last-Event-ID": "1"})
+        name, event_id, data = await self.next_event(stream)
+        self.assertEqual((name, event_id, data["reset"]), ("change", 2, False))
+        self.assertEqual([goal["id"] for goal in data["goals"]], [second])
+        self.assertNotEqual(first, second)
+        self.assertEqual(await self.next_event(stream), ("ready", 2, {}))
+        await stream.aclose()
+
+    @override_settings(EVENT_STREAM_HEARTBEAT=0.05)
+    async def test_heartbeat_catches_writes_from_other_processes(self):
+        stream = await self.open_stream()
+        await self.next_event(stream)
+        self.assertEqual(await asyncio.wait_for(anext(stream), 5), b": ping\n\n")
+
+        # Without the commit hook nothing is published, like a write served elsewhere
+        goal_id = await sync_to_async(self.create_goal)("Run", commit=False)
+        name, event_id, data = await self.next_event(stream)
+        self.assertEqual((name, event_id, data["goals"][0]["id"]), ("change", 1, goal_id))
+        await stream.aclose()
+
+    async def test_overflow_drops_backlog(self):
+        subscriber = events.Subscriber(self.user.id, asyncio.get_running_loop(), 2)
+        for version in range(3):
+            subscriber.offer((version, {}))
+        self.assertEqual(subscriber.queue.qsize(), 1)
+        self.assertIs(subscriber.queue.get_nowait(), events.OVERFLOW)
+
+    def test_needs_asgi(self):
+        self.assertEqual(self.client.get("/goal/events/%d/" % self.user.id).status_code, 501)
+
+
+class ApiProfileTests(unittest.TestCase):
+
+    def test_lean_worker_serves_requests(self):
+        # Settings are read at import, so the api profile needs its own interpreter
+        env = {**os.environ, "GOAL_TRACKER_PROFILE": "api"}
+        output = subprocess.run(
+            [sys.executable, "-m", "Goal_Tracker.startup", "/goal/index/", "5"],
+            env=env, cwd=settings.BASE_DIR, check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output)
+        self.assertEqual((result["profile"], result["status"]), ("api", 200))
+
+
+@override_settings(REPLICA_DATABASES=["replica1", "replica2"], REPLICA_MAX_LAG=30)
+class ReplicaRoutingTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        lag = mock.patch.object(routers.replica_lag, "get", side_effect=lambda alias: self.lag.get(alias, 0))
+        lag.start()
+        self.addCleanup(lag.stop)
+        self.lag = {}
+
+    def reads(self, request=None):
+        # The aliases two reads in one request would use
+        view = routers.replica_reads(lambda request: [routers.read_database(), routers.read_database()])
+        return view(request or self.factory.get("/"))
+
+    def test_listing_reads_use_one_replica_per_request(self):
+        self.assertEqual(routers.read_database(), "default")
+        first, second = self.reads(), self.reads()
+        self.assertEqual(len(set(first)), 1)
+        self.assertEqual({first[0], second[0]}, {"replica1", "replica2"})
+
+    def test_pinned_and_stale_reads_stay_on_primary(self):
+        request = self.factory.get("/")
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = "1"
+        self.assertEqual(self.reads(request), ["default", "default"])
+
+        self.lag = {"replica1": 60}
+        self.assertEqual({self.reads()[0] for _ in range(4)}, {"replica2"})
+        self.lag = {"replica1": 60, "replica2": 45}
+        self.assertEqual(self.reads(), ["default", "default"])
+
+    def test_writes_pin_the_client(self):
+        middleware = routers.ReplicaPinMiddleware(lambda request: HttpResponse(status=int(request.GET.get("status", 200))))
+        self.assertIn(settings.REPLICA_PIN_COOKIE, middleware(self.factory.post("/")).cookies)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, middleware(self.factory.get("/")).cookies)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, middleware(self.factory.post("/?status=400")).cookies)
+
+
+class ReplicaLagTests(QueryPlanMixin, TestCase):
+
+    def test_lag_of_an_up_to_date_copy(self):
+        seed(users=3, goals_per_user=2, milestones_per_goal=1)
+        User.objects.update(data_modified=datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(self.assertIndexed(routers.replica_lag.measure, "default"), 0.0)
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        today = datetime.date.today()
+        self.finished = self.goal("Finished", today + datetime.timedelta(days=10), milestones=[True, True])
+        self.past_due = self.goal("Past due", today - datetime.timedelta(days=400), milestones=[False])
+        self.active = self.goal("Active", today, milestones=[True, False])
+        # Queryset updates leave auto_now alone, so this ages the rows
+        long_ago = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        Goal.objects.update(updated_at=long_ago)
+        Milestone.objects.update(updated_at=long_ago)
+        # A client that synced everything before the archive run
+        User.objects.filter(id=self.user.id).update(data_version=1)
+        self.cursor = 1
+
+    def goal(self, title, target_date, milestones):
+        goal = Goal.objects.create(
+            user=self.user, title=title, description="d", category="Health", priority="High", target_date=target_date,
+            milestone_count=len(milestones), completed_count=sum(milestones),
+        )
+        for status in milestones:
+            Milestone.objects.create(goal=goal, title="m", status=status)
+        summary.rebuild([self.user.id])
+        return goal
+
+    def list(self, **params):
+        return self.client.get("/goal/goal/%d/" % self.user.id, params).json()
+
+    def test_archiving_moves_finished_and_past_due_goals(self):
+        stats = archive.run(batch_size=2)
+        self.assertEqual((stats["goals"], stats["milestones"], stats["batches"]), (2, 3, 2))
+        self.assertEqual([goal["title"] for goal in self.list()], ["Active"])
+        self.assertEqual(summary.check([self.user.id]), [])
+        self.assertEqual(search.search(self.user.id, "finished"), [])
+
+        changes = changes_since(self.user.id, self.cursor)
+        self.assertEqual(sorted(changes["deleted"]["goals"]), sorted([self.finished.id, self.past_due.id]))
+
+        archived = self.list(archived="only")
+        self.assertEqual({goal["title"] for goal in archived}, {"Finished", "Past due"})
+        self.assertTrue(all(goal["archived"] for goal in archived))
+        self.assertEqual(len(archived[0]["milestones"]) + len(archived[1]["milestones"]), 3)
+
+        # Both tables merge into one keyset order across pages
+        first = self.list(archived="include", sort="target_date", limit=2)
+        second = self.list(archived="include", sort="target_date", limit=2, cursor=first["next_cursor"])
+        titles = [goal["title"] for goal in first["results"] + second["results"]]
+        self.assertEqual(titles, ["Past due", "Active", "Finished"])
+        self.assertIsNone(second["next_cursor"])
+        self.assertEqual(self.client.get("/goal/goal/%d/" % self.user.id, {"archived": "yes"}).status_code, 400)
+
+    def test_restore(self):
+        archive.run()
+        cursor = changes_since(self.user.id, 0)["cursor"]
+        response = self.client.post("/goal/restore_goal/%d/" % self.finished.id)
+        self.assertEqual(response.json()["goal"]["progress"], {"completed": 2, "total": 2})
+        self.assertEqual(self.client.post("/goal/restore_goal/%d/" % self.finished.id).status_code, 404)
+
+        self.assertFalse(ArchivedGoal.objects.filter(id=self.finished.id).exists())
+        self.assertEqual(Milestone.objects.filter(goal_id=self.finished.id).count(), 2)
+        self.assertEqual(summary.check([self.user.id]), [])
+        self.assertEqual([goal["id"] for goal in changes_since(self.user.id, cursor)["goals"]], [self.finished.id])
+        self.assertEqual(changes_since(self.user.id, self.cursor)["deleted"]["goals"], [self.past_due.id])
+        # A restored goal counts as touched, so the next run leaves it alone
+        self.assertEqual(archive.run()["goals"], 0)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class ReminderTests(QueryPlanMixin, TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.today = datetime.date.today()
+        self.soon = self.goal("Soon", 2)
+        self.goal("Finished", 2, finished=True)
+        self.later = self.goal("Later", 10)
+        self.due_today = self.goal("Today", 0)
+
+    def goal(self, title, days, finished=False):
+        return Goal.objects.create(
+            user=self.user, title=title, description="d", category="Health", priority="High",
+            target_date=self.today + datetime.timedelta(days=days),
+            milestone_count=1, completed_count=int(finished),
+        )
+
+    def queued(self, kind):
+        return set(Reminder.objects.filter(kind=kind).values_list("goal__title", flat=True))
+
+    def test_scan_queues_each_reminder_once(self):
+        stats = self.assertIndexed(reminders.schedule, today=self.today)
+        self.assertEqual((stats["scanned"], stats["queued"]), (2, 2))
+        self.assertEqual(self.queued("due_soon"), {"Soon", "Today"})
+        # Nothing new entered the window, so nothing is read again
+        self.assertEqual(reminders.schedule(today=self.today), {"scanned": 0, "queued": 0})
+
+        tomorrow = self.today + datetime.timedelta(days=1)
+        self.assertEqual(reminders.schedule(today=tomorrow)["queued"], 1)
+        self.assertEqual(self.queued("overdue"), {"Today"})
+
+        # Re-dated into the already scanned window
+        self.later.target_date = tomorrow
+        self.later.save()
+        stats = reminders.schedule(today=tomorrow)
+        self.assertEqual((stats["scanned"], stats["queued"]), (1, 1))
+        self.assertEqual(self.queued("due_soon"), {"Soon", "Today", "Later"})
+
+    def test_delivery(self):
+        reminders.schedule(today=self.today)
+        Goal.objects.filter(id=self.due_today.id).update(completed_count=1)
+        self.assertEqual(reminders.deliver(), (1, 1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["a@example.com"])
+        reminder = Reminder.objects.get(goal=self.soon)
+        self.assertEqual(mail.outbox[0].extra_headers["Message-ID"], "<%s@goal-tracker>" % reminders.idempotency_key(reminder))
+        self.assertEqual((reminder.outcome, reminder.attempts), ("sent", 1))
+        self.assertEqual(reminders.deliver(), (0, 0, 0))
+
+    def test_failed_send_is_retried(self):
+        reminders.schedule(today=self.today)
+        Reminder.objects.exclude(goal=self.soon).delete()
+        sender = mock.Mock(side_effect=[OSError("smtp down"), None])
+        self.assertEqual(reminders.deliver(sender=sender), (0, 0, 1))
+        reminder = Reminder.objects.get()
+        self.assertIn("smtp down", reminder.last_error)
+        self.assertGreater(reminder.next_attempt_at, timezone.now())
+        # Not due again until the backoff has passed
+        self.assertEqual(reminders.deliver(sender=sender), (0, 0, 0))
+        later = timezone.now() + datetime.timedelta(hours=1)
+        self.assertEqual(reminders.deliver(now=later, sender=sender), (1, 0, 0))
+        self.assertEqual(Reminder.objects.get().attempts, 2)
+
+
+class HashRingTests(SimpleTestCase):
+
+    def test_adding_a_shard_only_moves_users_onto_it(self):
+        before = shards.HashRing(["default", "shard1"])
+        after = shards.HashRing(["default", "shard1", "shard2"])
+        placed = {user_id: (before.place(user_id), after.place(user_id)) for user_id in range(3000)}
+        moved = [new for old, new in placed.values() if old != new]
+        self.assertEqual(set(moved), {"shard2"})
+        # About a third of the users, not a reshuffle of everyone
+        self.assertLess(abs(len(moved) / len(placed) - 1 / 3), 0.1)
+
+    def test_setup_shards_rejects_backends_without_id_ranges(self):
+        with mock.patch.object(shards, "aliases", return_value=["default", "shard1"]), \
+                mock.patch.object(connection, "vendor", "mysql"), \
+                mock.patch("Goal.management.commands.setup_shards.call_command") as migrate:
+            with self.assertRaisesMessage(CommandError, "shard id ranges only work on sqlite or postgresql"):
+                call_command("setup_shards")
+        # Nothing is migrated before the check
+        migrate.assert_not_called()
+
+
+@unittest.skipUnless(shards.enabled(), "Needs GOAL_TRACKER_SHARDS; ShardSuiteTests runs these with two shards")
+class ShardTests(TestCase):
+    databases = set(settings.SHARD_DATABASES)
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type="application/json")
+
+    def register(self, email):
+        self.post("/user/register/", {"name": "a", "email": email, "password": "password123"})
+        return User.objects.get(email=email)
+
+    def create_goal(self, user_id, title="Run a marathon"):
+        return self.post("/goal/create_goal/", {
+            "id": user_id, "title": title, "description": "d", "category": "Health", "priority": "High", "targetDate": "2030-01-01",
+        }).json()["goal"]["id"]
+
+    def test_goals_live_on_the_users_shard(self):
+        users = [self.register("u%d@example.com" % i) for i in range(4)]
+        placed = dict(UserShard.objects.values_list("user_id", "alias"))
+        self.assertEqual(placed, {user.id: shards.ring().place(user.id) for user in users})
+
+        user = next(user for user in users if placed[user.id] != "default")
+        goal_id = self.create_goal(user.id)
+        self.post("/goal/create_milestone/", {"goal_id": goal_id, "title": "10k"})
+        self.assertTrue(Goal.objects.using(placed[user.id]).filter(id=goal_id, milestone_count=1).exists())
+        self.assertFalse(Goal.objects.using("default").filter(id=goal_id).exists())
+        self.assertEqual(self.client.get("/goal/dashboard/%d/" % user.id).json()["milestones"]["total"], 1)
+
+    def test_move_user_keeps_ids_and_serves_writes_afterwards(self):
+        user = User.objects.create(name="a", email="a@example.com", password="x")
+        goal_ids = [self.create_goal(user.id, "Goal %d" % i) for i in range(3)]
+        long_ago = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+        ArchivedGoal.objects.create(
+            user=user, title="Old", description="d", category="Health", priority="Low",
+            target_date=long_ago.date(), updated_at=long_ago, archived_at=long_ago,
+        )
+        before = self.client.get("/goal/goal/%d/" % user.id).json()
+
+        self.assertEqual(shards.move_user(user.id, "shard1", drain=0), 3)
+        self.assertEqual(shards.lookup(user.id), ("shard1", False))
+        self.assertFalse(Goal.objects.using("default").filter(user_id=user.id).exists())
+        self.assertEqual(ArchivedGoal.objects.using("shard1").filter(user_id=user.id).count(), 1)
+        self.assertTrue(User.objects.using("default").filter(id=user.id).exists())
+        self.assertEqual(self.client.get("/goal/goal/%d/" % user.id).json(), before)
+        self.assertEqual(len(self.client.get("/goal/search/%d/" % user.id, {"q": "goal"}).json()["results"]), 3)
+
+        response = self.client.put("/goal/update_goal/%d/" % goal_ids[0], json.dumps({"title": "Renamed"}), content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Goal.objects.using("shard1").get(id=goal_ids[0]).title, "Renamed")
+
+    def test_writes_wait_while_a_user_moves(self):
+        user = User.objects.create(name="a", email="a@example.com", password="x")
+        goal_id = self.create_goal(user.id)
+        UserShard.objects.create(user=user, alias="default", moving=True)
+        response = self.client.delete("/goal/delete_goal/%d/" % goal_id)
+        self.assertEqual((response.status_code, response["Retry-After"]), (503, "2"))
+        self.assertEqual(self.client.get("/goal/goal/%d/" % user.id).status_code, 200)
+
+
+@unittest.skipIf(shards.enabled(), "ShardTests already ran in this process")
+class ShardSuiteTests(unittest.TestCase):
+
+    def test_sharded_run(self):
+        # The shards are read from settings at import; under test they are in-memory databases
+        env = {**os.environ, "GOAL_TRACKER_SHARDS": "shard1.sqlite3,shard2.sqlite3"}
+        subprocess.run(
+            [sys.executable, "manage.py", "test", "Goal.tests.ShardTests", "-v", "0"],
+            env=env, cwd=settings.BASE_DIR, check=True, capture_output=True,
+        )
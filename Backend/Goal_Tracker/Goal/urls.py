@@ -1,16 +1,32 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# ASGI deployments can switch the CRUD and list endpoints to native async views
+if settings.ASYNC_VIEWS:
+    crud_views = async_views
+else:
+    crud_views = views
 
 urlpatterns = [
-    path("index/", views.index, name="index"),
-    path("goal/<id>/", views.goal, name="goal"),
-    path("create_goal/", views.create_goal, name="create_goal"),
-    path('update_goal/<int:goal_id>/', views.update_goal, name='update_goal'),
-    path('delete_goal/<int:goal_id>/', views.delete_goal, name='delete_goal'),
+    path("index/", crud_views.index, name="index"),
+    path("goal/<id>/", crud_views.goal, name="goal"),
+    path("sync/<int:id>/", views.sync, name="sync"),
+    path("events/<int:id>/", async_views.events, name="events"),
+    path("dashboard/<int:id>/", views.dashboard, name="dashboard"),
+    path("search/<int:id>/", views.search_goals, name="search"),
+    path("export/<int:id>/", views.export, name="export"),
+    path("import/<int:id>/", views.import_goals, name="import_goals"),
+    path("create_goal/", crud_views.create_goal, name="create_goal"),
+    path('update_goal/<int:goal_id>/', crud_views.update_goal, name='update_goal'),
+    path('delete_goal/<int:goal_id>/', crud_views.delete_goal, name='delete_goal'),
+    path('restore_goal/<int:goal_id>/', views.restore_goal, name='restore_goal'),
+
 
+    path("create_milestone/", crud_views.create_milestone, name="create_milestone"),
+    path('update_milestone/<int:milestone_id>/', crud_views.update_milestone, name='update_milestone'),
+    path('delete_milestone/<int:milestone_id>/', crud_views.delete_milestone, name='delete_milestone'),
 
-    path("create_milestone/", views.create_milestone, name="create_milestone"),
-    path('update_milestone/<int:milestone_id>/', views.update_milestone, name='update_milestone'),
-    path('delete_milestone/<int:milestone_id>/', views.delete_milestone, name='delete_milestone'),
+    path("batch/", views.batch, name="batch"),
 
 ]
@@ -0,0 +1,81 @@
+import datetime
+import hashlib
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from Goal_Tracker import shards
+from User.auth import owns
+from User.models import User
+
+from . import events
+from .cache import goal_list_cache
+
+
+def get_version(user_id):
+    """Return (data_version, data_modified) for a user, or None if the user does not exist."""
+    return User.objects.filter(id=user_id).values_list("data_version", "data_modified").first()
+
+
+async def aget_version(user_id):
+    return await User.objects.filter(id=user_id).values_list("data_version", "data_modified").afirst()
+
+
+def bump_version(user_id):
+    """
+    Record that a user's goals or milestones changed and return the new version.
+
+    Call this inside the same transaction as the mutation so readers never see
+    the new rows under the old version.
+    """
+    User.objects.filter(id=user_id).update(data_version=F("data_version") + 1, data_modified=timezone.now())
+    transaction.on_commit(lambda: goal_list_cache.invalidate(user_id), using=shards.current())
+    version = User.objects.filter(id=user_id).values_list("data_version", flat=True).first()
+    # Open event streams hear about the change once it is visible to their reads
+    transaction.on_commit(lambda: events.notify(user_id, version), using=shards.current())
+    return version
+
+
+def _visible_version(request, user_id):
+    # condition() runs before the view's own owns() check; giving out no validators for
+    # someone else's data keeps a 304 or a 403 from revealing whether it changed
+    if not owns(request, user_id):
+        return None
+    return request_version(request, user_id)
+
+
+def request_version(request, user_id):
+    # condition() asks for the ETag and Last-Modified separately; look the version up once.
+    if not hasattr(request, "_goal_data_version"):
+        request._goal_data_version = get_version(user_id)
+    return request._goal_data_version
+
+
+def list_etag(request, id):
+    version = _visible_version(request, id)
+    if version is None:
+        return None
+    # Filters and pages of the same data version are different representations.
+    query = hashlib.md5(request.META.get("QUERY_STRING", "").encode()).hexdigest()[:12]
+    return '"%s-%s-%s"' % (id, version[0], query)
+
+
+def dashboard_etag(request, id):
+    version = _visible_version(request, id)
+    if version is None:
+        return None
+    # Overdue and due-this-week move with the calendar as well as with the data.
+    return '"%s-%s-%s"' % (id, version[0], timezone.localdate().isoformat())
+
+
+def list_last_modified(request, id):
+    version = _visible_version(request, id)
+    if version is None or version[1] is None:
+        return None
+    modified = version[1]
+    # HTTP dates have one-second precision. Until the current second is over another
+    # write could land with the same timestamp, so only advertise closed seconds.
+    if timezone.now() - modified < datetime.timedelta(seconds=1):
+        return None
+    return modified
@@ -2,38 +2,75 @@ import json
 from django.http import JsonResponse
 
 from .models import User
-from .models import Goal, Milestone
-from django.http import HttpResponse
+from User.auth import owns
+from .models import ArchivedGoal, Goal, Milestone
+from .pagination import InvalidQuery, filter_goals, order_goals, page_queryset, parse_limit, split_page
+from . import search
+from .archive import list_goals as list_archived_goals, parse_archived, restore_goals
+from .batch import apply_operations, validate_operations
+from .cache import goal_list_cache
+from .serializers import DEFAULT_FIELDS, build_goals, dumps, goal_values, parse_fields, saved_goal, serialize_milestone
+from .export import CONTENT_TYPES, STREAMS, export_goals
+from .importer import DEFAULT_BATCH_SIZE, FORMATS as IMPORT_FORMATS, decode_lines, import_rows
+from . import mutations
+from .counters import goal_progress
+from .summary import dashboard as build_dashboard
+from .sync import changes_since
+from .versioning import dashboard_etag, list_etag, list_last_modified, request_version
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from Goal_Tracker.routers import read_database, replica_reads
 @csrf_exempt
 def index(request):
     return HttpResponse("Hello, world. You're at the Goal index.")
+
+
 @csrf_exempt
+@replica_reads
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=list_etag, last_modified_func=list_last_modified)
 def goal(request, id):
-    # Assuming you want to display all goals in the database
-    user = User.objects.filter(id=id).first()  # Replace with actual user retrieval logic
-    goals = Goal.objects.filter(user=user).prefetch_related('milestones')
-
-    data = []
-    for goal in goals:
-        data.append({
-            "id": goal.id,
-            "title": goal.title,
-            "description": goal.description,
-            "category": goal.category,
-            "priority": goal.priority,
-            "targetDate": goal.target_date,
-            "milestones": [
-                {
-                    "id": milestone.id,
-                    "title": milestone.title,
-                    "status": milestone.status,
-                }
-                for milestone in goal.milestones.all()
-            ]
-        })
-
-    return JsonResponse(data, safe=False)
+    if not owns(request, id):
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+
+    # The unfiltered list is served straight from the per-user cache when it is current
+    version = request_version(request, id)
+    if version is not None and not request.GET:
+        payload = goal_list_cache.get(id, version[0])
+        if payload is None:
+            rows = list(goal_values(Goal.objects.filter(user_id=id).order_by('id'), DEFAULT_FIELDS))
+            payload = dumps(build_goals(rows, DEFAULT_FIELDS))
+            goal_list_cache.set(id, version[0], payload)
+        return HttpResponse(payload, content_type="application/json")
+
+    goals = Goal.objects.filter(user_id=id)
+
+    try:
+        fields = parse_fields(request.GET.get("fields"))
+        # Archived goals live in their own tables and are only read when asked for
+        archived = parse_archived(request.GET.get("archived"))
+        if archived != "exclude":
+            return HttpResponse(dumps(list_archived_goals(id, request.GET, archived)), content_type="application/json")
+        goals = filter_goals(goals, request.GET)
+
+        # Without paging parameters keep returning the plain list the frontend expects.
+        if "limit" not in request.GET and "cursor" not in request.GET:
+            goals = order_goals(goals, request.GET.get("sort"))
+            rows = list(goal_values(goals, fields))
+            return HttpResponse(dumps(build_goals(rows, fields)), content_type="application/json")
+
+        page, page_info = page_queryset(goals, request.GET)
+    except InvalidQuery as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # The sort column rides along so the next cursor can be built from the last row
+    rows, next_cursor = split_page(list(goal_values(page, fields, extra=[page_info[1]])), page_info)
+    return HttpResponse(dumps({
+        "results": build_goals(rows, fields),
+        "next_cursor": next_cursor,
+    }), content_type="application/json")
 
 @csrf_exempt
 def create_goal(request):
@@ -48,7 +85,10 @@ def create_goal(request):
             priority = data.get("priority")
             target_date = data.get("targetDate")
 
-            user = User.objects.filter(id=id).first()
+            if not owns(request, id):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
+            # The auth middleware already resolved the cookie's user without a query
+            user = getattr(request, "user_record", None) or User.objects.filter(id=id).first()
             if not title or not description or not category or not priority or not target_date:
                 return JsonResponse({"error": "Please fill all the fields!"}, status=400)
         
@@ -61,9 +101,9 @@ def create_goal(request):
                 priority=priority,
                 target_date=target_date
             )
-            goal.save()
+            mutations.save_goal(goal)
 
-            return JsonResponse({"message": "Goal Created successfully"}, status=200)
+            return JsonResponse({"message": "Goal Created successfully", "goal": saved_goal(goal.id)}, status=200)
         
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON data!"}, status=400)
@@ -84,6 +124,8 @@ def create_milestone(request):
             goal = Goal.objects.filter(id=goal_id).first()
             if not goal:
                 return JsonResponse({"error": "Goal not found!"}, status=404)
+            if not owns(request, goal.user_id):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
 
             # Create a new Milestone object and save it to the database
             milestone = Milestone(
@@ -91,9 +133,13 @@ def create_milestone(request):
                 title=title,
                 status=False  # Default status is False
             )
-            milestone.save()
+            mutations.save_milestone(milestone, goal.user_id)
 
-            return JsonResponse({"message": "Milestone Created successfully"}, status=200)
+            return JsonResponse({
+                "message": "Milestone Created successfully",
+                "milestone": serialize_milestone(milestone),
+                "progress": goal_progress(goal.id),
+            }, status=200)
         
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON data!"}, status=400)
@@ -108,6 +154,8 @@ def update_goal(request, goal_id):
 
             if not goal:
                 return JsonResponse({"error": "Goal not found!"}, status=404)
+            if not owns(request, goal.user_id):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
 
             goal.title = data.get("title", goal.title)
             goal.description = data.get("description", goal.description)
@@ -115,8 +163,8 @@ def update_goal(request, goal_id):
             goal.priority = data.get("priority", goal.priority)
             goal.target_date = data.get("targetDate", goal.target_date)
 
-            goal.save()
-            return JsonResponse({"message": "Goal updated successfully"}, status=200)
+            mutations.save_goal(goal)
+            return JsonResponse({"message": "Goal updated successfully", "goal": saved_goal(goal.id)}, status=200)
 
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON data!"}, status=400)
@@ -129,26 +177,47 @@ def delete_goal(request, goal_id):
 
         if not goal:
             return JsonResponse({"error": "Goal not found!"}, status=404)
+        if not owns(request, goal.user_id):
+            return JsonResponse({"error": "Forbidden!"}, status=403)
 
-        goal.delete()
+        mutations.delete_goal(goal)
         return JsonResponse({"message": "Goal deleted successfully"}, status=200)
 
+@csrf_exempt
+def restore_goal(request, goal_id):
+    if request.method != 'POST':
+        return JsonResponse({"error": "Invalid request method!"}, status=405)
+    user_id = ArchivedGoal.objects.filter(id=goal_id).values_list('user_id', flat=True).first()
+    if user_id is None:
+        return JsonResponse({"error": "Archived goal not found!"}, status=404)
+    if not owns(request, user_id):
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+
+    restore_goals(user_id, [goal_id])
+    return JsonResponse({"message": "Goal restored successfully", "goal": saved_goal(goal_id)}, status=200)
+
 @csrf_exempt
 def update_milestone(request, milestone_id):
     if request.method == 'PUT':
         try:
             data = json.loads(request.body)
-            milestone = Milestone.objects.filter(id=milestone_id).first()
+            milestone = Milestone.objects.filter(id=milestone_id).select_related('goal').first()
 
             if not milestone:
                 return JsonResponse({"error": "Milestone not found!"}, status=404)
+            if not owns(request, milestone.goal.user_id):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
 
             # Optional updates, only update fields if provided
             milestone.title = data.get("title", milestone.title)
             milestone.status = data.get("status", milestone.status)
 
-            milestone.save()
-            return JsonResponse({"message": "Milestone updated successfully"}, status=200)
+            mutations.save_milestone(milestone, milestone.goal.user_id)
+            return JsonResponse({
+                "message": "Milestone updated successfully",
+                "milestone": serialize_milestone(milestone),
+                "progress": goal_progress(milestone.goal_id),
+            }, status=200)
 
         except json.JSONDecodeError:
             return JsonResponse({"error": "Invalid JSON data!"}, status=400)
@@ -157,10 +226,139 @@ def update_milestone(request, milestone_id):
 @csrf_exempt
 def delete_milestone(request, milestone_id):
     if request.method == 'DELETE':
-        milestone = Milestone.objects.filter(id=milestone_id).first()
+        milestone = Milestone.objects.filter(id=milestone_id).select_related('goal').first()
 
         if not milestone:
             return JsonResponse({"error": "Milestone not found!"}, status=404)
+        if not owns(request, milestone.goal.user_id):
+            return JsonResponse({"error": "Forbidden!"}, status=403)
+
+        mutations.delete_milestone(milestone, milestone.goal.user_id)
+        return JsonResponse({
+            "message": "Milestone deleted successfully",
+            "progress": goal_progress(milestone.goal_id),
+        }, status=200)
+
+
+@csrf_exempt
+def sync(request, id):
+    if not owns(request, id):
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+
+    # Clients pass back the cursor from their previous sync to get only what changed since
+    try:
+        since = int(request.GET.get("since", 0))
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor!"}, status=400)
+
+    changes = changes_since(id, since)
+    if changes is None:
+        return JsonResponse({"error": "User not found!"}, status=404)
+    return JsonResponse(changes)
+
+
+@csrf_exempt
+@replica_reads
+def search_goals(request, id):
+    if not owns(request, id):
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+
+    query = request.GET.get("q", "")
+    try:
+        limit = parse_limit(request.GET.get("limit"))
+        fields = parse_fields(request.GET.get("fields"))
+        if search.available():
+            matches = search.search(id, query, limit)
+        else:
+            matches = [(goal_id, None, None) for goal_id in search.like_search(id, query, limit)]
+    except InvalidQuery as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Load the matched goals in one query and put them back in rank order
+    rows = {row["id"]: row for row in goal_values(Goal.objects.filter(user_id=id, id__in=[m[0] for m in matches]), fields)}
+    matches = [match for match in matches if match[0] in rows]
+    results = build_goals([rows[goal_id] for goal_id, _, _ in matches], fields)
+    for result, (_, score, snippet) in zip(results, matches):
+        result["score"] = score
+        result["match"] = snippet
+    return HttpResponse(dumps({"results": results}), content_type="application/json")
+
+
+@csrf_exempt
+@replica_reads
+def export(request, id):
+    if not owns(request, id):
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+    export_format = request.GET.get("format", "json")
+    if export_format not in STREAMS:
+        return JsonResponse({"error": "Invalid format!"}, status=400)
+    if getattr(request, "user_record", None) is None and not User.objects.filter(id=id).exists():
+        return JsonResponse({"error": "User not found!"}, status=404)
+
+    # Rows are read and written chunk by chunk while the response is sent, after this
+    # view has returned, so the database is chosen now.
+    goals = export_goals(id).using(read_database())
+    response = StreamingHttpResponse(STREAMS[export_format](goals), content_type=CONTENT_TYPES[export_format])
+    response["Content-Disposition"] = 'attachment; filename="goals-%s.%s"' % (id, export_format)
+    return response
+
+
+@csrf_exempt
+def import_goals(request, id):
+    if request.method == 'POST':
+        if not owns(request, id):
+            return JsonResponse({"error": "Forbidden!"}, status=403)
+        import_format = request.GET.get("format", "ndjson")
+        if import_format not in IMPORT_FORMATS:
+            return JsonResponse({"error": "Invalid format!"}, status=400)
+        try:
+            batch_size = int(request.GET.get("batch_size", DEFAULT_BATCH_SIZE))
+        except ValueError:
+            batch_size = 0
+        if not 1 <= batch_size <= 5000:
+            return JsonResponse({"error": "Invalid batch size!"}, status=400)
+        if getattr(request, "user_record", None) is None and not User.objects.filter(id=id).exists():
+            return JsonResponse({"error": "User not found!"}, status=404)
+
+        # The body is read line by line as it is imported, never loaded whole
+        stats = import_rows(id, decode_lines(request), import_format, batch_size=batch_size)
+        return JsonResponse(stats, status=200)
+    else:
+        return JsonResponse({"error": "Invalid request method!"}, status=405)
+
+
+@csrf_exempt
+def batch(request):
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            user_id = data.get("id")
+            if not owns(request, user_id):
+                return JsonResponse({"error": "Forbidden!"}, status=403)
+            if getattr(request, "user_record", None) is None and not User.objects.filter(id=user_id).exists():
+                return JsonResponse({"error": "User not found!"}, status=404)
+
+            # Nothing is written unless every operation is valid
+            plan, errors = validate_operations(user_id, data.get("operations"))
+            if errors:
+                return JsonResponse({"error": "Invalid operations!", "errors": errors}, status=400)
+
+            version, results = apply_operations(user_id, plan)
+            return JsonResponse({"cursor": version, "results": results}, status=200)
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data!"}, status=400)
+
+
+@csrf_exempt
+@replica_reads
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=dashboard_etag)
+def dashboard(request, id):
+    if not owns(request, id):
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+    if request_version(request, id) is None:
+        return JsonResponse({"error": "User not found!"}, status=404)
 
-        milestone.delete()
-        return JsonResponse({"message": "Milestone deleted successfully"}, status=200)
+    # Served from the summary table the write paths keep current, plus the goals due around today
+    return JsonResponse(build_dashboard(int(id)))
@@ -0,0 +1,164 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# In-process request metrics. The middleware opens a RequestStats for every request
+# in a context variable; the database wrapper and timer() add to whichever one is
+# current, which also works for async views because sync_to_async copies the
+# context into its worker thread. Histograms are cumulative since process start,
+# the way Prometheus expects them; rates and windows are computed by the scraper.
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+# Statements kept per request for the slow request log.
+MAX_CAPTURED_QUERIES = 50
+
+
+class RequestStats:
+    def __init__(self, capture_sql=False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.timings = {}
+        self.captured = [] if capture_sql else None
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+
+def begin(capture_sql=False):
+    stats = RequestStats(capture_sql)
+    return stats, _current.set(stats)
+
+
+def end(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    """Add the time spent in the block to the current request under `name`."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(name, time.perf_counter() - start)
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """Connection execute wrapper counting and timing queries for the current request."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_seconds += duration
+        if stats.captured is not None and len(stats.captured) < MAX_CAPTURED_QUERIES:
+            stats.captured.append((duration, sql))
+
+
+def install_db_wrapper(connection, **kwargs):
+    if db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_wrapper)
+
+
+def _labels(names, values):
+    return ",".join('%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"')) for name, value in zip(names, values))
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name, self.help, self.labelnames = name, help_text, labelnames
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s counter" % self.name]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append("%s{%s} %s" % (self.name, _labels(self.labelnames, labels), value))
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets):
+        self.name, self.help, self.labelnames, self.buckets = name, help_text, labelnames, buckets
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = ["# HELP %s %s" % (self.name, self.help), "# TYPE %s histogram" % self.name]
+        with self._lock:
+            for labels, series in sorted(self.series.items()):
+                label_text = _labels(self.labelnames, labels)
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    cumulative += count
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (self.name, label_text, bound, cumulative))
+                lines.append('%s_bucket{%s,le="+Inf"} %d' % (self.name, label_text, series["count"]))
+                lines.append("%s_sum{%s} %s" % (self.name, label_text, round(series["sum"], 6)))
+                lines.append("%s_count{%s} %d" % (self.name, label_text, series["count"]))
+        return lines
+
+
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+requests_total = Counter("goal_tracker_requests_total", "Requests served.", ("view", "method", "status"))
+request_seconds = Histogram("goal_tracker_request_duration_seconds", "Wall time per request.", ("view", "method"), SECONDS)
+db_seconds = Histogram("goal_tracker_request_db_seconds", "Database time per request.", ("view",), SECONDS)
+query_count = Histogram("goal_tracker_request_queries", "SQL queries per request.", ("view",), (0, 1, 2, 5, 10, 20, 50, 100, 200))
+response_bytes = Histogram(
+    "goal_tracker_response_bytes", "Response body size; streamed bodies are not counted.", ("view",),
+    (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+METRICS = (requests_total, request_seconds, db_seconds, query_count, response_bytes)
+
+
+def record(view, method, status, stats, duration, size):
+    requests_total.inc((view, method, status))
+    request_seconds.observe((view, method), duration)
+    db_seconds.observe((view,), stats.db_seconds)
+    query_count.observe((view,), stats.queries)
+    if size is not None:
+        response_bytes.observe((view,), size)
+
+
+def render(samples=()):
+    """Prometheus text exposition of the request metrics plus (name, type, help, value) samples."""
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    described = set()
+    for name, kind, help_text, value in samples:
+        # Labelled samples of one family share a single HELP and TYPE
+        family = name.split("{")[0]
+        if family not in described:
+            described.add(family)
+            lines.extend(["# HELP %s %s" % (family, help_text), "# TYPE %s %s" % (family, kind)])
+        lines.append("%s %s" % (name, value))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics
+
+slow_log = logging.getLogger("goal_tracker.slow_requests")
+
+
+class MetricsMiddleware:
+    """
+    Time every request and split out database, hashing and serialization time.
+
+    Adds a Server-Timing header to the response, feeds the histograms served at
+    /metrics/, and logs requests slower than SLOW_REQUEST_MS with their SQL.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "SLOW_REQUEST_MS", None)
+        connection_created.connect(metrics.install_db_wrapper)
+        for connection in connections.all(initialized_only=True):
+            metrics.install_db_wrapper(connection)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token = metrics.begin(capture_sql=self.slow_ms is not None)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats, token = metrics.begin(capture_sql=self.slow_ms is not None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        duration = time.perf_counter() - stats.started
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unmatched"
+        size = None if response.streaming else len(response.content)
+        metrics.record(view, request.method, response.status_code, stats, duration, size)
+
+        timings = ['db;dur=%.2f;desc="%d queries"' % (stats.db_seconds * 1000, stats.queries)]
+        timings += ["%s;dur=%.2f" % (name, seconds * 1000) for name, seconds in sorted(stats.timings.items())]
+        timings.append("total;dur=%.2f" % (duration * 1000))
+        response["Server-Timing"] = ", ".join(timings)
+
+        if self.slow_ms is not None and duration * 1000 >= self.slow_ms:
+            slowest = sorted(stats.captured, reverse=True)[:10]
+            slow_log.warning(
+                "Slow request %s %s (%s) %.1fms, db %.1fms in %d queries\n%s",
+                request.method, request.get_full_path(), view, duration * 1000, stats.db_seconds * 1000, stats.queries,
+                "\n".join("  %.2fms %s" % (seconds * 1000, sql) for seconds, sql in slowest),
+            )
+        return response
@@ -0,0 +1,182 @@
+import contextvars
+import functools
+import itertools
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Max, Min
+from django.utils import timezone
+
+# Listing, search and analytics views are wrapped in replica_reads, and the ORM
+# reads they make go to one read replica, picked on the first read of the
+# request. Everything else, including any read inside a transaction on the
+# primary, stays on the primary. A client that has just written carries the pin
+# cookie for READ_YOUR_WRITES_SECONDS, and its reads stay on the primary until
+# the replicas have had time to catch up.
+
+# {"alias": None} while a replica_reads view runs; the alias is filled in by the first read
+_replica_reads = contextvars.ContextVar("replica_reads", default=None)
+
+
+def replica_databases():
+    return getattr(settings, "REPLICA_DATABASES", [])
+
+
+class ReplicaLag:
+    """
+    How far each replica is behind the primary, measured at most every REPLICA_LAG_CHECK_SECONDS.
+
+    User.data_modified is stamped by every write, so the newest stamp a replica
+    has says where it is. The lag is the age of the oldest write the primary has
+    that the replica has not seen yet, and 0 when it has them all.
+    """
+
+    def __init__(self):
+        self._lag = {}
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    def measure(self, alias):
+        from User.models import User
+
+        latest = User.objects.using(alias).aggregate(latest=Max("data_modified"))["latest"]
+        missing = User.objects.using(DEFAULT_DB_ALIAS).filter(data_modified__isnull=False)
+        if latest is not None:
+            missing = missing.filter(data_modified__gt=latest)
+        oldest = missing.aggregate(oldest=Min("data_modified"))["oldest"]
+        return 0.0 if oldest is None else max(0.0, (timezone.now() - oldest).total_seconds())
+
+    def get(self, alias):
+        interval = getattr(settings, "REPLICA_LAG_CHECK_SECONDS", 5)
+        # One thread refreshes a stale reading while the others keep using the last one
+        if time.monotonic() - self._checked.get(alias, float("-inf")) >= interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked[alias] = time.monotonic()
+                self._lag[alias] = self.measure(alias)
+            finally:
+                self._lock.release()
+        return self._lag.get(alias, 0.0)
+
+    def stats(self):
+        return {alias: round(self.get(alias), 3) for alias in replica_databases()}
+
+
+replica_lag = ReplicaLag()
+_next_replica = itertools.count()
+_routed_lock = threading.Lock()
+# Requests from replica_reads views by where their reads went
+routed = {"replica": 0, "pinned": 0, "stale": 0}
+
+
+def _count(outcome):
+    with _routed_lock:
+        routed[outcome] += 1
+
+
+def pick_replica():
+    replicas = replica_databases()
+    max_lag = getattr(settings, "REPLICA_MAX_LAG", 30)
+    start = next(_next_replica)
+    for i in range(len(replicas)):
+        alias = replicas[(start + i) % len(replicas)]
+        if replica_lag.get(alias) <= max_lag:
+            _count("replica")
+            return alias
+    # Every replica is too far behind
+    _count("stale")
+    return DEFAULT_DB_ALIAS
+
+
+def read_database():
+    """The alias reads in the current context should use."""
+    from . import shards
+
+    if shards.current() != DEFAULT_DB_ALIAS:
+        # Replicas only copy the default database, so other shards are read directly
+        return shards.current()
+    state = _replica_reads.get()
+    if state is None or not replica_databases() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    if state["alias"] is None:
+        state["alias"] = pick_replica()
+    return state["alias"]
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Related lookups follow the object they start from
+            return instance._state.db
+        return read_database()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _start(request):
+    if not replica_databases():
+        return None
+    if getattr(settings, "REPLICA_PIN_COOKIE", "read_primary") in request.COOKIES:
+        _count("pinned")
+        return None
+    return {"alias": None}
+
+
+def replica_reads(view):
+    """Let the ORM reads made by `view` go to a replica unless the client has just written."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(_start(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(_start(request))
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """Pin a client to the primary for a short window after each successful write."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.pin(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.pin(request, await self.get_response(request))
+
+    def pin(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            response.set_cookie(
+                getattr(settings, "REPLICA_PIN_COOKIE", "read_primary"), "1",
+                max_age=getattr(settings, "READ_YOUR_WRITES_SECONDS", 5), httponly=True, samesite="Lax",
+            )
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/dev/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'Goal_Tracker.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -53,9 +55,13 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.middleware.common.CommonMiddleware',
+    'User.middleware.UserRecordMiddleware',
 ]
 
+# Users resolved from the signed auth cookie are cached per process
+USER_RECORD_CACHE_SIZE = 10000
+USER_RECORD_CACHE_TTL = 300
+
 
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173", 
@@ -89,6 +95,57 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'Goal_Tracker.wsgi.application'
 
+# API workers only serve JSON. GOAL_TRACKER_PROFILE=api leaves out the admin, sessions,
+# messages, templates and static files with their middleware, and imports the Goal and
+# User URLconfs on the first request that reaches them. Run migrations, the admin and
+# the management commands with the full profile.
+SETTINGS_PROFILE = os.environ.get('GOAL_TRACKER_PROFILE', 'full')
+API_ONLY = SETTINGS_PROFILE == 'api'
+
+if API_ONLY:
+    INSTALLED_APPS = [
+        'User',
+        'Goal',
+        'corsheaders',
+    ]
+    MIDDLEWARE = [
+        'Goal_Tracker.middleware.MetricsMiddleware',
+        'corsheaders.middleware.CorsMiddleware',
+        'django.middleware.security.SecurityMiddleware',
+        'django.middleware.common.CommonMiddleware',
+        'User.middleware.UserRecordMiddleware',
+    ]
+    TEMPLATES = []
+
+# Serve the goal/milestone CRUD, list and auth endpoints with native async views.
+# Only worth enabling when running under Goal_Tracker.asgi.
+ASYNC_VIEWS = os.environ.get('GOAL_TRACKER_ASYNC_VIEWS', '') == '1'
+
+# Server-sent change events at /goal/events/<id>/ (ASGI only). Each open stream buffers
+# up to QUEUE_SIZE events before it falls back to reading the delta itself.
+EVENT_STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+EVENT_STREAM_RETRY_MS = 3000
+EVENT_STREAM_QUEUE_SIZE = 100
+EVENT_STREAM_MAX_PER_USER = 10
+
+# `manage.py archive_goals` moves finished goals, and goals more than PAST_DUE_DAYS past
+# their target date, out of the hot tables once nobody has touched them for QUIET_DAYS.
+ARCHIVE_PAST_DUE_DAYS = 365
+ARCHIVE_QUIET_DAYS = 30
+
+# `manage.py send_reminders` queues a reminder DUE_SOON_DAYS before an unfinished goal's
+# target date and another the day after it, and delivers them with REMINDER_SENDER.
+# A claimed batch is retried after LEASE_SECONDS if its worker dies; failed sends back
+# off from RETRY_SECONDS and are given up after MAX_ATTEMPTS.
+REMINDER_DUE_SOON_DAYS = 3
+REMINDER_SENDER = "Goal.reminders.send_email"
+REMINDER_LEASE_SECONDS = 300
+REMINDER_RETRY_SECONDS = 60
+REMINDER_MAX_ATTEMPTS = 5
+DEFAULT_FROM_EMAIL = os.environ.get("GOAL_TRACKER_FROM_EMAIL", "reminders@goal-tracker.local")
+if DEBUG:
+    EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
 
 # Database
 # https://docs.djangoproject.com/en/dev/ref/settings/#databases
@@ -96,10 +153,105 @@ WSGI_APPLICATION = 'Goal_Tracker.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('GOAL_TRACKER_DB_NAME') or BASE_DIR / 'db.sqlite3',
     }
 }
 
+# SQLite profile for serving concurrent requests. WAL lets readers run alongside
+# the single writer, synchronous=NORMAL only fsyncs at checkpoints (safe in WAL
+# mode), and BEGIN IMMEDIATE takes the write lock when a transaction starts so a
+# writer waits on busy_timeout instead of failing with "database is locked" when
+# it tries to upgrade a read lock. That covers every atomic() block, which here are
+# the write paths; the read-only snapshots (sync changes, summary checks) open theirs
+# through shards.snapshot(), which begins DEFERRED and takes no lock. Plain reads
+# outside a transaction take none either. GOAL_TRACKER_SQLITE_PROFILE=default turns it off.
+SQLITE_PROFILE = os.environ.get('GOAL_TRACKER_SQLITE_PROFILE', 'production')
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # KiB, so about 64MB of page cache per connection
+    'mmap_size': 268435456,
+    'busy_timeout': 20000,  # ms; writers queue for the lock rather than erroring
+    'temp_store': 'MEMORY',
+}
+
+if SQLITE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': ';'.join('PRAGMA %s=%s' % pragma for pragma in SQLITE_PRAGMAS.items()),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
+# Shards, given as comma separated database files in GOAL_TRACKER_SHARDS. Each user's goal
+# data lives on one shard; 'default' is always one of them and keeps the user accounts and
+# the shard directory. `manage.py setup_shards` migrates the others and gives each its own
+# id range, `manage.py rebalance_shards` moves users between them.
+SHARD_DATABASES = ['default']
+SHARD_ID_SPAN = 10 ** 12  # ids made on the nth shard start at n * SHARD_ID_SPAN
+for number, name in enumerate(filter(None, os.environ.get('GOAL_TRACKER_SHARDS', '').split(',')), 1):
+    alias = 'shard%d' % number
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': name}
+    SHARD_DATABASES.append(alias)
+
+# Read replicas, given as comma separated SQLite files in GOAL_TRACKER_REPLICAS and kept
+# fresh locally by `manage.py snapshot_replica --interval N`. Listing, search and analytics
+# reads go to them; a client that has just written reads from the primary for
+# READ_YOUR_WRITES_SECONDS, and replicas more than REPLICA_MAX_LAG seconds behind are skipped.
+REPLICA_DATABASES = []
+for number, name in enumerate(filter(None, os.environ.get('GOAL_TRACKER_REPLICAS', '').split(',')), 1):
+    alias = 'replica%d' % number
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': name,
+        # Under test the replicas point at the primary's test database
+        'TEST': {'MIRROR': 'default'},
+        'OPTIONS': {
+            'init_command': ';'.join('PRAGMA %s=%s' % pragma for pragma in SQLITE_PRAGMAS.items() if pragma[0] != 'journal_mode') + ';PRAGMA query_only=1',
+        },
+    }
+    REPLICA_DATABASES.append(alias)
+
+READ_YOUR_WRITES_SECONDS = 5
+REPLICA_PIN_COOKIE = 'read_primary'
+REPLICA_MAX_LAG = 30
+REPLICA_LAG_CHECK_SECONDS = 5
+
+DATABASE_ROUTERS = []
+if len(SHARD_DATABASES) > 1:
+    DATABASE_ROUTERS.append('Goal_Tracker.shards.ShardRouter')
+    MIDDLEWARE = MIDDLEWARE + ['Goal_Tracker.shards.ShardMiddleware']
+if REPLICA_DATABASES:
+    DATABASE_ROUTERS.append('Goal_Tracker.routers.ReadReplicaRouter')
+    MIDDLEWARE = MIDDLEWARE + ['Goal_Tracker.routers.ReplicaPinMiddleware']
+
+
+# Cache
+# https://docs.djangoproject.com/en/dev/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Serialized goal lists, one entry per user. Local memory evicts least recently
+    # used entries past MAX_ENTRIES; swap in FileBasedCache with a LOCATION directory
+    # to share the cache between worker processes on one host.
+    'goal_lists': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'goal-lists',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+            'CULL_FREQUENCY': 10,
+        },
+    },
+}
+
+GOAL_LIST_CACHE_ALIAS = 'goal_lists'
+GOAL_LIST_CACHE_MAX_BYTES = 1024 * 1024
+
 
 # Password validation
 # https://docs.djangoproject.com/en/dev/ref/settings/#auth-password-validators
@@ -120,6 +272,30 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+PASSWORD_HASHERS = [
+    'User.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# PBKDF2 work factor; None keeps Django's default. Stored hashes made with a
+# different count are upgraded the next time their owner logs in.
+PASSWORD_HASH_ITERATIONS = int(os.environ['PASSWORD_HASH_ITERATIONS']) if os.environ.get('PASSWORD_HASH_ITERATIONS') else None
+
+# Hashing runs on its own small pool so login bursts cannot occupy every request worker.
+# Requests beyond WORKERS + MAX_PENDING are refused with 429, slow ones with 503.
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_MAX_PENDING = 16
+PASSWORD_HASH_TIMEOUT = 5
+
+# Request metrics are served at /metrics/; set METRICS_TOKEN to require it as a bearer token.
+# Requests slower than SLOW_REQUEST_MS are logged with their SQL (unset to turn off).
+METRICS_TOKEN = os.environ.get('GOAL_TRACKER_METRICS_TOKEN') or None
+SLOW_REQUEST_MS = int(os.environ['GOAL_TRACKER_SLOW_REQUEST_MS']) if os.environ.get('GOAL_TRACKER_SLOW_REQUEST_MS') else None
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/dev/topics/i18n/
 
@@ -0,0 +1,375 @@
+import bisect
+import contextlib
+import contextvars
+import functools
+import hashlib
+import json
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import JsonResponse
+from django.http.request import RawPostDataException
+from django.urls import Resolver404, resolve
+
+# Each user's goals, milestones, tombstones, summary rows and search documents live
+# together on one shard database. 'default' is always a shard and also holds the
+# shard directory (User.UserShard) and the user rows people log in with; every other
+# shard keeps a copy of its users' rows for the foreign keys and for the
+# data_version the write paths bump in the same transaction as the goal rows.
+#
+# Users without a directory row live on 'default', where everything lived before
+# sharding. New users are placed by a consistent-hash ring, so adding a shard only
+# reassigns about 1/N of them, and rebalance_shards moves existing users over.
+#
+# ShardMiddleware binds each Goal request to its user's shard and ShardRouter sends
+# the Goal models (and User, while bound) there. Code that opens a transaction or
+# a raw cursor must do it on current().
+
+_current = contextvars.ContextVar("shard", default=None)
+
+SHARDED_APPS = {"Goal"}
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Backends reserve_ids() knows how to start an id sequence on
+ID_RANGE_VENDORS = ("sqlite", "postgresql")
+
+
+class MoveAborted(Exception):
+    pass
+
+
+def aliases():
+    return getattr(settings, "SHARD_DATABASES", [DEFAULT_DB_ALIAS])
+
+
+def enabled():
+    return len(aliases()) > 1
+
+
+def current():
+    """The database the current request or command is bound to."""
+    return _current.get() or DEFAULT_DB_ALIAS
+
+
+@contextlib.contextmanager
+def use(alias):
+    token = _current.set(alias)
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def snapshot():
+    """
+    A read-only transaction on current(), for reads that must see one consistent state.
+
+    The SQLite profile starts transactions with BEGIN IMMEDIATE, which takes the write
+    lock up front; a snapshot begins DEFERRED instead so it never queues behind (or
+    holds up) the writers. Don't write inside one.
+    """
+    connection = connections[current()]
+    mode = getattr(connection, "transaction_mode", None)  # only SQLite has one
+    if mode is None or connection.in_atomic_block:
+        with transaction.atomic(using=connection.alias):
+            yield
+        return
+    connection.transaction_mode = "DEFERRED"
+    try:
+        with transaction.atomic(using=connection.alias):
+            # BEGIN has gone out by now, so put the mode back for later writers
+            connection.transaction_mode = mode
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+def for_user(user_id):
+    return use(lookup(user_id)[0])
+
+
+def scope(user_id=None):
+    """Bind to `user_id`'s shard, or to every shard in turn for maintenance that covers everyone."""
+    for alias in [lookup(user_id)[0]] if user_id else aliases():
+        with use(alias):
+            yield alias
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hashing with virtual nodes, so shards own many small arcs of the ring."""
+
+    def __init__(self, nodes, replicas=64):
+        self.points = sorted((_hash("%s#%d" % (node, i)), node) for node in nodes for i in range(replicas))
+        self.keys = [point for point, _ in self.points]
+
+    def place(self, key):
+        return self.points[bisect.bisect(self.keys, _hash(str(key))) % len(self.points)][1]
+
+
+@functools.lru_cache(maxsize=4)
+def _ring(nodes):
+    return HashRing(nodes)
+
+
+def ring():
+    return _ring(tuple(aliases()))
+
+
+def lookup(user_id):
+    """Return (alias, moving) for a user."""
+    from User.models import UserShard
+
+    row = UserShard.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).values_list("alias", "moving").first()
+    return row or (DEFAULT_DB_ALIAS, False)
+
+
+def _candidates(pk):
+    # Rows keep their ids when users move, so the id range only says where to look first
+    names = aliases()
+    home = min(int(pk) // settings.SHARD_ID_SPAN, len(names) - 1)
+    return [names[home]] + names[:home] + names[home + 1:]
+
+
+def owner(models, pk):
+    """The user a goal or milestone belongs to, whichever shard and table it is in."""
+    for alias in _candidates(pk):
+        for model in models:
+            field = "goal__user_id" if model._meta.model_name.endswith("milestone") else "user_id"
+            user_id = model.objects.using(alias).filter(pk=pk).values_list(field, flat=True).first()
+            if user_id is not None:
+                return user_id
+    return None
+
+
+def place_user(user):
+    """Give a newly registered user a shard and copy their row there."""
+    from User.models import User, UserShard
+
+    if not enabled():
+        return DEFAULT_DB_ALIAS
+    alias = ring().place(user.id)
+    if alias != DEFAULT_DB_ALIAS:
+        # The shard copy is only there for foreign keys and versions, never to log in with
+        User.objects.using(alias).create(id=user.id, name=user.name, email=user.email, password="!")
+    UserShard.objects.using(DEFAULT_DB_ALIAS).create(user_id=user.id, alias=alias)
+    return alias
+
+
+def reserve_ids(alias):
+    """Start the goal tables of shard `alias` at its own id range so ids stay unique across shards."""
+    from django.apps import apps
+    from django.db import connections
+
+    connection = connections[alias]
+    start = aliases().index(alias) * settings.SHARD_ID_SPAN
+    tables = [model._meta.db_table for model in apps.get_app_config("Goal").get_models() if model._meta.auto_field]
+    with connection.cursor() as cursor:
+        for table in tables:
+            if connection.vendor == "sqlite":
+                cursor.execute("DELETE FROM sqlite_sequence WHERE name = %s AND seq < %s", [table, start])
+                cursor.execute(
+                    "INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s "
+                    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)",
+                    [table, start, table],
+                )
+            elif connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT setval(pg_get_serial_sequence(%s, 'id'), GREATEST(%s, (SELECT COALESCE(MAX(id), 1) FROM " + connection.ops.quote_name(table) + ")))",
+                    [table, start],
+                )
+            else:
+                raise ImproperlyConfigured(
+                    "Shard %r uses %s, but shard id ranges only work on %s."
+                    % (alias, connection.vendor, " or ".join(ID_RANGE_VENDORS))
+                )
+    return start
+
+
+def _delete_rows(user_id, drop_user):
+    # Called bound to the shard being cleared, inside its transaction
+    from Goal import search
+    from Goal.models import ArchivedGoal, Goal, GoalSummary, Reminder, Tombstone
+    from User.models import User
+
+    goal_ids = list(Goal.objects.filter(user_id=user_id).values_list("id", flat=True))
+    Reminder.objects.filter(user_id=user_id).delete()
+    Goal.objects.filter(user_id=user_id).delete()
+    ArchivedGoal.objects.filter(user_id=user_id).delete()
+    Tombstone.objects.filter(user_id=user_id).delete()
+    GoalSummary.objects.filter(user_id=user_id).delete()
+    search.reindex(goal_ids)
+    if drop_user:
+        User.objects.filter(id=user_id).delete()
+
+
+def move_user(user_id, target, drain=2.0):
+    """
+    Move a user's rows to shard `target` while the site keeps serving them.
+
+    The directory marks the user as moving, so new writes are refused with 503
+    while reads carry on from the old shard. After `drain` seconds for writes
+    already in flight, the rows are copied with their ids, the directory is
+    switched and the old copies are deleted. A write that still slips in is caught
+    by comparing data_version before and after the copy, and aborts the move.
+    Returns the number of goals moved.
+    """
+    from Goal import search, summary
+    from Goal.models import ArchivedGoal, ArchivedMilestone, Goal, Milestone, Reminder, Tombstone
+    from User.models import User, UserShard
+
+    if target not in aliases():
+        raise ValueError("Unknown shard %r" % target)
+    source, _ = lookup(user_id)
+    if source == target:
+        return 0
+
+    UserShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(user_id=user_id, defaults={"alias": source, "moving": True})
+    try:
+        time.sleep(drain)
+        with use(source), transaction.atomic(using=source):
+            user = User.objects.filter(id=user_id).values().first()
+            if user is None:
+                raise MoveAborted("User %d has no row on %s" % (user_id, source))
+            goals = list(Goal.objects.filter(user_id=user_id).values())
+            milestones = list(Milestone.objects.filter(goal__user_id=user_id).values())
+            tombstones = list(Tombstone.objects.filter(user_id=user_id).values())
+            archived = list(ArchivedGoal.objects.filter(user_id=user_id).values())
+            archived_milestones = list(ArchivedMilestone.objects.filter(goal__user_id=user_id).values())
+            reminders = list(Reminder.objects.filter(user_id=user_id).values())
+
+        with use(target), transaction.atomic(using=target):
+            # Leftovers of an earlier move that was aborted
+            _delete_rows(user_id, drop_user=False)
+            versions = {field: user[field] for field in ("data_version", "data_modified", "sync_floor")}
+            if not User.objects.filter(id=user_id).update(**versions):
+                User.objects.create(id=user_id, name=user["name"], email=user["email"], password="!", **versions)
+            Goal.objects.bulk_create([Goal(**row) for row in goals], batch_size=500)
+            Milestone.objects.bulk_create([Milestone(**row) for row in milestones], batch_size=500)
+            Tombstone.objects.bulk_create([Tombstone(**row) for row in tombstones], batch_size=500)
+            ArchivedGoal.objects.bulk_create([ArchivedGoal(**row) for row in archived], batch_size=500)
+            ArchivedMilestone.objects.bulk_create([ArchivedMilestone(**row) for row in archived_milestones], batch_size=500)
+            # Keeps their ids, so a reminder that was sent stays sent
+            Reminder.objects.bulk_create([Reminder(**row) for row in reminders], batch_size=500)
+            summary.rebuild([user_id])
+            search.reindex([row["id"] for row in goals])
+
+        with use(source):
+            if User.objects.filter(id=user_id).values_list("data_version", flat=True).first() != user["data_version"]:
+                with use(target), transaction.atomic(using=target):
+                    _delete_rows(user_id, drop_user=target != DEFAULT_DB_ALIAS)
+                raise MoveAborted("User %d was written to during the move" % user_id)
+
+        UserShard.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).update(alias=target, moving=False)
+    except BaseException:
+        UserShard.objects.using(DEFAULT_DB_ALIAS).filter(user_id=user_id).update(moving=False)
+        raise
+
+    with use(source), transaction.atomic(using=source):
+        _delete_rows(user_id, drop_user=source != DEFAULT_DB_ALIAS)
+    return len(goals)
+
+
+class ShardRouter:
+    def _route(self, model, hints):
+        if model._meta.app_label not in SHARDED_APPS and not (model._meta.label == "User.User" and _current.get()):
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            # Related lookups follow the object they start from
+            return instance._state.db
+        alias = current()
+        # Users on 'default' are left to the next router, which may send reads to a replica
+        return None if alias == DEFAULT_DB_ALIAS else alias
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == DEFAULT_DB_ALIAS or db not in aliases():
+            return None
+        return app_label in SHARDED_APPS or app_label == "User"
+
+
+class ShardMiddleware:
+    """Bind each Goal request to the shard of the user it is about."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        alias, moving = self.route(request)
+        if moving and request.method not in SAFE_METHODS:
+            return self.moving()
+        with use(alias):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        alias, moving = await sync_to_async(self.route)(request)
+        if moving and request.method not in SAFE_METHODS:
+            return self.moving()
+        with use(alias):
+            return await self.get_response(request)
+
+    def moving(self):
+        response = JsonResponse({"error": "Your goals are being moved, please try again shortly!"}, status=503)
+        response["Retry-After"] = "2"
+        return response
+
+    def route(self, request):
+        user_id = self.user_for(request)
+        if user_id is None:
+            return DEFAULT_DB_ALIAS, False
+        return lookup(user_id)
+
+    def user_for(self, request):
+        from Goal.models import ArchivedGoal, Goal, Milestone
+
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.func.__module__ not in ("Goal.views", "Goal.async_views"):
+            return None
+
+        body = {}
+        if request.content_type == "application/json":
+            try:
+                body = json.loads(request.body)
+            except (ValueError, RawPostDataException):
+                pass
+        if not isinstance(body, dict):
+            body = {}
+
+        try:
+            # The goal list and friends name the user in the URL, creates and batches in the body
+            for user_id in (match.kwargs.get("id"), body.get("id")):
+                if user_id is not None:
+                    return int(user_id)
+            for key, models in (("goal_id", (Goal, ArchivedGoal)), ("milestone_id", (Milestone,))):
+                pk = match.kwargs.get(key, body.get(key))
+                if pk is not None:
+                    return owner(models, int(pk))
+        except (TypeError, ValueError):
+            return None
+        record = getattr(request, "user_record", None)
+        return record.id if record is not None else None
@@ -0,0 +1,89 @@
+"""
+Time how long a fresh worker takes to come up and answer its first request.
+
+Run as ``python -m Goal_Tracker.startup [path] [requests]`` from the project
+directory; the bench_startup command starts it once per run and settings
+profile. The clock starts before anything from Django is imported, and the
+result is printed as one line of JSON.
+"""
+
+import time
+
+started = time.perf_counter()
+
+import json
+import os
+import sys
+from wsgiref.util import setup_testing_defaults
+
+
+def make_environ(path):
+    environ = {"PATH_INFO": path, "REQUEST_METHOD": "GET", "wsgi.errors": sys.stderr}
+    setup_testing_defaults(environ)
+    return environ
+
+
+def send(application, path):
+    # Drain and close the response like a WSGI server so request_finished fires
+    status = []
+    body = application(make_environ(path), lambda code, headers, exc_info=None: status.append(code))
+    try:
+        b"".join(body)
+    finally:
+        body.close()
+    return int(status[0].split()[0])
+
+
+def mean_us(func, requests, rounds=5):
+    # Best of several rounds, so a stray GC pause or scheduler hiccup does not count
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(max(1, requests // rounds)):
+            func()
+        elapsed = (time.perf_counter() - start) / max(1, requests // rounds)
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1e6
+
+
+def main(path="/goal/index/", requests=1000):
+    modules_before = len(sys.modules)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "Goal_Tracker.settings")
+    from Goal_Tracker.wsgi import application
+    ready = time.perf_counter()
+
+    status = send(application, path)
+    first = time.perf_counter()
+
+    from django.conf import settings
+    from django.core.handlers.wsgi import WSGIRequest
+    from django.urls import resolve
+
+    # The same request through the whole handler and straight to the view; the
+    # difference is what middleware and request plumbing cost per request.
+    handler_us = mean_us(lambda: send(application, path), requests)
+
+    def direct():
+        request = WSGIRequest(make_environ(path))
+        match = resolve(path)
+        match.func(request, *match.args, **match.kwargs)
+
+    view_us = mean_us(direct, requests)
+
+    return {
+        "profile": settings.SETTINGS_PROFILE,
+        "path": path,
+        "status": status,
+        "import_ms": round((ready - started) * 1000, 2),
+        "first_response_ms": round((first - ready) * 1000, 2),
+        "ready_ms": round((first - started) * 1000, 2),
+        "modules": len(sys.modules) - modules_before,
+        "request_us": round(handler_us, 1),
+        "view_us": round(view_us, 1),
+        "overhead_us": round(handler_us - view_us, 1),
+    }
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    print(json.dumps(main(args[0] if args else "/goal/index/", int(args[1]) if len(args) > 1 else 1000)))
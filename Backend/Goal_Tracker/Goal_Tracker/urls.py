@@ -14,13 +14,32 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+from django.conf import settings
+from django.urls import URLResolver, path, include
+from django.urls.resolvers import RoutePattern
 from . import views
 
+
+def lazy_include(route, urlconf):
+    # include() imports the app URLconf, and every view module behind it, as soon as this
+    # file loads. A resolver holding the dotted path waits for a request under the route.
+    return URLResolver(RoutePattern(route, is_endpoint=False), urlconf)
+
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('get-csrf-token/', views.get_csrf_token, name='get_csrf_token'),
-    path("user/", include('User.urls')),
-    path("goal/", include('Goal.urls')),
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
+
+if settings.API_ONLY:
+    urlpatterns += [
+        lazy_include("user/", 'User.urls'),
+        lazy_include("goal/", 'Goal.urls'),
+    ]
+else:
+    from django.contrib import admin
+
+    urlpatterns = [path('admin/', admin.site.urls)] + urlpatterns + [
+        path("user/", include('User.urls')),
+        path("goal/", include('Goal.urls')),
+    ]
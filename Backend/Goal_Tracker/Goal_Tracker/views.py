@@ -1,5 +1,41 @@
+from django.conf import settings
 from django.middleware.csrf import get_token
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+
+from Goal.cache import goal_list_cache
+from Goal.events import broker as event_broker
+from User.auth import user_record_cache
+from User.hashing import password_pool
+
+from . import metrics, routers
 
 def get_csrf_token(request):
-    return JsonResponse({'csrfToken': get_token(request)})
\ No newline at end of file
+    return JsonResponse({'csrfToken': get_token(request)})
+
+
+def metrics_view(request):
+    token = getattr(settings, "METRICS_TOKEN", None)
+    if token and request.headers.get("Authorization") != "Bearer " + token:
+        return JsonResponse({"error": "Forbidden!"}, status=403)
+
+    # Counters kept by the caches and the hashing pool, read at scrape time
+    samples = []
+    for name, value in goal_list_cache.stats().items():
+        samples.append(("goal_tracker_goal_list_cache_%s" % name, "gauge" if name == "hit_ratio" else "counter",
+                        "Goal list cache %s." % name.replace("_", " "), value))
+    for name, value in user_record_cache.stats().items():
+        samples.append(("goal_tracker_user_record_cache_%s" % name, "gauge" if name == "size" else "counter",
+                        "Auth cookie user cache %s." % name, value))
+    for name, value in password_pool.stats().items():
+        samples.append(("goal_tracker_password_hash_%s" % name, "gauge" if name == "in_flight" else "counter",
+                        "Password hashing pool %s." % name.replace("_", " "), value))
+    for name, value in event_broker.stats().items():
+        samples.append(("goal_tracker_event_stream_%s" % name, "gauge" if name == "subscribers" else "counter",
+                        "Change event streams %s." % name, value))
+    for alias, lag in routers.replica_lag.stats().items():
+        samples.append(('goal_tracker_replica_lag_seconds{database="%s"}' % alias, "gauge",
+                        "Age of the oldest write a read replica has not seen yet.", lag))
+    for outcome, count in routers.routed.items():
+        samples.append(('goal_tracker_replica_reads_total{outcome="%s"}' % outcome, "counter",
+                        "Listing, search and analytics requests by where their reads went.", count))
+    return HttpResponse(metrics.render(samples), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,97 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from Goal_Tracker import shards
+
+from .auth import signer, user_record_cache
+from .hashing import HashingRejected, ahash_password, averify_password
+from .models import User
+from .views import hashing_busy
+
+# Native coroutine versions of the views in views.py, used when ASYNC_VIEWS is on.
+# Password hashing is CPU bound, so it runs on the hashing pool instead of the event loop.
+
+
+@csrf_exempt
+async def createuser(request):
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            name = data.get("name")
+            email = data.get("email")
+            password = data.get("password")
+
+            if not name or not email or not password:
+                return JsonResponse({"error": "Please fill all the fields!"}, status=400)
+
+            try:
+                validate_email(email)
+            except ValidationError:
+                return JsonResponse({"error": "Invalid email format!"}, status=400)
+
+            if len(password) < 8:
+                return JsonResponse({"error": "Password must be at least 8 characters long!"}, status=400)
+
+            if await User.objects.filter(email=email).aexists():
+                return JsonResponse({"error": "Email already exists!"}, status=400)
+
+            try:
+                hashed_password = await ahash_password(password)
+            except HashingRejected as e:
+                return hashing_busy(e)
+            user = await User.objects.acreate(name=name, email=email, password=hashed_password)
+            await sync_to_async(shards.place_user)(user)
+
+            return JsonResponse({"message": "User created successfully!"}, status=201)
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data!"}, status=400)
+    else:
+        return JsonResponse({"error": "Invalid request method!"}, status=405)
+
+
+@csrf_exempt
+async def login(request):
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body)
+            email = data.get("email")
+            password = data.get("password")
+
+            if not email or not password:
+                return JsonResponse({"error": "Please fill all the fields!"}, status=400)
+
+            try:
+                validate_email(email)
+            except ValidationError:
+                return JsonResponse({"error": "Invalid email format!"}, status=400)
+
+            user = await User.objects.filter(email=email).afirst()
+            if not user:
+                return JsonResponse({"error": "User not found!"}, status=404)
+            try:
+                valid, rehashed = await averify_password(password, user.password)
+            except HashingRejected as e:
+                return hashing_busy(e)
+            if not valid:
+                return JsonResponse({"error": "Invalid password!"}, status=401)
+            if rehashed:
+                await User.objects.filter(id=user.id).aupdate(password=rehashed)
+
+            # Prime the cookie resolver so the next requests skip the user lookup
+            user_record_cache.set(user.email, (user.id, user.name, user.email))
+
+            response = JsonResponse({"message": "Login successful!", "user" : {"id" : user.id, "name" : user.name, "email" : user.email}}, status=200)
+            response.set_cookie("user_auth", signer.sign(user.email), httponly=True, samesite='Lax')
+            response.set_cookie("user_id", user.id, httponly=True, samesite='Lax')
+
+            return response
+
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON data!"}, status=400)
+    else:
+        return JsonResponse({"error": "Invalid request method!"}, status=405)
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signing import BadSignature, Signer
+
+from .models import User
+
+signer = Signer()
+
+AUTH_COOKIE = "user_auth"
+
+
+class UserRecordCache:
+    """
+    Bounded LRU of email -> (id, name, email) with a per-entry time to live.
+
+    Only the identifying columns are kept, never the password hash, and every
+    request gets its own unsaved User instance built from them so views cannot
+    leak changes into the shared cache.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, email, record):
+        with self._lock:
+            self._entries[email] = (time.monotonic() + self.ttl, record)
+            self._entries.move_to_end(email)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, email):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+user_record_cache = UserRecordCache(
+    max_entries=getattr(settings, "USER_RECORD_CACHE_SIZE", 10000),
+    ttl=getattr(settings, "USER_RECORD_CACHE_TTL", 300),
+)
+
+
+def _cookie_email(request):
+    cookie = request.COOKIES.get(AUTH_COOKIE)
+    if not cookie:
+        return None
+    try:
+        return signer.unsign(cookie)
+    except BadSignature:
+        return None
+
+
+def _record(email, row):
+    if row is None:
+        return None
+    user_record_cache.set(email, row)
+    return row
+
+
+def resolve_user(request):
+    """Return an unsaved User for the signed auth cookie, or None."""
+    email = _cookie_email(request)
+    if email is None:
+        return None
+    row = user_record_cache.get(email)
+    if row is None:
+        row = _record(email, User.objects.filter(email=email).values_list("id", "name", "email").first())
+    return User(id=row[0], name=row[1], email=row[2]) if row else None
+
+
+async def aresolve_user(request):
+    email = _cookie_email(request)
+    if email is None:
+        return None
+    row = user_record_cache.get(email)
+    if row is None:
+        row = _record(email, await User.objects.filter(email=email).values_list("id", "name", "email").afirst())
+    return User(id=row[0], name=row[1], email=row[2]) if row else None
+
+
+def owns(request, user_id):
+    """
+    False when the request carries a valid auth cookie for a different user.
+
+    Requests without the cookie keep the older behaviour of trusting the id they
+    were given, so existing clients continue to work.
+    """
+    record = getattr(request, "user_record", None)
+    return record is None or str(record.id) == str(user_id)
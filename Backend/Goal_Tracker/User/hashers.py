@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2 with the iteration count taken from settings.PASSWORD_HASH_ITERATIONS.
+
+    It keeps the stock "pbkdf2_sha256" algorithm name, so existing hashes verify
+    unchanged, and check_password() reports hashes made with a different count
+    as needing an update, which login uses to rehash them transparently.
+    """
+
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_HASH_ITERATIONS", None) or PBKDF2PasswordHasher.iterations
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from Goal_Tracker import metrics
+
+
+class HashingRejected(Exception):
+    """Base class for requests the password hashing pool refused to serve."""
+
+    status = 503
+
+
+class HashingOverloaded(HashingRejected):
+    """Every worker is busy and the wait queue is full."""
+
+    status = 429
+
+
+class HashingTimeout(HashingRejected):
+    """The hash did not finish within PASSWORD_HASH_TIMEOUT seconds."""
+
+
+class PasswordHashPool:
+    """
+    Small dedicated thread pool for PBKDF2 work.
+
+    At most `workers` hashes run at once and at most `max_pending` more may wait;
+    anything beyond that is rejected immediately instead of tying up a request
+    worker, so a burst of logins cannot starve the rest of the API.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def _release(self, future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingOverloaded()
+        with self._lock:
+            self.in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future
+
+    def _timed_out(self):
+        with self._lock:
+            self.timed_out += 1
+        return HashingTimeout()
+
+    def run(self, fn, *args):
+        with metrics.timer("hash"):
+            future = self.submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                raise self._timed_out()
+
+    async def arun(self, fn, *args):
+        with metrics.timer("hash"):
+            future = asyncio.wrap_future(self.submit(fn, *args))
+            try:
+                return await asyncio.wait_for(future, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                raise self._timed_out()
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "rejected": self.rejected, "timed_out": self.timed_out}
+
+
+password_pool = PasswordHashPool(
+    workers=getattr(settings, "PASSWORD_HASH_WORKERS", 2),
+    max_pending=getattr(settings, "PASSWORD_HASH_MAX_PENDING", 16),
+    timeout=getattr(settings, "PASSWORD_HASH_TIMEOUT", 5),
+)
+
+
+def _verify(password, encoded):
+    # check_password() calls the setter when the stored hash uses outdated
+    # parameters; hash again here so the request thread only has to save it.
+    upgraded = []
+    valid = check_password(password, encoded, setter=lambda raw: upgraded.append(make_password(raw)))
+    return valid, upgraded[0] if upgraded else None
+
+
+def hash_password(password):
+    return password_pool.run(make_password, password)
+
+
+def verify_password(password, encoded):
+    """Return (valid, rehashed) where `rehashed` is a new hash to store, or None."""
+    return password_pool.run(_verify, password, encoded)
+
+
+async def ahash_password(password):
+    return await password_pool.arun(make_password, password)
+
+
+async def averify_password(password, encoded):
+    return await password_pool.arun(_verify, password, encoded)
@@ -0,0 +1,25 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .auth import aresolve_user, resolve_user
+
+
+class UserRecordMiddleware:
+    """Verify the signed auth cookie once per request and set request.user_record."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.user_record = resolve_user(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.user_record = await aresolve_user(request)
+        return await self.get_response(request)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0002_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='sync_floor',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
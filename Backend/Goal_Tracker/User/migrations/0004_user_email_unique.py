@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:15
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # The unique index would fail on these with a bare IntegrityError. Which account
+    # to keep (and what happens to its goals) is not something to guess here, so
+    # stop and say which emails need sorting out first.
+    User = apps.get_model('User', 'User')
+    db = schema_editor.connection.alias
+    duplicates = list(
+        User.objects.using(db).order_by('email').values('email').annotate(accounts=Count('id')).filter(accounts__gt=1)
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Cannot make User.email unique, these emails belong to more than one user: %s. '
+            'Merge or rename those accounts, then migrate again.'
+            % ', '.join('%s (%d users)' % (row['email'], row['accounts']) for row in duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0003_user_sync_floor'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='user',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True),
+        ),
+    ]
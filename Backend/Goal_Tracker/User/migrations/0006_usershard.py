@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('User', '0005_user_data_modified_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserShard',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='User.user')),
+                ('alias', models.CharField(max_length=100)),
+                ('moving', models.BooleanField(default=False)),
+            ],
+        ),
+    ]
@@ -3,9 +3,30 @@ from django.db import models
 # Create your models here.
 class User(models.Model):
     name = models.CharField(max_length = 200)
-    email = models.EmailField()
+    email = models.EmailField(unique=True)
     password = models.CharField(max_length=200)
+    # Bumped by every goal/milestone mutation so clients can revalidate cheaply.
+    data_version = models.PositiveBigIntegerField(default=0)
+    data_modified = models.DateTimeField(null=True, blank=True)
+    # Highest version whose tombstones have been compacted away; older sync cursors must reset.
+    sync_floor = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Replica lag compares the newest write each copy of the database has seen.
+            models.Index(fields=['data_modified'], name='user_data_modified_idx'),
+        ]
 
     def __str__(self):
         return self.name + " | " + self.email
 
+
+class UserShard(models.Model):
+    # Which shard database holds a user's goals; users without a row are on 'default'.
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    alias = models.CharField(max_length=100)
+    # Set while rebalance_shards copies the user's rows, writes are refused until it is cleared.
+    moving = models.BooleanField(default=False)
+
+    def __str__(self):
+        return "%d -> %s" % (self.user_id, self.alias)
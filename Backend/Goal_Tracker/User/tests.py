@@ -1,3 +1,169 @@
-from django.test import TestCase
+import json
+import threading
+import time
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+
+from django.test.utils import CaptureQueriesContext
+
+from Goal.tests import QueryPlanMixin, seed
+from . import async_views, views
+from .hashing import HashingOverloaded, HashingTimeout, PasswordHashPool
+from .auth import AUTH_COOKIE, resolve_user, signer, user_record_cache
+from .models import User
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN output is SQLite specific")
+class UserQueryPlanTests(QueryPlanMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed(users=500, goals_per_user=1, milestones_per_goal=0)
+        User.objects.create(name="login", email="login@example.com", password=make_password("password123"))
+
+    def post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type="application/json")
+
+    def test_login(self):
+        response = self.assertIndexed(self.post, "/user/login/", {"email": "login@example.com", "password": "password123"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_register(self):
+        response = self.assertIndexed(self.post, "/user/register/", {"name": "new", "email": "new@example.com", "password": "password123"})
+        self.assertEqual(response.status_code, 201)
+
+    def test_cookie_lookup(self):
+        self.post("/user/login/", {"email": "login@example.com", "password": "password123"})
+        user_record_cache.invalidate("login@example.com")
+        self.assertIndexed(self.client.get, "/goal/goal/%d/" % User.objects.get(email="login@example.com").id)
+
+
+class AsyncViewTests(TestCase):
+
+    def call(self, module, view, data):
+        if module is async_views:
+            request = AsyncRequestFactory().post("/", json.dumps(data), content_type="application/json")
+            response = async_to_sync(getattr(module, view))(request)
+        else:
+            request = RequestFactory().post("/", json.dumps(data), content_type="application/json")
+            response = getattr(module, view)(request)
+        body = json.loads(response.content)
+        # The two users differ in id and email, the rest of the answer must not
+        body.get("user", {}).pop("id", None)
+        body.get("user", {}).pop("email", None)
+        return response.status_code, body, sorted(response.cookies)
+
+    def test_same_results(self):
+        for module, email in ((views, "sync@example.com"), (async_views, "async@example.com")):
+            self.call(module, "createuser", {"name": "n", "email": email, "password": "password123"})
+        for view, data in (
+            ("createuser", {"name": "n", "password": "password123"}),
+            ("createuser", {"name": "n", "email": "bad", "password": "password123"}),
+            ("createuser", {"name": "n", "email": "{email}", "password": "password123"}),
+            ("login", {"email": "{email}", "password": "wrong password"}),
+            ("login", {"email": "nobody@example.com", "password": "password123"}),
+            ("login", {"email": "{email}", "password": "password123"}),
+        ):
+            results = [
+                self.call(module, view, {key: value.format(email=email) for key, value in data.items()})
+                for module, email in ((views, "sync@example.com"), (async_views, "async@example.com"))
+            ]
+            self.assertEqual(results[0], results[1], data)
+
+
+class AuthCookieTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(name="a", email="a@example.com", password="x")
+        self.other = User.objects.create(name="b", email="b@example.com", password="x")
+        user_record_cache.invalidate(self.user.email)
+
+    def goals(self, user):
+        return self.client.get("/goal/goal/%d/" % user.id).status_code
+
+    def test_signed_cookie_scopes_requests_to_its_user(self):
+        self.client.cookies[AUTH_COOKIE] = signer.sign(self.user.email)
+        self.assertEqual(self.goals(self.user), 200)
+        self.assertEqual(self.goals(self.other), 403)
+        response = self.client.post("/goal/create_goal/", json.dumps({
+            "id": self.other.id, "title": "t", "description": "d", "category": "Health", "priority": "High", "targetDate": "2025-01-01",
+        }), content_type="application/json")
+        self.assertEqual(response.status_code, 403)
+
+        # Resolved from the record cache, without a user query
+        request = RequestFactory().get("/")
+        request.COOKIES[AUTH_COOKIE] = signer.sign(self.user.email)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(resolve_user(request).id, self.user.id)
+        self.assertEqual(ctx.captured_queries, [])
+
+    def test_bad_cookies_are_ignored(self):
+        # Without a valid cookie the id in the URL is trusted, as before cookies were checked
+        for cookie in ("garbage", signer.sign(self.user.email)[:-2] + "xx", signer.sign("nobody@example.com"),
+                       self.user.email + ":" + signer.signature(self.other.email)):
+            self.client.cookies[AUTH_COOKIE] = cookie
+            self.assertEqual(self.goals(self.other), 200, cookie)
+            request = RequestFactory().get("/")
+            request.COOKIES[AUTH_COOKIE] = cookie
+            self.assertIsNone(resolve_user(request), cookie)
+
+
+class HashingTests(TestCase):
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def busy_pool(self, timeout=5):
+        # One worker, no queue, and that worker is stuck until the test releases it
+        pool = PasswordHashPool(workers=1, max_pending=0, timeout=timeout)
+        pool.submit(self.release.wait)
+        return pool
+
+    def register(self):
+        return self.client.post("/user/register/", json.dumps({
+            "name": "n", "email": "n@example.com", "password": "password123",
+        }), content_type="application/json")
+
+    def test_full_pool_rejects_with_429(self):
+        pool = self.busy_pool()
+        with self.assertRaises(HashingOverloaded):
+            pool.run(len, "x")
+        with mock.patch("User.hashing.password_pool", pool):
+            response = self.register()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(pool.stats()["rejected"], 2)
+        self.assertFalse(User.objects.filter(email="n@example.com").exists())
+
+    def test_slow_hash_times_out_with_503(self):
+        # Work that timed out keeps its slot until it really finishes, so leave room for two
+        pool = PasswordHashPool(workers=1, max_pending=2, timeout=0.05)
+        pool.submit(self.release.wait)
+        with self.assertRaises(HashingTimeout):
+            pool.run(len, "x")
+        with mock.patch("User.hashing.password_pool", pool):
+            self.assertEqual(self.register().status_code, 503)
+        self.release.set()
+        # Once the stuck and queued work has finished the pool serves requests again
+        deadline = time.monotonic() + 30
+        while pool.stats()["in_flight"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(pool.run(len, "abc"), 3)
+
+    def test_login_upgrades_the_work_factor(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            user = User.objects.create(name="n", email="n@example.com", password=make_password("password123"))
+        self.assertIn("$1000$", user.password)
+        with override_settings(PASSWORD_HASH_ITERATIONS=2000):
+            response = self.client.post("/user/login/", json.dumps({
+                "email": "n@example.com", "password": "password123",
+            }), content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertIn("$2000$", user.password)
@@ -1,7 +1,13 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_VIEWS:
+    from . import async_views as auth_views
+else:
+    auth_views = views
+
 urlpatterns = [
-    path('register/', views.createuser, name='createuser'),
-    path('login/', views.login, name='login'),
+    path('register/', auth_views.createuser, name='createuser'),
+    path('login/', auth_views.login, name='login'),
 ]
\ No newline at end of file
@@ -1,12 +1,20 @@
 
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
-from django.contrib.auth.hashers import check_password, make_password
 from .models import User
 from django.http import JsonResponse
-from django.core.signing import Signer
+from .auth import signer, user_record_cache
+from .hashing import HashingRejected, hash_password, verify_password
 import json
 from django.views.decorators.csrf import csrf_exempt
+from Goal_Tracker import shards
+
+
+def hashing_busy(exc):
+    # Password hashing is at capacity; tell the client to back off instead of queueing
+    response = JsonResponse({"error": "Server busy, please try again!"}, status=exc.status)
+    response["Retry-After"] = "1"
+    return response
 
 
 @csrf_exempt
@@ -37,11 +45,16 @@ def createuser(request):
             if User.objects.filter(email=email).exists():
                 return JsonResponse({"error": "Email already exists!"}, status=400)
 
-            # Hash the password
-            hashed_password = make_password(password)
+            # Hash the password on the dedicated hashing pool
+            try:
+                hashed_password = hash_password(password)
+            except HashingRejected as e:
+                return hashing_busy(e)
 
             # Create the user
             user = User.objects.create(name=name, email=email, password=hashed_password)
+            # Pick the shard the new user's goals will live on
+            shards.place_user(user)
 
             return JsonResponse({"message": "User created successfully!"}, status=201)
         except json.JSONDecodeError:
@@ -50,8 +63,6 @@ def createuser(request):
         return JsonResponse({"error": "Invalid request method!"}, status=405)
 
 
-signer = Signer()
-
 @csrf_exempt
 def login(request):
     if request.method == "POST":
@@ -75,10 +86,20 @@ def login(request):
             if not user:
                 return JsonResponse({"error": "User not found!"}, status=404)
             # Check password
-            if not check_password(password, user.password):
+            try:
+                valid, rehashed = verify_password(password, user.password)
+            except HashingRejected as e:
+                return hashing_busy(e)
+            if not valid:
                 return JsonResponse({"error": "Invalid password!"}, status=401)
+            # Upgrade hashes made with an older work factor
+            if rehashed:
+                User.objects.filter(id=user.id).update(password=rehashed)
             # Return success response
             
+            # Prime the cookie resolver so the next requests skip the user lookup
+            user_record_cache.set(user.email, (user.id, user.name, user.email))
+
             response = JsonResponse({"message": "Login successful!", "user" : {"id" : user.id, "name" : user.name, "email" : user.email}}, status=200)
             signed_email = signer.sign(user.email)
             # Set a secure cookie with the user ID